@@ -3,9 +3,10 @@ from .db import get_conn, save_backtest_result
 from .backtest import run_backtest
 import pandas as pd
 
-def run_backtest_for_symbol(symbol: str, timeframe: str = "1h", strategy: str = "rsi"):
+def run_backtest_for_symbol(symbol: str, timeframe: str = "1h", strategy: str = "rsi", params: dict | None = None):
     """
     Runs a backtest for a single symbol and saves the results to the database.
+    `params` overrides the default strategy parameters, e.g. with optimizer.best_params.
     """
     print(f"Starting backtest for {symbol} on {timeframe} with {strategy} strategy...")
     conn = get_conn(cfg.database_url)
@@ -16,8 +17,8 @@ def run_backtest_for_symbol(symbol: str, timeframe: str = "1h", strategy: str =
         timeframe=timeframe,
         strategy_name=strategy,
         symbol_override=symbol, # This is the key change
-        # Provide default values for other strategy params
-        fast=20, slow=50, rsi_period=14, rsi_oversold=30, rsi_overbought=70
+        # Default strategy params, overridden by any tuned ones
+        **{**dict(fast=20, slow=50, rsi_period=14, rsi_oversold=30, rsi_overbought=70), **(params or {})}
     )
     
     if summary_df.empty:
@@ -27,3 +28,15 @@ def run_backtest_for_symbol(symbol: str, timeframe: str = "1h", strategy: str =
     else:
         save_backtest_result(conn, symbol, strategy, summary_df)
         print(f"SUCCESS: Saved backtest result for {symbol} with {strategy} strategy.")
+
+def run_backtests_for_symbols(symbols: list[str], timeframe: str = "1h", strategy: str = "rsi", max_workers: int | None = None):
+    """
+    Parallel counterpart of run_backtest_for_symbol: runs all symbols on a
+    process pool and saves every result in one batched write.
+    """
+    from .parallel import run_parallel_backtests
+    print(f"Starting parallel backtest for {len(symbols)} symbols on {timeframe} with {strategy} strategy...")
+    jobs = [(symbol, strategy, {}) for symbol in symbols]
+    summary_df = run_parallel_backtests(cfg.database_url, jobs, timeframe=timeframe, max_workers=max_workers)
+    print(f"SUCCESS: Saved {len(summary_df)} backtest results.")
+    return summary_df
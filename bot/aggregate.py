@@ -0,0 +1,157 @@
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from .config import cfg
+from .db import (
+    add_candle_listener, get_candles_arrays, get_candles_range, get_earliest_ts, get_latest_ts, get_unfillable_ranges,
+    upsert_candles,
+)
+from .downsample import resample_ohlcv
+from .timeframes import timeframe_ms
+
+BASE_TIMEFRAME = "1m"
+
+def target_timeframes(spec: Optional[str]=None, base: str=BASE_TIMEFRAME) -> List[str]:
+    """Configured derived timeframes that are whole multiples of `base`, finest first."""
+    spec = cfg.aggregate_timeframes if spec is None else spec
+    base_ms = timeframe_ms(base)
+    tfs = [t.strip() for t in spec.split(",") if t.strip()]
+    return sorted((t for t in tfs if timeframe_ms(t) > base_ms and timeframe_ms(t) % base_ms == 0), key=timeframe_ms)
+
+def _rows(exchange: str, symbol: str, tf: str, ts: np.ndarray, ohlcv: np.ndarray) -> List[Tuple]:
+    return [(exchange, symbol, tf, int(t), o, h, l, c, v) for t, (o, h, l, c, v) in zip(ts.tolist(), ohlcv.tolist())]
+
+def _grace_ms() -> int:
+    return int(cfg.aggregate_grace_s * 1000)
+
+def _unfillable_missing(ts: np.ndarray, bts: np.ndarray, bucket_idx: np.ndarray, step: int, base_ms: int,
+                        unfillable: Iterable[Tuple[int, int]]) -> np.ndarray:
+    """Per bucket, the base slots that lie in an unfillable range and have no bar."""
+    merged: List[List[int]] = []
+    for a, b in sorted(unfillable):
+        if merged and a <= merged[-1][1] + base_ms:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    slots = np.zeros(len(bts), dtype=np.int64)
+    present = np.zeros(len(ts), dtype=bool)
+    for a, b in merged:
+        slots += np.clip(np.minimum(bts + step, b + base_ms) - np.maximum(bts, a), 0, None) // base_ms
+        present |= (ts >= a) & (ts <= b)
+    return slots - np.bincount(bucket_idx[present], minlength=len(bts))
+
+def complete_buckets(ts: np.ndarray, ohlcv: np.ndarray, step: int, base: str=BASE_TIMEFRAME,
+                     now_ms: Optional[int]=None, oldest_ts: Optional[int]=None, newest_ts: Optional[int]=None,
+                     unfillable: Iterable[Tuple[int, int]]=(), grace_ms: Optional[int]=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    resample_ohlcv restricted to buckets whose bars are settled. Fully covered
+    buckets always are. The bucket still forming at `now_ms` is kept if its
+    bars run unbroken from its start. A closed bucket with missing base bars is
+    kept once every missing bar is in an `unfillable` range, or, when it lies
+    after the first stored base bar (`oldest_ts`, default the first of `ts`),
+    once stored base bars reach `grace_ms` past it (`newest_ts`, default the
+    last of `ts`), so exchange outages don't leave permanent holes. Other
+    partial buckets, such as one straddling the start of base history, are
+    dropped so they never overwrite a complete bar stored for the same bucket.
+    """
+    bts, bars = resample_ohlcv(ts, ohlcv, step)
+    if not len(bts):
+        return bts, bars
+    base_ms = timeframe_ms(base)
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    oldest_ts = int(ts[0]) if oldest_ts is None else oldest_ts
+    newest_ts = int(ts[-1]) if newest_ts is None else newest_ts
+    grace_ms = _grace_ms() if grace_ms is None else grace_ms
+    bucket = ts // step * step
+    left, right = np.searchsorted(bucket, bts, side="left"), np.searchsorted(bucket, bts, side="right")
+    first, last, counts = ts[left], ts[right - 1], right - left
+    full = counts == step // base_ms
+    unbroken = (first == bts) & (counts == (last - bts) // base_ms + 1)
+    settled = ((first == bts) | (bts > oldest_ts)) & (newest_ts - (bts + step - base_ms) >= grace_ms)
+    if unfillable:
+        missing = step // base_ms - counts
+        settled |= missing <= _unfillable_missing(ts, bts, np.searchsorted(bts, bucket), step, base_ms, unfillable)
+    forming = bts + step > now_ms
+    keep = full | (forming & unbroken) | (~forming & settled)
+    return bts[keep], bars[keep]
+
+def aggregate_bars(exchange: str, symbol: str, ts: np.ndarray, ohlcv: np.ndarray, targets: Iterable[str],
+                   base: str=BASE_TIMEFRAME, unfillable: Iterable[Tuple[int, int]]=()) -> List[Tuple]:
+    """Candle rows for every settled target-timeframe bucket (see complete_buckets) of the sorted base bars (ts, ohlcv)."""
+    rows = []
+    for tf in targets:
+        bts, bars = complete_buckets(ts, ohlcv, timeframe_ms(tf), base, unfillable=unfillable)
+        rows.extend(_rows(exchange, symbol, tf, bts, bars))
+    return rows
+
+def update_series(conn, exchange: str, symbol: str, start_ts: int, end_ts: int, targets: List[str],
+                  base: str=BASE_TIMEFRAME, pending: Optional[Tuple[np.ndarray, np.ndarray]]=None) -> int:
+    """
+    Recomputes the derived bars whose buckets overlap [start_ts, end_ts] from the
+    stored base bars and upserts the settled ones (see complete_buckets). Buckets
+    up to the grace period before start_ts are revisited too, since the new bars
+    may be what settles them. `pending` holds base bars that may not be
+    committed yet (e.g. written inside write_batch); stored bars win on conflict,
+    matching bulk_insert_candles. Returns the number of derived rows written.
+    """
+    if not targets:
+        return 0
+    start_ts -= _grace_ms()
+    # The coarsest target's bucket covers every finer one, so one read serves all
+    coarse = max(timeframe_ms(t) for t in targets)
+    lo = start_ts // coarse * coarse
+    hi = end_ts // coarse * coarse + coarse - 1
+    ts, ohlcv = get_candles_range(conn, exchange, symbol, base, lo, hi)
+    if pending is not None:
+        extra = ~np.isin(pending[0], ts)
+        if extra.any():
+            ts = np.concatenate([ts, pending[0][extra]])
+            ohlcv = np.concatenate([ohlcv, pending[1][extra]])
+            order = np.argsort(ts, kind="stable")
+            ts, ohlcv = ts[order], ohlcv[order]
+    if not len(ts):
+        return 0
+    oldest = min(int(ts[0]), get_earliest_ts(conn, exchange, symbol, base) or int(ts[0]))
+    newest = max(int(ts[-1]), get_latest_ts(conn, exchange, symbol, base) or 0)
+    unfillable = get_unfillable_ranges(conn, exchange, symbol, base)
+    rows = []
+    for tf in targets:
+        step = timeframe_ms(tf)
+        # Only the buckets touched by the new base bars (or settled by them) are rewritten
+        sel = (ts >= start_ts // step * step) & (ts <= end_ts // step * step + step - 1)
+        bts, bars = complete_buckets(ts[sel], ohlcv[sel], step, base, oldest_ts=oldest, newest_ts=newest,
+                                     unfillable=unfillable)
+        rows.extend(_rows(exchange, symbol, tf, bts, bars))
+    if rows:
+        upsert_candles(conn, rows)
+    return len(rows)
+
+def rebuild(conn, exchange: str, symbols: Iterable[str], targets: Optional[List[str]]=None, base: str=BASE_TIMEFRAME) -> Dict[str, int]:
+    """Materializes derived timeframes from the full stored base history. Returns rows written per symbol."""
+    targets = target_timeframes() if targets is None else targets
+    out = {}
+    for symbol in symbols:
+        ts, ohlcv = get_candles_arrays(conn, exchange, symbol, base)
+        rows = aggregate_bars(exchange, symbol, ts, np.asarray(ohlcv), targets, base,
+                              get_unfillable_ranges(conn, exchange, symbol, base)) if len(ts) else []
+        if rows:
+            upsert_candles(conn, rows)
+        out[symbol] = len(rows)
+    return out
+
+def _on_candles(conn, rows) -> None:
+    targets = target_timeframes()
+    if not targets:
+        return
+    series: Dict[Tuple[str, str], list] = {}
+    for r in rows:
+        if r[2] == BASE_TIMEFRAME:
+            series.setdefault((r[0], r[1]), []).append((r[3], r[4], r[5], r[6], r[7], r[8]))
+    if not series:
+        return
+    for (exchange, symbol), bars in series.items():
+        arr = np.array(bars, dtype=float)
+        ts = arr[:, 0].astype(np.int64)
+        update_series(conn, exchange, symbol, int(ts.min()), int(ts.max()), targets, pending=(ts, arr[:, 1:]))
+
+add_candle_listener(_on_candles)
@@ -1,14 +1,81 @@
+import re
+import threading
+import time
 from .config import cfg
+from . import metrics
+from .prompt_encoding import FORMAT_NOTE, encode_market, estimate_tokens
 import pandas as pd
 
-# (Keep the existing AIAnalyzer, GeminiAnalyzer, and OpenAIAnalyzer classes)
+# Bump whenever prompt wording or the data sent changes, so cached insights are not reused
+PROMPT_VERSION = "2"
+
+def market_data_str(df: pd.DataFrame) -> str:
+    """The original padded-table serialization; kept as the baseline prompt size is measured against."""
+    return df.tail(50)[['open', 'high', 'low', 'close', 'volume']].to_string()
+
+def market_data(items: list, budget_tokens: int | None = None) -> tuple[str, dict]:
+    """
+    Compact market data for [(symbol, df), ...] within the prompt token budget,
+    split evenly across symbols, plus stats on the encodings chosen and on the
+    size the old table format would have had.
+    """
+    per_symbol = (budget_tokens or cfg.prompt_token_budget) // max(1, len(items))
+    sections, chosen, tokens = [], [], 0
+    for symbol, df in items:
+        name, text, n = encode_market(df, per_symbol)
+        sections.append(f"=== {symbol} ===\n{text}")
+        chosen.append(name)
+        tokens += n
+    baseline = sum(estimate_tokens(market_data_str(df)) for _, df in items)
+    return FORMAT_NOTE + "\n\n" + "\n\n".join(sections), dict(encodings=chosen, baseline_tokens=baseline, data_tokens=tokens)
+
+def headlines_str(headlines: list[str]) -> str:
+    return "- " + "\n- ".join(headlines)
+
+def trade_prompt(symbol: str, df: pd.DataFrame) -> tuple[str, dict]:
+    data_str, stats = market_data([(symbol, df)])
+    return (f"Based on the following recent market data for {symbol}, should I BUY, SELL, or HOLD?\n\n"
+            f"Provide a clear, one-word answer first, followed by a brief justification.\n\nRecent Market Data:\n{data_str}"), stats
+
+def batch_trade_prompt(items: list) -> tuple[str, dict]:
+    data_str, stats = market_data(items)
+    return (
+        "You are a crypto trading analyst. For each symbol below, should I BUY, SELL, or HOLD?\n\n"
+        "Answer with exactly one line per symbol, in the form:\n"
+        "SYMBOL: BUY|SELL|HOLD - brief justification\n\n"
+        f"Recent Market Data:\n{data_str}"
+    ), stats
+
+def log_call(provider: str, symbols: list, prompt: str, stats: dict, started: float) -> None:
+    metrics.observe("ai_request_seconds", time.perf_counter() - started, provider=provider)
+    metrics.inc("ai_prompt_tokens_total", estimate_tokens(prompt), provider=provider)
+    print(f"[ai] {provider} {','.join(symbols)}: data {stats['baseline_tokens']} -> {stats['data_tokens']} tokens "
+          f"({'/'.join(sorted(set(stats['encodings'])))}), prompt ~{estimate_tokens(prompt)} tokens, "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+def parse_batch_answer(text: str, symbols: list[str]) -> dict:
+    """Maps each symbol to its 'SIGNAL - justification' line; symbols the model skipped get an Error."""
+    out = {}
+    for line in text.splitlines():
+        m = re.match(r"^[\s*\-]*([A-Z0-9]+/[A-Z0-9]+)\**\s*:\s*(.+)$", line.strip())
+        if m and m.group(1) in symbols:
+            out[m.group(1)] = m.group(2).strip()
+    return {s: out.get(s, f"Error: no answer for {s}") for s in symbols}
+
 class AIAnalyzer:
+    # Symbols that can share one prompt; 1 means get_trade_suggestions falls back to one call per symbol
+    max_batch = 1
+
     def __init__(self, api_key):
         self.api_key = api_key
 
     def get_trade_suggestion(self, symbol: str, df: pd.DataFrame) -> str:
         raise NotImplementedError
 
+    def get_trade_suggestions(self, items: list) -> dict:
+        """[(symbol, df), ...] -> {symbol: suggestion}. Providers that can answer several symbols at once override this."""
+        return {symbol: self.get_trade_suggestion(symbol, df) for symbol, df in items}
+
     def get_news_sentiment(self, headlines: list[str]) -> str:
         raise NotImplementedError
     
@@ -16,6 +83,8 @@ class AIAnalyzer:
         raise NotImplementedError
 
 class GeminiAnalyzer(AIAnalyzer):
+    max_batch = 5
+
     def __init__(self, api_key):
         super().__init__(api_key)
         import google.generativeai as genai
@@ -23,18 +92,33 @@ class GeminiAnalyzer(AIAnalyzer):
         self.model = genai.GenerativeModel('gemini-1.5-pro')
 
     def get_trade_suggestion(self, symbol: str, df: pd.DataFrame) -> str:
-        df_recent = df.tail(50)
-        data_str = df_recent[['open', 'high', 'low', 'close', 'volume']].to_string()
-        prompt = f"You are a crypto trading analyst. Based on the following recent market data for {symbol}, should I BUY, SELL, or HOLD?\n\nProvide a clear, one-word answer first, followed by a brief justification.\n\nRecent Market Data:\n{data_str}"
-        
+        prompt, stats = trade_prompt(symbol, df)
+        prompt = "You are a crypto trading analyst. " + prompt
+        started = time.perf_counter()
         try:
             response = self.model.generate_content(prompt)
             return response.text
         except Exception as e:
             return f"Error: {e}"
+        finally:
+            log_call("gemini", [symbol], prompt, stats, started)
+
+    def get_trade_suggestions(self, items: list) -> dict:
+        if len(items) == 1:
+            return super().get_trade_suggestions(items)
+        symbols = [symbol for symbol, _ in items]
+        prompt, stats = batch_trade_prompt(items)
+        started = time.perf_counter()
+        try:
+            response = self.model.generate_content(prompt)
+            return parse_batch_answer(response.text, symbols)
+        except Exception as e:
+            return {symbol: f"Error: {e}" for symbol in symbols}
+        finally:
+            log_call("gemini", symbols, prompt, stats, started)
 
     def get_news_sentiment(self, headlines: list[str]) -> str:
-        prompt = f"Analyze the sentiment of the following crypto news headlines and classify it as 'bullish', 'bearish', or 'neutral'.\n\nHeadlines:\n- {'\n- '.join(headlines)}"
+        prompt = f"Analyze the sentiment of the following crypto news headlines and classify it as 'bullish', 'bearish', or 'neutral'.\n\nHeadlines:\n{headlines_str(headlines)}"
         
         try:
             response = self.model.generate_content(prompt)
@@ -65,26 +149,46 @@ class GeminiAnalyzer(AIAnalyzer):
 
 # (Keep the OpenAIAnalyzer and the factory function)
 class OpenAIAnalyzer(AIAnalyzer):
+    max_batch = 5
+
     def __init__(self, api_key):
         super().__init__(api_key)
         from openai import OpenAI
         self.client = OpenAI(api_key=self.api_key)
 
     def get_trade_suggestion(self, symbol: str, df: pd.DataFrame) -> str:
-        df_recent = df.tail(50)
-        data_str = df_recent[['open', 'high', 'low', 'close', 'volume']].to_string()
-        
+        prompt, stats = trade_prompt(symbol, df)
+        started = time.perf_counter()
         try:
             response = self.client.chat.completions.create(
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are a crypto trading analyst."},
-                    {"role": "user", "content": f"Based on the following recent market data for {symbol}, should I BUY, SELL, or HOLD?\n\nProvide a clear, one-word answer first, followed by a brief justification.\n\nRecent Market Data:\n{data_str}"}
+                    {"role": "user", "content": prompt}
                 ]
             )
             return response.choices[0].message.content
         except Exception as e:
             return f"Error: {e}"
+        finally:
+            log_call("openai", [symbol], prompt, stats, started)
+
+    def get_trade_suggestions(self, items: list) -> dict:
+        if len(items) == 1:
+            return super().get_trade_suggestions(items)
+        symbols = [symbol for symbol, _ in items]
+        prompt, stats = batch_trade_prompt(items)
+        started = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return parse_batch_answer(response.choices[0].message.content, symbols)
+        except Exception as e:
+            return {symbol: f"Error: {e}" for symbol in symbols}
+        finally:
+            log_call("openai", symbols, prompt, stats, started)
 
     def get_news_sentiment(self, headlines: list[str]) -> str:
         try:
@@ -92,7 +196,7 @@ class OpenAIAnalyzer(AIAnalyzer):
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are a financial news analyst."},
-                    {"role": "user", "content": f"Analyze the sentiment of the following crypto news headlines and classify it as 'bullish', 'bearish', or 'neutral'.\n\nHeadlines:\n- {'\n- '.join(headlines)}"}
+                    {"role": "user", "content": f"Analyze the sentiment of the following crypto news headlines and classify it as 'bullish', 'bearish', or 'neutral'.\n\nHeadlines:\n{headlines_str(headlines)}"}
                 ]
             )
             return response.choices[0].message.content
@@ -124,10 +228,61 @@ class OpenAIAnalyzer(AIAnalyzer):
         except Exception as e:
             return f"Error generating portfolio: {e}"
 
-def get_ai_analyzer(provider: str = "gemini") -> AIAnalyzer:
-    if provider == "gemini":
-        return GeminiAnalyzer(cfg.gemini_api_key)
-    elif provider == "openai":
-        return OpenAIAnalyzer(cfg.openai_api_key)
-    else:
-        raise ValueError("Unsupported AI provider")
+class StubAnalyzer(AIAnalyzer):
+    """
+    Offline analyzer for tests and dry runs: answers from a 20-bar SMA with no
+    network calls, optionally after `latency_s`, and counts calls and symbols.
+    """
+    max_batch = 5
+
+    def __init__(self, api_key=None, latency_s: float = 0.0):
+        super().__init__(api_key)
+        self.latency_s = latency_s
+        self.calls = 0
+        self.symbols_seen = 0
+        self.last_prompt = ""
+        self._lock = threading.Lock()
+
+    def _answer(self, df: pd.DataFrame) -> str:
+        close = df["close"].tail(20)
+        sma = close.mean()
+        last = close.iloc[-1]
+        if last > sma * 1.01:
+            return f"BUY - close {last:.4f} is above its 20-bar average {sma:.4f}"
+        if last < sma * 0.99:
+            return f"SELL - close {last:.4f} is below its 20-bar average {sma:.4f}"
+        return f"HOLD - close {last:.4f} is near its 20-bar average {sma:.4f}"
+
+    def get_trade_suggestions(self, items: list) -> dict:
+        # The prompt is built and logged like a real call so encoder changes show up offline
+        prompt, stats = batch_trade_prompt(items)
+        started = time.perf_counter()
+        with self._lock:
+            self.calls += 1
+            self.symbols_seen += len(items)
+            self.last_prompt = prompt
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        log_call("stub", [symbol for symbol, _ in items], prompt, stats, started)
+        return {symbol: self._answer(df) for symbol, df in items}
+
+    def get_trade_suggestion(self, symbol: str, df: pd.DataFrame) -> str:
+        return self.get_trade_suggestions([(symbol, df)])[symbol]
+
+_analyzers: dict = {}
+_analyzers_lock = threading.Lock()
+
+def get_ai_analyzer(provider: str | None = None) -> AIAnalyzer:
+    """One analyzer (and so one API client) per provider for the life of the process."""
+    provider = provider or cfg.ai_provider
+    with _analyzers_lock:
+        if provider not in _analyzers:
+            if provider == "gemini":
+                _analyzers[provider] = GeminiAnalyzer(cfg.gemini_api_key)
+            elif provider == "openai":
+                _analyzers[provider] = OpenAIAnalyzer(cfg.openai_api_key)
+            elif provider == "stub":
+                _analyzers[provider] = StubAnalyzer()
+            else:
+                raise ValueError("Unsupported AI provider")
+        return _analyzers[provider]
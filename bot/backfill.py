@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from .db import init_schema, bulk_insert_candles, get_candle_ts
+from . import aggregate  # noqa: F401 - derives higher timeframes as 1m bars are stored
+from .ratelimit import TokenBucket, binance_klines_weight
+from .timeframes import timeframe_ms
+
+PAGE = 1000
+
+# fetch(symbol, timeframe, start_ms, limit) -> Binance-style kline rows
+Fetch = Callable[[str, str, int, int], list]
+
+def _default_range(timeframe: str, start_ms: Optional[int], end_ms: Optional[int]) -> Tuple[int, int]:
+    """
+    Defaults to the last PAGE bars, like an unpaged klines call. The end is
+    clamped to the last closed bar: bars are inserted once and never revisited,
+    so a still-forming bar must not be stored.
+    """
+    step = timeframe_ms(timeframe)
+    last_closed = int(time.time() * 1000) // step * step - step
+    end_ms = last_closed if end_ms is None else min(end_ms, last_closed)
+    start_ms = start_ms if start_ms is not None else end_ms - PAGE * step
+    return start_ms, end_ms
+
+def find_gaps(conn: sqlite3.Connection, exchange: str, symbol: str, timeframe: str, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+    """Missing bar ranges as inclusive (first_missing_ts, last_missing_ts) pairs within [start_ms, end_ms]."""
+    step = timeframe_ms(timeframe)
+    start_ms = -(-start_ms // step) * step
+    end_ms = end_ms // step * step
+    if end_ms < start_ms:
+        return []
+    ts = get_candle_ts(conn, exchange, symbol, timeframe, start_ms, end_ms)
+    # Sentinels either side turn leading/trailing holes into ordinary interior gaps
+    edges = np.concatenate([[start_ms - step], ts, [end_ms + step]])
+    holes = np.nonzero(np.diff(edges) > step)[0]
+    return [(int(edges[i] + step), int(edges[i + 1] - step)) for i in holes]
+
+def _known(conn, exchange: str, symbol: str, timeframe: str):
+    return conn.execute(
+        "SELECT start_ts, end_ts, cursor, status FROM backfill_gaps WHERE exchange=? AND symbol=? AND timeframe=? ORDER BY start_ts",
+        (exchange, symbol, timeframe),
+    ).fetchall()
+
+def plan_backfill(conn, exchange: str, symbol: str, timeframe: str, start_ms: int, end_ms: int) -> List[Tuple[int, int, int]]:
+    """
+    Gaps still to fetch as (start_ts, end_ts, cursor). Checkpointed cursors are
+    resumed; ranges already found to be empty upstream ("unfillable") are skipped.
+    """
+    known = _known(conn, exchange, symbol, timeframe)
+    unfillable = [(r[0], r[1]) for r in known if r[3] == "unfillable"]
+    cursors = {r[0]: r[2] for r in known if r[3] == "pending"}
+    now = int(time.time() * 1000)
+    plan = []
+    for a, b in find_gaps(conn, exchange, symbol, timeframe, start_ms, end_ms):
+        if any(ua <= a and b <= ub for ua, ub in unfillable):
+            continue
+        cursor = max(a, cursors.get(a, a))
+        plan.append((a, b, cursor))
+    with conn:
+        conn.execute("DELETE FROM backfill_gaps WHERE exchange=? AND symbol=? AND timeframe=? AND status='pending'",
+                     (exchange, symbol, timeframe))
+        conn.executemany(
+            "INSERT OR REPLACE INTO backfill_gaps VALUES (?, ?, ?, ?, ?, ?, 'pending', ?)",
+            [(exchange, symbol, timeframe, a, b, c, now) for a, b, c in plan],
+        )
+    return plan
+
+def _fill_gap(conn, lock: threading.Lock, fetch: Fetch, bucket: TokenBucket, exchange: str, symbol: str,
+              timeframe: str, gap: Tuple[int, int, int]) -> int:
+    start, end, cursor = gap
+    key = (exchange, symbol, timeframe, start)
+    step = timeframe_ms(timeframe)
+    got = 0
+    while cursor <= end:
+        bucket.acquire(binance_klines_weight(PAGE))
+        batch = fetch(symbol, timeframe, cursor, PAGE)
+        rows = [
+            (exchange, symbol, timeframe, int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5]))
+            for k in batch if cursor <= int(k[0]) <= end
+        ]
+        # Upstream has nothing more for this gap once a page comes back empty or short
+        exhausted = not rows or len(batch) < PAGE
+        # Bars the page skipped over don't exist upstream (pre-listing, outages)
+        holes, expected = [], cursor
+        for r in rows:
+            if r[3] > expected:
+                holes.append((expected, r[3] - step))
+            expected = r[3] + step
+        with lock:
+            if rows:
+                bulk_insert_candles(conn, rows)
+                got += len(rows)
+                cursor = rows[-1][3] + step
+            now = int(time.time() * 1000)
+            conn.executemany(
+                "INSERT OR REPLACE INTO backfill_gaps VALUES (?, ?, ?, ?, ?, ?, 'unfillable', ?)",
+                [(exchange, symbol, timeframe, a, b, a, now) for a, b in holes if a != start],
+            )
+            if holes and holes[0][0] == start:
+                # The gap's own row becomes the unfillable record for its leading hole
+                conn.execute(
+                    "UPDATE backfill_gaps SET end_ts=?, status='unfillable', updated_ts=? WHERE exchange=? AND symbol=? AND timeframe=? AND start_ts=?",
+                    (holes[0][1], now) + key,
+                )
+                key = (exchange, symbol, timeframe, rows[0][3])
+                conn.execute("INSERT OR REPLACE INTO backfill_gaps VALUES (?, ?, ?, ?, ?, ?, 'pending', ?)", key + (end, cursor, now))
+            # Checkpoint after the page is stored; a crash in between only refetches one page
+            if cursor > end:
+                conn.execute("DELETE FROM backfill_gaps WHERE exchange=? AND symbol=? AND timeframe=? AND start_ts=?", key)
+            elif exhausted:
+                conn.execute(
+                    "UPDATE OR REPLACE backfill_gaps SET start_ts=?, cursor=?, status='unfillable', updated_ts=? "
+                    "WHERE exchange=? AND symbol=? AND timeframe=? AND start_ts=?",
+                    (cursor, cursor, now) + key,
+                )
+            else:
+                conn.execute(
+                    "UPDATE backfill_gaps SET cursor=?, updated_ts=? WHERE exchange=? AND symbol=? AND timeframe=? AND start_ts=?",
+                    (cursor, now) + key,
+                )
+            conn.commit()
+        if exhausted:
+            break
+    return got
+
+def backfill(
+    conn: sqlite3.Connection,
+    fetch: Fetch,
+    exchange: str,
+    symbols: List[str],
+    timeframe: str,
+    start_ms: Optional[int]=None,
+    end_ms: Optional[int]=None,
+    workers: int=4,
+    bucket: Optional[TokenBucket]=None,
+) -> dict:
+    """
+    Fetches only the missing bars for each symbol in [start_ms, end_ms], several
+    symbols at a time within one shared request-weight budget. Progress is
+    checkpointed per page in backfill_gaps, so rerunning after a kill resumes
+    mid-gap. Returns {symbol: rows_inserted}.
+    """
+    init_schema(conn)
+    start_ms, end_ms = _default_range(timeframe, start_ms, end_ms)
+    # Binance allows 6000 weight/minute; stay well inside it
+    bucket = bucket or TokenBucket(rate=3000 / 60.0, capacity=50)
+    lock = threading.Lock()
+
+    def run_symbol(symbol: str) -> int:
+        with lock:
+            plan = plan_backfill(conn, exchange, symbol, timeframe, start_ms, end_ms)
+        return sum(_fill_gap(conn, lock, fetch, bucket, exchange, symbol, timeframe, g) for g in plan)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return dict(zip(symbols, pool.map(run_symbol, symbols)))
+
+def gap_report(conn: sqlite3.Connection, exchange: str, symbols: List[str], timeframe: str,
+               start_ms: Optional[int]=None, end_ms: Optional[int]=None) -> List[dict]:
+    """Gaps that remain after a backfill, flagged when upstream had no data for them."""
+    init_schema(conn)
+    start_ms, end_ms = _default_range(timeframe, start_ms, end_ms)
+    step = timeframe_ms(timeframe)
+    report = []
+    for symbol in symbols:
+        unfillable = [(r[0], r[1]) for r in _known(conn, exchange, symbol, timeframe) if r[3] == "unfillable"]
+        for a, b in find_gaps(conn, exchange, symbol, timeframe, start_ms, end_ms):
+            report.append(dict(symbol=symbol, timeframe=timeframe, start_ts=a, end_ts=b,
+                               bars=(b - a) // step + 1,
+                               unfillable=any(ua <= a and b <= ub for ua, ub in unfillable)))
+    return report
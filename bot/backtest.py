@@ -1,9 +1,15 @@
 from dataclasses import dataclass
+import numpy as np
 import pandas as pd
-from typing import Tuple, List
+from typing import Tuple, List, Dict, Iterable, Optional
 from .db import get_conn, get_candles_df, get_symbols
 from .config import cfg
+from . import metrics
 from .strategy import SMACrossoverStrategy, RSIStrategy, position_changes
+try:
+    from numba import njit
+except ImportError:  # the paper kernel then runs as plain Python, or row-vectorized for wide universes
+    njit = None
 
 @dataclass
 class BTResult:
@@ -13,6 +19,352 @@ class BTResult:
     max_dd_pct: float
     equity_curve: pd.Series
 
+@dataclass
+class PriceMatrix:
+    symbols: List[str]
+    ts: np.ndarray     # (T,) union of bar timestamps in ms
+    close: np.ndarray  # (T, S) closes, NaN where a symbol has no bar
+
+def load_price_matrix(conn, exchange: str, symbols: Iterable[str], timeframe: str) -> PriceMatrix:
+    """Loads closes for many symbols into one time-aligned (time x symbol) matrix."""
+    frames = {}
+    for symbol in symbols:
+        df = get_candles_df(conn, exchange, symbol, timeframe)
+        if not df.empty:
+            frames[symbol] = df["close"]
+    if not frames:
+        return PriceMatrix(symbols=[], ts=np.empty(0, dtype=np.int64), close=np.empty((0, 0)))
+    wide = pd.DataFrame(frames).sort_index()
+    ts = (wide.index.asi8 // 1_000_000) if isinstance(wide.index, pd.DatetimeIndex) else wide.index.to_numpy(dtype=np.int64)
+    return PriceMatrix(symbols=list(wide.columns), ts=np.asarray(ts, dtype=np.int64), close=wide.to_numpy(dtype=float))
+
+def stack_bars(pm: PriceMatrix) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-packs the time-aligned matrix so row k holds each symbol's k-th bar.
+    Indicators computed in this bar space match the per-symbol path exactly even
+    when symbols start at different times or have gaps relative to each other.
+    Returns (bars, lengths); bars is NaN-padded past each symbol's last bar.
+    """
+    valid = ~np.isnan(pm.close)
+    lengths = valid.sum(axis=0)
+    bars = np.full((int(lengths.max()) if lengths.size else 0, pm.close.shape[1]), np.nan)
+    rows = np.cumsum(valid, axis=0) - 1
+    cols = np.broadcast_to(np.arange(pm.close.shape[1]), pm.close.shape)
+    bars[rows[valid], cols[valid]] = pm.close[valid]
+    return bars, lengths
+
+class IndicatorCache:
+    """Memoizes indicator matrices by parameter so a grid computes each window once."""
+    def __init__(self, bars: np.ndarray):
+        self.bars = bars
+        self._frame = pd.DataFrame(bars)
+        self._sma: Dict[int, np.ndarray] = {}
+        self._rsi: Dict[int, np.ndarray] = {}
+
+    def sma(self, window: int) -> np.ndarray:
+        if window not in self._sma:
+            self._sma[window] = self._frame.rolling(window, min_periods=window).mean().to_numpy()
+        return self._sma[window]
+
+    def rsi(self, period: int) -> np.ndarray:
+        if period not in self._rsi:
+            delta = self._frame.diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+            rs = gain / loss
+            self._rsi[period] = (100 - (100 / (1 + rs))).to_numpy()
+        return self._rsi[period]
+
+def grid_signals(cache: IndicatorCache, strategy_name: str, params: dict, rows: slice=slice(None)) -> np.ndarray:
+    """Vectorized equivalent of Strategy.generate_signals over every symbol at once, for bar rows `rows`."""
+    if strategy_name == "sma_crossover":
+        return (cache.sma(params["fast"])[rows] > cache.sma(params["slow"])[rows]).astype(float)
+    if strategy_name == "rsi":
+        rsi = cache.rsi(params["rsi_period"])[rows]
+        sig = np.zeros_like(rsi)
+        sig[rsi < params["rsi_oversold"]] = 1
+        sig[rsi > params["rsi_overbought"]] = -1
+        return sig
+    raise ValueError(f"Unknown strategy: {strategy_name}")
+
+def bar_returns(bars: np.ndarray) -> np.ndarray:
+    ret = np.zeros_like(bars)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret[1:] = bars[1:] / bars[:-1] - 1
+    return np.nan_to_num(ret, nan=0.0)
+
+@dataclass
+class SegmentState:
+    """Per-symbol state at the end of an evaluated segment, so the next one can continue from it."""
+    sig: np.ndarray      # last (masked) signal
+    equity: np.ndarray
+    peak: np.ndarray
+    max_dd: np.ndarray
+    trades: np.ndarray
+    started: np.ndarray  # whether any bar has been seen yet
+
+    @classmethod
+    def fresh(cls, n: int) -> "SegmentState":
+        return cls(sig=np.zeros(n), equity=np.ones(n), peak=np.ones(n), max_dd=np.zeros(n),
+                   trades=np.zeros(n, dtype=np.int64), started=np.zeros(n, dtype=bool))
+
+def evaluate_segment(sig: np.ndarray, ret: np.ndarray, valid: np.ndarray, state: Optional[SegmentState]=None):
+    """
+    evaluate_signals over consecutive bar rows, resumable: pass the returned
+    state with the following rows to get exactly what evaluating both at once
+    gives. Returns ((trades, return_pct, max_dd_pct), state).
+    """
+    state = state or SegmentState.fresh(sig.shape[1])
+    sig = np.where(valid, sig, 0.0)
+    pos = np.empty_like(sig)
+    pos[:1] = state.sig
+    pos[1:] = sig[:-1]
+    growth = 1 + np.where(valid, pos * ret, 0.0)
+    growth[:1] *= state.equity
+    equity = np.cumprod(growth, axis=0)
+    peak = np.maximum.accumulate(np.vstack([state.peak, equity]), axis=0)[1:]
+    max_dd = np.minimum(state.max_dd, (equity / peak - 1.0).min(axis=0, initial=0.0))
+    changes = np.zeros_like(sig)
+    changes[:1] = np.where(state.started, sig[:1] - state.sig, 0.0)
+    changes[1:] = np.diff(sig, axis=0)
+    trades = state.trades + ((changes != 0) & valid).sum(axis=0)
+    seen = valid.any(axis=0)
+    last = np.maximum(valid.sum(axis=0) - 1, 0)
+    cols = np.arange(sig.shape[1])
+    end = equity[last, cols] if len(sig) else state.equity
+    state = SegmentState(sig=np.where(seen, sig[last, cols] if len(sig) else 0.0, state.sig),
+                         equity=np.where(seen, end, state.equity), peak=peak[-1] if len(sig) else state.peak,
+                         max_dd=max_dd, trades=trades, started=state.started | seen)
+    return (trades, (state.equity - 1) * 100.0, max_dd * 100.0), state
+
+def evaluate_signals(sig: np.ndarray, ret: np.ndarray, valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns per-symbol (trades, return_pct, max_dd_pct) for a bar-space signal matrix."""
+    return evaluate_segment(sig, ret, valid)[0]
+
+# Without numba, universes at least this wide are faster stepped row by row across symbols
+_ROW_VECTOR_MIN_SYMBOLS = 16
+
+def fill_price(price, side: str, slippage_bps: float):
+    """Execution price for a market order at `price`: buys fill higher, sells lower."""
+    slip = slippage_bps / 10_000.0
+    return price * (1 + slip) if side == "buy" else price * (1 - slip)
+
+@(njit(cache=True) if njit else (lambda f: f))
+def _paper_kernel(bars, sig, starting_cash, cash_per_trade, stop_loss_pct, take_profit_pct, fee_rate, slip,
+                  trades, fees, final_equity, max_dd):
+    """paper_loop's rules over one symbol at a time with scalar state; compiled by numba when installed."""
+    n_rows, n = bars.shape
+    for j in range(n):
+        cash = starting_cash
+        pos = 0.0
+        entry = 0.0
+        peak = cash
+        dd = 0.0
+        last_price = 0.0
+        for k in range(n_rows):
+            price = bars[k, j]
+            if price == price:
+                s = sig[k, j]
+                held = pos > 0
+                exit_ = held and (price <= entry * (1 - stop_loss_pct) or price >= entry * (1 + take_profit_pct))
+                if not exit_ and s == 1 and cash > 0:
+                    px = price * (1 + slip)
+                    qty = cash_per_trade / px
+                    fee = qty * px * fee_rate
+                    cash -= qty * px + fee
+                    pos += qty
+                    entry = px
+                    fees[j] += fee
+                    trades[j] += 1
+                elif held and (exit_ or s == 0):
+                    px = price * (1 - slip)
+                    gross = pos * px
+                    fee = gross * fee_rate
+                    cash += gross - fee
+                    pos = 0.0
+                    entry = 0.0
+                    fees[j] += fee
+                    trades[j] += 1
+                last_price = price
+            equity = cash + pos * last_price
+            peak = max(peak, equity)
+            dd = min(dd, equity / peak - 1.0)
+        final_equity[j] = cash + pos * last_price
+        max_dd[j] = dd
+
+def _simulate_rows(bars, sig, starting_cash, cash_per_trade, stop_loss_pct, take_profit_pct, fee_rate, slippage_bps,
+                   trades, fees, final_equity, max_dd):
+    """Same rules as _paper_kernel, stepping all symbols together one row at a time."""
+    n_rows, n = bars.shape
+    cash = np.full(n, float(starting_cash))
+    pos = np.zeros(n)
+    entry = np.zeros(n)
+    peak = cash.copy()
+    last_price = np.zeros(n)
+    valid = ~np.isnan(bars)
+    for k in range(n_rows):
+        live = valid[k]
+        price = np.where(live, bars[k], last_price)
+        s = sig[k]
+        held = pos > 0
+        exit_ = live & held & ((price <= entry * (1 - stop_loss_pct)) | (price >= entry * (1 + take_profit_pct)))
+        buy = live & ~exit_ & (s == 1) & (cash > 0)
+        sell = live & held & (exit_ | (~buy & (s == 0)))
+        if buy.any():
+            px = fill_price(price[buy], "buy", slippage_bps)
+            qty = cash_per_trade / px
+            fee = qty * px * fee_rate
+            cash[buy] -= qty * px + fee
+            pos[buy] += qty
+            entry[buy] = px
+            fees[buy] += fee
+            trades[buy] += 1
+        if sell.any():
+            px = fill_price(price[sell], "sell", slippage_bps)
+            gross = pos[sell] * px
+            fee = gross * fee_rate
+            cash[sell] += gross - fee
+            pos[sell] = 0.0
+            entry[sell] = 0.0
+            fees[sell] += fee
+            trades[sell] += 1
+        last_price = price
+        equity = cash + pos * price
+        np.maximum(peak, equity, out=peak)
+        np.minimum(max_dd, equity / peak - 1.0, out=max_dd)
+    final_equity[:] = cash + pos * last_price
+
+def simulate_paper(
+    bars: np.ndarray,
+    sig: np.ndarray,
+    starting_cash: float,
+    cash_per_trade: float=100.0,
+    stop_loss_pct: float=0.05,
+    take_profit_pct: float=0.1,
+    fee_rate: float=0.0,
+    slippage_bps: float=0.0,
+) -> Dict[str, np.ndarray]:
+    """
+    Replays bar-space closes through paper_loop's rules for every symbol:
+    SL/TP against the entry fill, a BUY of `cash_per_trade` on each bar the
+    signal is 1 while cash lasts, and a SELL of the whole position when it is 0.
+    Each symbol trades its own `starting_cash`. With numba installed the
+    per-bar loop is compiled; without it wide universes step all symbols
+    together per row and narrow ones run the scalar loop in Python.
+    """
+    n = bars.shape[1]
+    trades = np.zeros(n, dtype=np.int64)
+    fees = np.zeros(n)
+    final_equity = np.zeros(n)
+    max_dd = np.zeros(n)
+    args = (float(starting_cash), float(cash_per_trade), float(stop_loss_pct), float(take_profit_pct), float(fee_rate))
+    if njit or n < _ROW_VECTOR_MIN_SYMBOLS:
+        _paper_kernel(np.asarray(bars, dtype=np.float64), np.asarray(sig, dtype=np.float64), *args,
+                      slippage_bps / 10_000.0, trades, fees, final_equity, max_dd)
+    else:
+        _simulate_rows(bars, sig, *args, slippage_bps, trades, fees, final_equity, max_dd)
+    return dict(trades=trades, fees=fees, final_equity=final_equity,
+                return_pct=(final_equity / starting_cash - 1) * 100.0, max_dd_pct=max_dd * 100.0)
+
+def _default_params() -> dict:
+    return dict(fast=20, slow=50, rsi_period=14, rsi_oversold=30, rsi_overbought=70)
+
+@metrics.timed("backtest_seconds", kind="grid")
+def run_backtest_grid(
+    database_url: str,
+    param_grid: List[dict],
+    timeframe: str="1h",
+    strategy_name: str="sma_crossover",
+    quote: str | None = None,
+    top: int | None = 20,
+    symbols: Optional[List[str]] = None,
+    pm: Optional[PriceMatrix] = None,
+) -> pd.DataFrame:
+    """
+    Batched counterpart of run_backtest: evaluates every symbol against every
+    parameter combo in `param_grid` using one price matrix. Each combo is a dict
+    of strategy kwargs; missing keys fall back to run_backtest's defaults. Rows
+    match what run_backtest would report for the same symbol and parameters.
+    """
+    if pm is None:
+        conn = get_conn(database_url)
+        if symbols is None:
+            symbols = get_symbols(conn, cfg.exchange, quote=quote)
+            symbols = symbols[: top or len(symbols)]
+        pm = load_price_matrix(conn, cfg.exchange, symbols, timeframe)
+    if not pm.symbols:
+        return pd.DataFrame()
+
+    bars, lengths = stack_bars(pm)
+    valid = ~np.isnan(bars)
+    ret = bar_returns(bars)
+    cache = IndicatorCache(bars)
+
+    rows = []
+    for combo in param_grid:
+        params = {**_default_params(), **combo}
+        min_len = max(params["fast"], params["slow"], params["rsi_period"]) + 2
+        sig = grid_signals(cache, strategy_name, params)
+        trades, ret_pct, max_dd_pct = evaluate_signals(sig, ret, valid)
+        for j, symbol in enumerate(pm.symbols):
+            if lengths[j] < min_len:
+                continue
+            rows.append(dict(combo, symbol=symbol, trades=int(trades[j]),
+                             return_pct=round(float(ret_pct[j]), 2), max_dd_pct=round(float(max_dd_pct[j]), 2)))
+
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("return_pct", ascending=False).reset_index(drop=True)
+
+@metrics.timed("backtest_seconds", kind="event")
+def run_event_backtest(
+    database_url: str,
+    timeframe: str="1h",
+    strategy_name: str="sma_crossover",
+    params: Optional[dict] = None,
+    cash_per_trade: float=100.0,
+    stop_loss_pct: float=0.05,
+    take_profit_pct: float=0.1,
+    fee_rate: Optional[float] = None,
+    slippage_bps: Optional[float] = None,
+    quote: str | None = None,
+    top: int | None = 20,
+    symbols: Optional[List[str]] = None,
+    pm: Optional[PriceMatrix] = None,
+) -> pd.DataFrame:
+    """
+    Bar-by-bar backtest that trades like paper_loop (stop-loss/take-profit,
+    fixed cash per buy, fees and slippage), so its results line up with paper
+    trading rather than with the frictionless always-in-the-market model of
+    run_backtest. Fee and slippage default to the paper trading settings.
+    """
+    fee_rate = cfg.paper_fee_rate if fee_rate is None else fee_rate
+    slippage_bps = cfg.paper_slippage_bps if slippage_bps is None else slippage_bps
+    if pm is None:
+        conn = get_conn(database_url)
+        if symbols is None:
+            symbols = get_symbols(conn, cfg.exchange, quote=quote)
+            symbols = symbols[: top or len(symbols)]
+        pm = load_price_matrix(conn, cfg.exchange, symbols, timeframe)
+    if not pm.symbols:
+        return pd.DataFrame()
+
+    params = {**_default_params(), **(params or {})}
+    bars, lengths = stack_bars(pm)
+    sig = grid_signals(IndicatorCache(bars), strategy_name, params)
+    res = simulate_paper(bars, sig, cfg.paper_starting_cash, cash_per_trade, stop_loss_pct, take_profit_pct,
+                         fee_rate, slippage_bps)
+
+    min_len = max(params["fast"], params["slow"], params["rsi_period"]) + 2
+    rows = [dict(symbol=symbol, trades=int(res["trades"][j]), fees=round(float(res["fees"][j]), 4),
+                 final_equity=round(float(res["final_equity"][j]), 2),
+                 return_pct=round(float(res["return_pct"][j]), 2), max_dd_pct=round(float(res["max_dd_pct"][j]), 2))
+            for j, symbol in enumerate(pm.symbols) if lengths[j] >= min_len]
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("return_pct", ascending=False).reset_index(drop=True)
+
+@metrics.timed("backtest_seconds", kind="vectorized")
 def run_backtest(
     database_url: str,
     timeframe: str="1h",
@@ -0,0 +1,29 @@
+import argparse
+import json
+import sys
+from .suite import BENCHMARKS, compare, run
+
+p = argparse.ArgumentParser(description="Run hot-path benchmarks on synthetic candles, or compare two JSON reports")
+p.add_argument("--symbols", type=int, default=20)
+p.add_argument("--bars", type=int, default=5000)
+p.add_argument("--timeframes", type=str, default="1h", help="Comma-separated; the first is the one read and backtested")
+p.add_argument("--seed", type=int, default=0)
+p.add_argument("--repeat", type=int, default=10)
+p.add_argument("--only", type=str, default=None, help=f"Comma-separated subset of {','.join(BENCHMARKS)}")
+p.add_argument("--out", type=str, default=None, help="Write the JSON report here (default: stdout)")
+p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two reports instead of running")
+p.add_argument("--threshold", type=float, default=0.10, help="Relative change that counts as a regression")
+args = p.parse_args()
+
+if args.compare:
+    with open(args.compare[0]) as f, open(args.compare[1]) as g:
+        rows = compare(json.load(f), json.load(g), args.threshold)
+    for r in rows:
+        flag = "REGRESSION" if r["regression"] else ""
+        print(f"{r['metric']:<50} {r['old']:>14g} {r['new']:>14g} {r['change_pct']:>+7.1f}% {flag}")
+    sys.exit(1 if any(r["regression"] for r in rows) else 0)
+
+report = run(args.symbols, args.bars, [t.strip() for t in args.timeframes.split(",")], args.seed, args.repeat,
+             only=args.only.split(",") if args.only else None, out=args.out)
+if not args.out:
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,179 @@
+"""
+Hot-path benchmarks over deterministic synthetic candles. Each run builds a
+fresh database in a temp directory, so results depend only on the parameters
+and the code under test.
+
+    python -m bot.bench --symbols 20 --bars 5000 --out bench.json
+    python -m bot.bench --compare old.json bench.json
+"""
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+from ..config import cfg
+from .synthetic import symbols as synthetic_symbols, synthetic_rows
+
+def _stats(samples: List[float]) -> dict:
+    a = np.asarray(samples) * 1000
+    return dict(n=len(a), mean_ms=round(float(a.mean()), 3), p50_ms=round(float(np.percentile(a, 50)), 3),
+                p95_ms=round(float(np.percentile(a, 95)), 3), min_ms=round(float(a.min()), 3))
+
+def _time(fn: Callable[[], object], repeat: int) -> List[float]:
+    fn()  # warm-up: lazy imports, page cache, first-use allocations
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+class Context:
+    def __init__(self, n_symbols: int, bars: int, timeframes: Sequence[str], seed: int, repeat: int, root: str):
+        self.n_symbols, self.bars, self.timeframes, self.seed, self.repeat = n_symbols, bars, list(timeframes), seed, repeat
+        self.root = root
+        self.symbols = synthetic_symbols(n_symbols)
+        self.timeframe = self.timeframes[0]
+
+def bench_ingest(ctx: Context) -> dict:
+    """Insert rate of bulk_insert_candles in 1000-row batches, the size a klines page delivers."""
+    from ..db import bulk_insert_candles, get_conn
+    rows = list(synthetic_rows(ctx.n_symbols, ctx.bars, ctx.timeframes, ctx.seed, cfg.exchange))
+    conn = get_conn(cfg.database_url)
+    t0 = time.perf_counter()
+    for i in range(0, len(rows), 1000):
+        bulk_insert_candles(conn, rows[i:i + 1000])
+    dt = time.perf_counter() - t0
+    return dict(rows=len(rows), seconds=round(dt, 3), rows_per_sec=round(len(rows) / dt, 1))
+
+def bench_read(ctx: Context) -> dict:
+    """Latency of full-series reads, as the backtests and the webapp do them."""
+    from ..db import get_candles_arrays, get_candles_df, get_conn
+    conn = get_conn(cfg.database_url)
+    sym = ctx.symbols[0]
+    return dict(
+        get_candles_df=_stats(_time(lambda: get_candles_df(conn, cfg.exchange, sym, ctx.timeframe), ctx.repeat)),
+        get_candles_arrays=_stats(_time(lambda: get_candles_arrays(conn, cfg.exchange, sym, ctx.timeframe), ctx.repeat)),
+        get_candles_arrays_500=_stats(_time(lambda: get_candles_arrays(conn, cfg.exchange, sym, ctx.timeframe, limit=500), ctx.repeat)),
+    )
+
+def bench_strategy(ctx: Context) -> dict:
+    """generate_signals time on one symbol's full history."""
+    from ..db import get_candles_df, get_conn
+    from ..strategy import RSIStrategy, SMACrossoverStrategy
+    df = get_candles_df(get_conn(cfg.database_url), cfg.exchange, ctx.symbols[0], ctx.timeframe)
+    out = {}
+    for name, strategy in (("sma_crossover", SMACrossoverStrategy()), ("rsi", RSIStrategy())):
+        s = _stats(_time(lambda: strategy.generate_signals(df), ctx.repeat))
+        s["bars_per_sec"] = round(len(df) / (s["p50_ms"] / 1000), 1) if s["p50_ms"] else None
+        out[name] = s
+    return out
+
+def bench_backtest(ctx: Context) -> dict:
+    """Bars per second through run_backtest, run_backtest_grid (10 combos) and run_event_backtest."""
+    from ..backtest import run_backtest, run_backtest_grid, run_event_backtest
+    total = ctx.n_symbols * ctx.bars
+    grid = [dict(fast=f, slow=s) for f in (5, 10, 20, 30, 40) for s in (50, 100)]
+    out = {}
+    runs = (
+        ("run_backtest", lambda: run_backtest(cfg.database_url, ctx.timeframe, top=None), total),
+        ("run_backtest_grid", lambda: run_backtest_grid(cfg.database_url, grid, ctx.timeframe, symbols=ctx.symbols), total * len(grid)),
+        ("run_event_backtest", lambda: run_event_backtest(cfg.database_url, ctx.timeframe, symbols=ctx.symbols), total),
+    )
+    for name, fn, bars in runs:
+        s = _stats(_time(fn, max(1, ctx.repeat // 2)))
+        s["bars_per_sec"] = round(bars / (s["p50_ms"] / 1000), 1)
+        out[name] = s
+    return out
+
+def bench_api(ctx: Context) -> dict:
+    """/api/ohlcv latency through the Flask test client: first request, cached repeat, and 304 revalidation."""
+    from ..cache import ohlcv_cache
+    from ..webapp import create_app
+    client = create_app(watch_store=False).test_client()
+    url = f"/api/ohlcv?symbol={ctx.symbols[0]}&timeframe={ctx.timeframe}&limit=5000&points=1000&format=columns"
+    def cold():
+        ohlcv_cache.discard_if(lambda k: True)
+        client.get(url)
+    etag = client.get(url).headers.get("ETag")
+    return dict(
+        uncached=_stats(_time(cold, ctx.repeat)),
+        cached=_stats(_time(lambda: client.get(url), ctx.repeat)),
+        not_modified=_stats(_time(lambda: client.get(url, headers={"If-None-Match": etag}), ctx.repeat)),
+    )
+
+# Ingest runs first: the other benchmarks read what it wrote
+BENCHMARKS: Dict[str, Callable[[Context], dict]] = {
+    "ingest": bench_ingest,
+    "read": bench_read,
+    "strategy": bench_strategy,
+    "backtest": bench_backtest,
+    "api": bench_api,
+}
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(__file__)).decode().strip()
+    except Exception:
+        return None
+
+def run(n_symbols: int = 20, bars: int = 5000, timeframes: Sequence[str] = ("1h",), seed: int = 0, repeat: int = 10,
+        only: Optional[Sequence[str]] = None, out: Optional[str] = None) -> dict:
+    """Runs the selected benchmarks against a throwaway database and returns (and optionally writes) the JSON report."""
+    from ..db import upsert_market, get_conn, init_schema
+    saved = (cfg.database_url, cfg.candle_store_dir)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as root:
+        cfg.database_url = f"sqlite:///{os.path.join(root, 'bench.db')}"
+        cfg.candle_store_dir = os.path.join(root, "candle_store")
+        try:
+            conn = get_conn(cfg.database_url)
+            init_schema(conn)
+            for sym in synthetic_symbols(n_symbols):
+                upsert_market(conn, (cfg.exchange, sym, sym.split("/")[0], sym.split("/")[1], 1))
+            ctx = Context(n_symbols, bars, timeframes, seed, repeat, root)
+            for name, fn in BENCHMARKS.items():
+                if name == "ingest" or not only or name in only:
+                    print(f"[bench] {name}...")
+                    results[name] = fn(ctx)
+        finally:
+            cfg.database_url, cfg.candle_store_dir = saved
+    report = dict(
+        meta=dict(ts=int(time.time()), git=_git_rev(), python=platform.python_version(), platform=platform.platform(),
+                  candle_store=cfg.candle_store, write_queue=cfg.write_queue, metrics=cfg.metrics),
+        params=dict(symbols=n_symbols, bars=bars, timeframes=list(timeframes), seed=seed, repeat=repeat),
+        results=results,
+    )
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+def _flatten(d: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for k, v in d.items():
+        if isinstance(v, dict):
+            flat.update(_flatten(v, f"{prefix}{k}."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            flat[prefix + k] = v
+    return flat
+
+def compare(old: dict, new: dict, threshold: float = 0.10) -> List[dict]:
+    """
+    Per-metric changes between two reports on p50 latencies and rates. A change
+    is a regression when it is worse by more than `threshold`.
+    """
+    a, b = _flatten(old["results"]), _flatten(new["results"])
+    rows = []
+    for key in sorted(a.keys() & b.keys()):
+        leaf = key.rsplit(".", 1)[-1]
+        if leaf not in ("p50_ms", "rows_per_sec", "bars_per_sec") or not a[key] or b[key] is None:
+            continue
+        change = b[key] / a[key] - 1
+        worse = change > threshold if leaf.endswith("_ms") else change < -threshold
+        rows.append(dict(metric=key, old=a[key], new=b[key], change_pct=round(change * 100, 1), regression=worse))
+    return rows
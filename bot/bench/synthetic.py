@@ -0,0 +1,37 @@
+import zlib
+from typing import Iterator, List, Sequence, Tuple
+import numpy as np
+from ..timeframes import timeframe_ms
+
+START_MS = 1_600_000_000_000
+
+def symbols(n: int, quote: str = "USDT") -> List[str]:
+    return [f"SYN{i:03d}/{quote}" for i in range(n)]
+
+def synthetic_ohlcv(symbol: str, bars: int, timeframe: str = "1h", seed: int = 0,
+                    start_ms: int = START_MS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Deterministic (ts, ohlcv) for one symbol: a geometric random walk with
+    intrabar ranges and lognormal volume. The stream depends only on
+    (seed, symbol, timeframe), so adding symbols never changes existing ones.
+    """
+    rng = np.random.default_rng([seed, zlib.crc32(f"{symbol}|{timeframe}".encode())])
+    step = timeframe_ms(timeframe)
+    ts = start_ms // step * step + np.arange(bars, dtype=np.int64) * step
+    vol = 0.002 * np.sqrt(step / 60_000)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, vol, bars)))
+    open_ = np.r_[close[0], close[:-1]]
+    wick = np.abs(rng.normal(0, vol / 2, (2, bars)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(3, 1, bars)
+    return ts, np.column_stack([open_, high, low, close, volume])
+
+def synthetic_rows(n_symbols: int, bars: int, timeframes: Sequence[str] = ("1h",), seed: int = 0,
+                   exchange: str = "binance") -> Iterator[Tuple[str, str, str, int, float, float, float, float, float]]:
+    """Candle rows for symbols x timeframes x bars, in bulk_insert_candles' tuple layout."""
+    for tf in timeframes:
+        for symbol in symbols(n_symbols):
+            ts, ohlcv = synthetic_ohlcv(symbol, bars, tf, seed)
+            for t, (o, h, l, c, v) in zip(ts.tolist(), ohlcv.tolist()):
+                yield (exchange, symbol, tf, t, o, h, l, c, v)
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+from .db import add_candle_listener
+
+class LRUCache:
+    """Thread-safe LRU of byte payloads, evicting least recently used entries beyond `max_bytes`."""
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[bytes, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, Any]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes, meta: Any = None) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._data[key] = (body, meta)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def discard_if(self, pred: Callable[[Hashable], bool]) -> None:
+        with self._lock:
+            for key in [k for k in self._data if pred(k)]:
+                self.size -= len(self._data.pop(key)[0])
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire `ttl_s` seconds after they are stored; oldest go first beyond `max_entries`."""
+    def __init__(self, ttl_s: float = 3600.0, max_entries: int = 10_000):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (now + self.ttl_s, value)
+            # Entries are in insertion order with one TTL, so expired ones are at the front
+            while self._data and (len(self._data) > self.max_entries or next(iter(self._data.values()))[0] <= now):
+                self._data.popitem(last=False)
+
+class SeriesVersions:
+    """
+    Latest-candle markers per (symbol, ...) key. A marker is loaded from the
+    database once and then trusted until candles for that symbol are written in
+    this process, or for `ttl_s` seconds to pick up writes from other processes.
+    """
+    def __init__(self, ttl_s: float = 5.0):
+        self.ttl_s = ttl_s
+        self._data: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and now - entry[1] < self.ttl_s:
+                return entry[0]
+        value = loader()
+        with self._lock:
+            self._data[key] = (value, now)
+        return value
+
+    def invalidate_symbol(self, symbol: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k[0] == symbol]:
+                del self._data[key]
+
+ohlcv_cache = LRUCache()
+ohlcv_versions = SeriesVersions()
+
+def _on_candles(conn, rows) -> None:
+    symbols = {r[1] for r in rows}
+    for symbol in symbols:
+        ohlcv_versions.invalidate_symbol(symbol)
+    # Cached bodies are keyed by version too; dropping them just frees memory sooner
+    ohlcv_cache.discard_if(lambda k: k[0] in symbols)
+
+add_candle_listener(_on_candles)
@@ -0,0 +1,42 @@
+import time
+from typing import Callable, Optional
+
+class Clock:
+    """Wall-clock time. The trading loops take a clock so a replay can drive them on simulated time."""
+    def now_ms(self) -> int:
+        return int(time.time() * 1000)
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+WALL_CLOCK = Clock()
+
+class ReplayFinished(BaseException):
+    """
+    Raised out of a loop's sleep once a SimClock passes the end of the replayed
+    data. A BaseException, so the loops' `except Exception` handlers let it through.
+    """
+
+class SimClock(Clock):
+    """
+    Simulated time that only moves when a loop sleeps: sleep() advances it and
+    returns at once, so a loop runs as fast as its own work allows. Passing
+    `end_ms` raises ReplayFinished; `on_advance(now_ms)` runs after each step.
+    """
+    def __init__(self, start_ms: int, end_ms: Optional[int]=None, on_advance: Optional[Callable[[int], None]]=None):
+        self.t = int(start_ms)
+        self.start_ms = int(start_ms)
+        self.end_ms = end_ms
+        self.on_advance = on_advance
+        self.sleeps = 0
+
+    def now_ms(self) -> int:
+        return self.t
+
+    def sleep(self, seconds: float) -> None:
+        self.t += max(1, int(seconds * 1000))
+        self.sleeps += 1
+        if self.end_ms is not None and self.t > self.end_ms:
+            raise ReplayFinished()
+        if self.on_advance is not None:
+            self.on_advance(self.t)
@@ -0,0 +1,200 @@
+import contextlib
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote as _quote, unquote as _unquote
+import numpy as np
+from .config import cfg
+try:
+    import fcntl
+except ImportError:  # no advisory locks (Windows); merges are then not isolated from readers
+    fcntl = None
+
+# Per partition: ts.i8 holds int64 ms timestamps, ohlcv.f8 a row-major (n, 5) float64 array.
+# ts.i8 is always written last, so a partition holds min(ts rows, ohlcv rows) complete bars.
+
+@contextlib.contextmanager
+def _locked(part: str, exclusive: bool):
+    """Advisory lock on the partition: writers hold it exclusively while swapping files, readers shared while opening them."""
+    path = os.path.join(part, ".lock")
+    try:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT) if exclusive else os.open(path, os.O_RDONLY)
+    except OSError:
+        yield  # read-only store or partition without a lock file yet
+        return
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
+
+class ColumnarCandleStore:
+    """
+    File-backed candle store: one directory per (exchange, symbol, timeframe),
+    split into monthly partitions of raw little-endian arrays read via numpy.memmap.
+    Appends of bars newer than a partition's last bar are plain file appends;
+    out-of-order bars rewrite only the partition they fall in. Assumes a single
+    writer process, like the SQLite path.
+    """
+    def __init__(self, root: str):
+        self.root = root
+
+    def _series_dir(self, exchange: str, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.root, _quote(exchange, safe=""), _quote(symbol, safe=""), timeframe)
+
+    def partitions(self, exchange: str, symbol: str, timeframe: str) -> List[str]:
+        d = self._series_dir(exchange, symbol, timeframe)
+        if not os.path.isdir(d):
+            return []
+        return [os.path.join(d, p) for p in sorted(os.listdir(d)) if os.path.exists(os.path.join(d, p, "ts.i8"))]
+
+    @staticmethod
+    def _rows(part: str) -> int:
+        return min(os.path.getsize(os.path.join(part, "ts.i8")) // 8, os.path.getsize(os.path.join(part, "ohlcv.f8")) // 40)
+
+    @classmethod
+    def _open(cls, part: str) -> Tuple[np.ndarray, np.ndarray]:
+        with _locked(part, exclusive=False):
+            n = cls._rows(part)
+            if n == 0:
+                return np.empty(0, dtype="<i8"), np.empty((0, 5), dtype="<f8")
+            ts = np.memmap(os.path.join(part, "ts.i8"), dtype="<i8", mode="r", shape=(n,))
+            ohlcv = np.memmap(os.path.join(part, "ohlcv.f8"), dtype="<f8", mode="r", shape=(n, 5))
+        return ts, ohlcv
+
+    def read_partitions(self, exchange: str, symbol: str, timeframe: str) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Zero-copy (ts, ohlcv) memmaps, one pair per monthly partition, oldest first."""
+        return [self._open(p) for p in self.partitions(exchange, symbol, timeframe)]
+
+    def read(self, exchange: str, symbol: str, timeframe: str, after_ts: Optional[int]=None) -> Tuple[np.ndarray, np.ndarray]:
+        parts = self.read_partitions(exchange, symbol, timeframe)
+        if after_ts is not None:
+            parts = [(ts, a) for ts, a in parts if len(ts) and ts[-1] > after_ts]
+            if parts:
+                i = int(np.searchsorted(parts[0][0], after_ts, side="right"))
+                parts[0] = (parts[0][0][i:], parts[0][1][i:])
+        if not parts:
+            return np.empty(0, dtype="<i8"), np.empty((0, 5), dtype="<f8")
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def latest_ts(self, exchange: str, symbol: str, timeframe: str) -> Optional[int]:
+        for part in reversed(self.partitions(exchange, symbol, timeframe)):
+            ts, _ = self._open(part)
+            if len(ts):
+                return int(ts[-1])
+        return None
+
+    def version(self, exchange: str, symbol: str, timeframe: str) -> Optional[tuple]:
+        """Changes whenever a partition of the series is appended to or rewritten."""
+        stats = [os.stat(os.path.join(p, "ohlcv.f8")) for p in self.partitions(exchange, symbol, timeframe)]
+        return tuple((st.st_ino, st.st_size, st.st_mtime_ns) for st in stats) or None
+
+    def timeframes(self, exchange: str, symbol: str) -> List[str]:
+        d = os.path.dirname(self._series_dir(exchange, symbol, "_"))
+        return sorted(os.listdir(d)) if os.path.isdir(d) else []
+
+    def latest_close(self, exchange: str, symbol: str) -> Optional[float]:
+        best = None
+        for tf in self.timeframes(exchange, symbol):
+            parts = self.partitions(exchange, symbol, tf)
+            if parts:
+                ts, ohlcv = self._open(parts[-1])
+                if len(ts) and (best is None or ts[-1] > best[0]):
+                    best = (int(ts[-1]), float(ohlcv[-1, 3]))
+        return best[1] if best else None
+
+    def symbols(self, exchange: str) -> List[str]:
+        d = os.path.join(self.root, _quote(exchange, safe=""))
+        return sorted(_unquote(s) for s in os.listdir(d)) if os.path.isdir(d) else []
+
+    def append(self, rows: Iterable[Tuple[str, str, str, int, float, float, float, float, float]], replace: bool=False) -> int:
+        """Inserts bars, ignoring (or with replace=True, overwriting) any whose ts is already stored. Returns rows written."""
+        series: Dict[Tuple[str, str, str], list] = {}
+        for ex, sym, tf, ts, o, h, l, c, v in rows:
+            series.setdefault((ex, sym, tf), []).append((ts, o, h, l, c, v))
+        written = 0
+        for (ex, sym, tf), bars in series.items():
+            arr = np.array(bars, dtype=float)
+            ts = arr[:, 0].astype("<i8")
+            ts, first = np.unique(ts, return_index=True)
+            ohlcv = np.ascontiguousarray(arr[first, 1:], dtype="<f8")
+            month = ts.astype("datetime64[ms]").astype("datetime64[M]")
+            d = self._series_dir(ex, sym, tf)
+            for m in np.unique(month):
+                sel = month == m
+                written += self._append_partition(os.path.join(d, str(m)), ts[sel], ohlcv[sel], replace)
+        return written
+
+    def _append_partition(self, part: str, ts: np.ndarray, ohlcv: np.ndarray, replace: bool=False) -> int:
+        os.makedirs(part, exist_ok=True)
+        ts_path, ohlcv_path = os.path.join(part, "ts.i8"), os.path.join(part, "ohlcv.f8")
+        if not os.path.exists(ts_path):
+            open(os.path.join(part, ".lock"), "ab").close()
+            open(ohlcv_path, "wb").close()
+            open(ts_path, "wb").close()
+        else:
+            # Drop a torn tail left by a crash between the two appends
+            n = self._rows(part)
+            for path, size in ((ohlcv_path, n * 40), (ts_path, n * 8)):
+                if os.path.getsize(path) > size:
+                    os.truncate(path, size)
+        old_ts, old_ohlcv = self._open(part)
+        updated = 0
+        if len(old_ts):
+            new = ~np.isin(ts, old_ts)
+            if replace and not new.all():
+                # Stored bars are rewritten in place; the file layout does not change
+                pos = np.searchsorted(old_ts, ts[~new])
+                out = np.memmap(ohlcv_path, dtype="<f8", mode="r+", shape=old_ohlcv.shape)
+                out[pos] = ohlcv[~new]
+                out.flush()
+                del out
+                updated = int((~new).sum())
+            ts, ohlcv = ts[new], ohlcv[new]
+        if not len(ts):
+            return updated
+        if not len(old_ts) or ts[0] > old_ts[-1]:
+            # Rows become visible only once their timestamps land
+            with open(ohlcv_path, "ab") as f:
+                f.write(ohlcv.tobytes())
+            with open(ts_path, "ab") as f:
+                f.write(ts.tobytes())
+            return updated + len(ts)
+        # Out-of-order bars: merge and atomically replace this partition only
+        all_ts = np.concatenate([old_ts, ts])
+        order = np.argsort(all_ts, kind="stable")
+        merged_ts = all_ts[order]
+        merged = np.concatenate([old_ohlcv, ohlcv])[order]
+        del old_ts, old_ohlcv
+        for path, data in ((ts_path, merged_ts), (ohlcv_path, merged)):
+            with open(path + ".tmp", "wb") as f:
+                f.write(np.ascontiguousarray(data).tobytes())
+        with _locked(part, exclusive=True):
+            os.replace(ohlcv_path + ".tmp", ohlcv_path)
+            os.replace(ts_path + ".tmp", ts_path)
+        return updated + len(ts)
+
+_stores: Dict[str, ColumnarCandleStore] = {}
+
+def get_columnar_store() -> Optional[ColumnarCandleStore]:
+    """The configured columnar store, or None when candles live in SQLite (the default)."""
+    if cfg.candle_store != "columnar":
+        return None
+    if cfg.candle_store_dir not in _stores:
+        _stores[cfg.candle_store_dir] = ColumnarCandleStore(cfg.candle_store_dir)
+    return _stores[cfg.candle_store_dir]
+
+def export_sqlite_candles(conn, store: ColumnarCandleStore, batch: int=500_000) -> int:
+    """Copies every row of the SQLite candles table into the columnar store."""
+    cur = conn.execute(
+        "SELECT s.exchange, s.symbol, s.timeframe, c.ts, c.open, c.high, c.low, c.close, c.volume "
+        "FROM candle_series s JOIN candles c ON c.series_id=s.id ORDER BY s.exchange, s.symbol, s.timeframe, c.ts"
+    )
+    total = 0
+    while True:
+        rows = cur.fetchmany(batch)
+        if not rows:
+            return total
+        total += store.append(tuple(r) for r in rows)
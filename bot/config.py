@@ -7,7 +7,14 @@ load_dotenv()
 @dataclass
 class Config:
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///crypto_bot.db")
+    exchange: str = os.getenv("EXCHANGE", "binance")  # exchange whose stored candles strategies and backtests read
+    data_source_exchange: str = os.getenv("DATA_SOURCE_EXCHANGE", "binance")
+    default_quote: str = os.getenv("DEFAULT_QUOTE", "USDT")  # quote currency the scheduler and dashboard screen
+    exchange_api_key: str = os.getenv("EXCHANGE_API_KEY", "")  # for live orders on cfg.exchange
+    exchange_api_secret: str = os.getenv("EXCHANGE_API_SECRET", "")
     paper_starting_cash: float = float(os.getenv("PAPER_STARTING_CASH", "10000"))
+    paper_fee_rate: float = float(os.getenv("PAPER_FEE_RATE", "0.001"))  # taker fee as a fraction of notional
+    paper_slippage_bps: float = float(os.getenv("PAPER_SLIPPAGE_BPS", "0"))  # fills are this much worse than the close
     admin_token: str = os.getenv("ADMIN_TOKEN", "") # Optional: for securing the trade form
     
     # --- New Provider Configuration ---
@@ -16,4 +23,40 @@ class Config:
     uphold_pat: str = os.getenv("UPHOLD_PAT", "")
     sandbox: bool = os.getenv("SANDBOX", "true").lower() == "true"
 
+    # --- Candle storage: "sqlite" (default) or "columnar" (memory-mapped monthly partitions) ---
+    candle_store: str = os.getenv("CANDLE_STORE", "sqlite")
+    candle_store_dir: str = os.getenv("CANDLE_STORE_DIR", "candle_store")
+
+    # --- AI insights: provider is "gemini", "openai" or "stub" (offline, for tests) ---
+    ai_provider: str = os.getenv("AI_PROVIDER", "gemini")
+    gemini_api_key: str = os.getenv("GEMINI_API_KEY", "")
+    openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    insight_workers: int = int(os.getenv("INSIGHT_WORKERS", "4"))
+    insight_ttl_s: float = float(os.getenv("INSIGHT_TTL_S", "21600"))
+    prompt_token_budget: int = int(os.getenv("PROMPT_TOKEN_BUDGET", "600"))  # market data per prompt, split across symbols
+
+    # --- Metrics: counters/histograms at /metrics; METRICS_PORT also serves them from CLI processes ---
+    metrics: bool = os.getenv("METRICS", "true").lower() == "true"
+    metrics_port: int = int(os.getenv("METRICS_PORT", "0"))
+
+    # --- Live/Uphold loops read bars and tickers from the exchange WebSocket, polling REST only as a fallback ---
+    market_stream: bool = os.getenv("MARKET_STREAM", "true").lower() == "true"
+    market_ws_url: str = os.getenv("MARKET_WS_URL", "wss://stream.binance.com:9443")
+
+    # --- Exchange markets/tickers cache; one JSON file per exchange and field under the dir (empty: memory only) ---
+    metadata_cache_dir: str = os.getenv("METADATA_CACHE_DIR", "exchange_metadata")
+    metadata_markets_ttl_s: float = float(os.getenv("METADATA_MARKETS_TTL_S", "21600"))
+    metadata_tickers_ttl_s: float = float(os.getenv("METADATA_TICKERS_TTL_S", "120"))
+
+    # --- Scheduler worker pool shared by all jobs ---
+    scheduler_workers: int = int(os.getenv("SCHEDULER_WORKERS", "4"))
+
+    # --- Higher timeframes derived from stored 1m bars as they arrive; empty disables ---
+    aggregate_timeframes: str = os.getenv("AGGREGATE_TIMEFRAMES", "5m,15m,1h,4h,1d")
+    aggregate_grace_s: float = float(os.getenv("AGGREGATE_GRACE_S", "600"))  # missing 1m bars this far behind stored ones are taken as never coming
+
+    # --- Route db helper writes through one batching writer thread per database file ---
+    write_queue: bool = os.getenv("WRITE_QUEUE", "true").lower() == "true"
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "16"))  # read connections shared by web requests, per database
+
 cfg = Config()
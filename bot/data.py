@@ -1,8 +1,14 @@
+import asyncio
 import time
-from typing import List, Optional
-from .exchange import get_data_exchange
+from typing import Optional
+from .exchange import get_data_exchange, get_async_data_exchange
 from .db import get_conn, init_schema, get_symbols, bulk_insert_candles, get_latest_ts
 from .config import cfg
+from .metadata import metadata
+from . import metrics
+from . import aggregate  # noqa: F401 - derives higher timeframes as 1m bars are stored
+from .ratelimit import TokenBucket, bucket_for_exchange, binance_klines_weight
+from .timeframes import timeframe_ms
 
 def ingest_candles(
     database_url: str,
@@ -11,7 +17,8 @@ def ingest_candles(
     quote: Optional[str]=None,
     top_by_volume: Optional[int]=None,
     symbol_override: Optional[str]=None
-) -> None:
+) -> int:
+    """Fetches new closed bars for each symbol. Returns the number of rows stored."""
     ex = get_data_exchange()
     conn = get_conn(database_url)
     init_schema(conn)
@@ -22,26 +29,142 @@ def ingest_candles(
         symbols = get_symbols(conn, cfg.data_source_exchange, quote=quote)
         if top_by_volume:
             # Logic to filter by volume remains the same
-            all_tickers = ex.fetch_tickers()
+            all_tickers = metadata.tickers(ex)
             symbols = sorted(
                 [s for s in symbols if s in all_tickers],
                 key=lambda s: (all_tickers.get(s, {}).get("quoteVolume") or 0),
                 reverse=True
             )[:top_by_volume]
 
+    total = 0
     for symbol in symbols:
         since = get_latest_ts(conn, cfg.data_source_exchange, symbol, timeframe)
         if since is not None: since += 1
 
         try:
-            ohlcv = ex.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+            with metrics.exchange_call(ex.id, "fetch_ohlcv"):
+                ohlcv = ex.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+            # The still-forming bar is left for the next run: stored bars are never refetched
+            closed_before = int(time.time() * 1000) - timeframe_ms(timeframe)
             rows = []
             for ts, o, h, l, c, v in ohlcv:
-                rows.append((cfg.data_source_exchange, symbol, timeframe, int(ts), float(o), float(h), float(l), float(c), float(v)))
+                if ts <= closed_before:
+                    rows.append((cfg.data_source_exchange, symbol, timeframe, int(ts), float(o), float(h), float(l), float(c), float(v)))
             if rows:
                 bulk_insert_candles(conn, rows)
+                total += len(rows)
                 print(f"[ingest][{cfg.data_source_exchange}] {symbol}: +{len(rows)} rows")
         except Exception as e:
             print(f"[ingest][{cfg.data_source_exchange}] {symbol} failed: {e}")
         
         time.sleep(ex.rateLimit / 1000)
+    return total
+
+async def ingest_candles_async(
+    database_url: str,
+    timeframe: str="1h",
+    limit: int=500,
+    quote: Optional[str]=None,
+    top_by_volume: Optional[int]=None,
+    symbol_override: Optional[str]=None,
+    concurrency: int=8,
+    batch_rows: int=5000,
+    exchange=None,
+    bucket: Optional[TokenBucket]=None,
+    weight_per_minute: Optional[float]=None,
+) -> dict:
+    """
+    Concurrent version of ingest_candles. Up to `concurrency` fetches run at
+    once, all drawing request weight from one token bucket; a single writer task
+    batches their rows into bulk_insert_candles. `exchange` may be any object
+    with ccxt's async fetch_ohlcv/fetch_tickers (e.g. providers.fake_exchange).
+    Returns throughput stats.
+    """
+    ex = exchange or get_async_data_exchange()
+    bucket = bucket or bucket_for_exchange(ex, weight_per_minute)
+    conn = get_conn(database_url)
+    init_schema(conn)
+    started = time.perf_counter()
+
+    try:
+        if symbol_override:
+            symbols = [symbol_override]
+        else:
+            symbols = get_symbols(conn, cfg.data_source_exchange, quote=quote)
+            if top_by_volume:
+                async def fetch_tickers():
+                    await bucket.acquire_async(40)
+                    return await ex.fetch_tickers()
+                all_tickers = await metadata.get_async(ex, "tickers", fetch_tickers)
+                symbols = sorted(
+                    [s for s in symbols if s in all_tickers],
+                    key=lambda s: (all_tickers.get(s, {}).get("quoteVolume") or 0),
+                    reverse=True
+                )[:top_by_volume]
+
+        todo: asyncio.Queue = asyncio.Queue()
+        for symbol in symbols:
+            todo.put_nowait(symbol)
+        out: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 4)
+        stats = {"symbols": 0, "failed": 0, "rows": 0}
+
+        async def fetcher():
+            while True:
+                try:
+                    symbol = todo.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                since = get_latest_ts(conn, cfg.data_source_exchange, symbol, timeframe)
+                if since is not None: since += 1
+                try:
+                    await bucket.acquire_async(binance_klines_weight(limit))
+                    with metrics.exchange_call(ex.id, "fetch_ohlcv"):
+                        ohlcv = await ex.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+                    closed_before = int(time.time() * 1000) - timeframe_ms(timeframe)
+                    rows = [(cfg.data_source_exchange, symbol, timeframe, int(ts), float(o), float(h), float(l), float(c), float(v))
+                            for ts, o, h, l, c, v in ohlcv if ts <= closed_before]
+                    await out.put(rows)
+                    stats["symbols"] += 1
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"[ingest][{cfg.data_source_exchange}] {symbol} failed: {e}")
+
+        async def writer():
+            pending: list = []
+            while True:
+                rows = await out.get()
+                if rows is not None:
+                    pending.extend(rows)
+                if pending and (rows is None or len(pending) >= batch_rows or out.empty()):
+                    await asyncio.to_thread(bulk_insert_candles, conn, pending)
+                    stats["rows"] += len(pending)
+                    pending = []
+                if rows is None:
+                    return
+
+        async def produce():
+            await asyncio.gather(*(fetcher() for _ in range(max(1, concurrency))))
+            await out.put(None)
+
+        # A failed insert must not leave the fetchers blocked on the full queue: whichever side fails first cancels the other
+        done, pending = await asyncio.wait({asyncio.create_task(produce()), asyncio.create_task(writer())},
+                                           return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            task.result()
+    finally:
+        if exchange is None:
+            await ex.close()
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["symbols_per_sec"] = round(stats["symbols"] / elapsed, 2) if elapsed > 0 else 0.0
+    print(f"[ingest][{cfg.data_source_exchange}] {stats['symbols']} symbols, +{stats['rows']} rows "
+          f"in {stats['seconds']}s ({stats['symbols_per_sec']} symbols/s)")
+    return stats
+
+def ingest_candles_concurrent(database_url: str, **kwargs) -> dict:
+    """Blocking wrapper around ingest_candles_async for the scheduler and CLI."""
+    return asyncio.run(ingest_candles_async(database_url, **kwargs))
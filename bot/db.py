@@ -1,26 +1,200 @@
 import sqlite3
 import os
-from typing import Iterable, Tuple, List, Optional
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple, List, Optional, Union
 import json
+from .config import cfg
+from . import metrics
 
 def db_path_from_url(url: str) -> str:
     if not url.startswith("sqlite:///"):
         raise ValueError("Only sqlite:/// URLs are supported in this starter.")
     return url.replace("sqlite:///", "", 1)
 
+class BotConnection(sqlite3.Connection):
+    """sqlite3 connection that remembers its file so writes can be routed to its WriteQueue."""
+    database_path: str = ""
+
+# Per-connection settings. journal_mode=WAL persists in the file, so it is set once per path.
+TUNING_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA temp_store=MEMORY;",
+    "PRAGMA cache_size=-65536;",    # 64 MiB page cache
+    "PRAGMA mmap_size=268435456;",  # 256 MiB memory-mapped reads
+)
+
+_wal_paths: set = set()
+_prepared: set = set()
+_setup_lock = threading.Lock()
+_pool = threading.local()
+connections_opened = 0
+
+def tune_connection(conn: sqlite3.Connection) -> None:
+    for pragma in TUNING_PRAGMAS:
+        conn.execute(pragma)
+
 def get_conn(database_url: str) -> sqlite3.Connection:
+    global connections_opened
     path = db_path_from_url(database_url)
-    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    conn = sqlite3.connect(path, check_same_thread=False)
+    with _setup_lock:
+        if path not in _wal_paths:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, factory=BotConnection)
+    conn.database_path = path
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA synchronous=NORMAL;")
+    with _setup_lock:
+        if path not in _wal_paths:
+            conn.execute("PRAGMA journal_mode=WAL;")
+            _wal_paths.add(path)
+        connections_opened += 1
+    tune_connection(conn)
+    return conn
+
+def prepare_database(database_url: str) -> None:
+    """Creates the schema once per database per process; later calls are no-ops."""
+    path = db_path_from_url(database_url)
+    if path in _prepared:
+        return
+    conn = get_conn(database_url)
+    with _setup_lock:
+        if path not in _prepared:
+            init_schema(conn)
+            _prepared.add(path)
+    conn.close()
+
+def pooled_conn(database_url: str) -> sqlite3.Connection:
+    """
+    This thread's read connection for `database_url`, opened (and the schema
+    prepared) on first use and reused afterwards, for long-lived threads
+    (watchers, jobs). Writes made through the db helpers still go via the
+    database's single WriteQueue connection. Request handlers, which may get a
+    new thread per request, check one out of a ConnectionPool instead.
+    """
+    conns = getattr(_pool, "conns", None)
+    if conns is None:
+        conns = _pool.conns = {}
+    conn = conns.get(database_url)
+    if conn is None:
+        prepare_database(database_url)
+        conn = conns[database_url] = get_conn(database_url)
     return conn
 
+class ConnectionPool:
+    """
+    Up to `size` read connections to one database, shared by any threads: a
+    caller checks one out, uses it on its own and releases it. Connections are
+    opened (schema prepared, PRAGMAs applied) only when none is idle, so a
+    server that starts a thread per request still reuses them.
+    """
+    def __init__(self, database_url: str, size: int):
+        self.database_url = database_url
+        self.size = max(1, size)
+        self.opened = 0
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float=30.0) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self.opened < self.size
+            if grow:
+                self.opened += 1
+        if grow:
+            try:
+                prepare_database(self.database_url)
+                return get_conn(self.database_url)
+            except Exception:
+                with self._lock:
+                    self.opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free connection to {self.database_url} after {timeout}s") from None
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+_conn_pools: Dict[str, ConnectionPool] = {}
+
+def connection_pool(database_url: str) -> ConnectionPool:
+    with _setup_lock:
+        if database_url not in _conn_pools:
+            _conn_pools[database_url] = ConnectionPool(database_url, cfg.db_pool_size)
+        return _conn_pools[database_url]
+
+_batch = threading.local()
+
+def _write_queue(conn: sqlite3.Connection):
+    path = getattr(conn, "database_path", "")
+    if not cfg.write_queue or not path or path == ":memory:":
+        return None
+    from .writequeue import get_write_queue
+    return get_write_queue(path)
+
+def _write(conn: sqlite3.Connection, sql: str, params=(), many: bool=False) -> None:
+    """
+    Runs one write statement. Inside write_batch() it is deferred to the batch;
+    otherwise it goes through the file's WriteQueue and returns once committed,
+    or is executed and committed directly when the queue is disabled.
+    """
+    if many:
+        params = list(params)
+    _write_all(conn, [(sql, params, many)])
+
+def _write_all(conn: sqlite3.Connection, statements: list) -> None:
+    """Like _write for several (sql, params, many) statements that must commit together."""
+    pending = getattr(_batch, "statements", None)
+    if pending is not None:
+        pending.extend(statements)
+        return
+    wq = _write_queue(conn)
+    if wq is not None:
+        wq.submit(statements).result()
+        return
+    for sql, params, many in statements:
+        if many:
+            conn.executemany(sql, params)
+        else:
+            conn.execute(sql, params)
+    conn.commit()
+
+@contextmanager
+def write_batch(conn: sqlite3.Connection):
+    """Groups the db helper writes made inside the block into one transaction."""
+    if getattr(_batch, "statements", None) is not None:
+        yield  # nested: the outer batch commits
+        return
+    _batch.statements = []
+    try:
+        yield
+        statements = _batch.statements
+    finally:
+        _batch.statements = None
+    if statements:
+        _write_all(conn, statements)
+
+def _columnar():
+    """Columnar candle store when CANDLE_STORE=columnar, else None (SQLite candles)."""
+    from .colstore import get_columnar_store
+    return get_columnar_store()
+
 # --- New function to get only symbols with data ---
 def get_ingested_symbols(conn: sqlite3.Connection, exchange: str, quote: Optional[str]=None) -> List[str]:
     """Gets a list of distinct symbols that have candles in the database."""
-    query = "SELECT DISTINCT symbol FROM candles WHERE exchange=?"
+    store = _columnar()
+    if store is not None:
+        return [s for s in store.symbols(exchange) if not quote or s.endswith(f"/{quote}")]
+    # Series with at least one bar; the EXISTS is a single seek on the candles primary key
+    query = "SELECT DISTINCT symbol FROM candle_series s WHERE exchange=? AND EXISTS (SELECT 1 FROM candles WHERE series_id=s.id)"
     params = [exchange]
     if quote:
         query += " AND symbol LIKE ?"
@@ -31,8 +205,67 @@ def get_ingested_symbols(conn: sqlite3.Connection, exchange: str, quote: Optiona
     return [r['symbol'] for r in cur.fetchall()]
 
 
-# (All other DB functions remain the same)
+# One row per (series, bar), clustered by (series_id, ts): a series' bars are
+# contiguous on disk and its first/last bar is a single b-tree seek.
+CANDLES_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    series_id INTEGER NOT NULL REFERENCES candle_series(id),
+    ts INTEGER NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    volume REAL NOT NULL,
+    PRIMARY KEY(series_id, ts)
+) WITHOUT ROWID;
+"""
+
+# Resolves a row's (exchange, symbol, timeframe) to its series id inside candle statements
+_SERIES_ID = "(SELECT id FROM candle_series WHERE exchange=? AND symbol=? AND timeframe=?)"
+
+def _legacy_candles(conn: sqlite3.Connection) -> bool:
+    """True when `candles` still has the old layout (text keys repeated on every row)."""
+    return any(r[1] == "exchange" for r in conn.execute("PRAGMA table_info(candles)"))
+
+def migrate_candles(conn: sqlite3.Connection) -> int:
+    """
+    Converts a legacy candles table to candle_series + the WITHOUT ROWID
+    candles table in one transaction. Returns the number of bars copied, or 0
+    when the database already uses the new layout.
+    """
+    if not _legacy_candles(conn):
+        return 0
+    t0 = time.perf_counter()
+    conn.commit()
+    conn.executescript(
+        "BEGIN IMMEDIATE;"
+        """CREATE TABLE IF NOT EXISTS candle_series (
+            id INTEGER PRIMARY KEY,
+            exchange TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            timeframe TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            UNIQUE(exchange, symbol, timeframe)
+        );"""
+        """INSERT OR IGNORE INTO candle_series (exchange, symbol, timeframe)
+           SELECT DISTINCT exchange, symbol, timeframe FROM candles ORDER BY exchange, symbol, timeframe;"""
+        + CANDLES_DDL.format(table="candles_new") +
+        """INSERT OR IGNORE INTO candles_new (series_id, ts, open, high, low, close, volume)
+           SELECT s.id, c.ts, c.open, c.high, c.low, c.close, c.volume
+           FROM candles c JOIN candle_series s
+             ON s.exchange=c.exchange AND s.symbol=c.symbol AND s.timeframe=c.timeframe
+           ORDER BY s.id, c.ts;
+        DROP TABLE candles;
+        ALTER TABLE candles_new RENAME TO candles;
+        COMMIT;"""
+    )
+    n = conn.execute("SELECT COUNT(*) FROM candles").fetchone()[0]
+    print(f"[db] migrated {n} candles to the series layout in {time.perf_counter() - t0:.1f}s")
+    return n
+
 def init_schema(conn: sqlite3.Connection) -> None:
+    if _legacy_candles(conn):
+        migrate_candles(conn)
     conn.executescript(
         '''
         CREATE TABLE IF NOT EXISTS markets (
@@ -45,19 +278,15 @@ def init_schema(conn: sqlite3.Connection) -> None:
             listed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             UNIQUE(exchange, symbol)
         );
-        CREATE TABLE IF NOT EXISTS candles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+        CREATE TABLE IF NOT EXISTS candle_series (
+            id INTEGER PRIMARY KEY,
             exchange TEXT NOT NULL,
             symbol TEXT NOT NULL,
             timeframe TEXT NOT NULL,
-            ts INTEGER NOT NULL,
-            open REAL NOT NULL,
-            high REAL NOT NULL,
-            low REAL NOT NULL,
-            close REAL NOT NULL,
-            volume REAL NOT NULL,
-            UNIQUE(exchange, symbol, timeframe, ts)
+            version INTEGER NOT NULL DEFAULT 0,
+            UNIQUE(exchange, symbol, timeframe)
         );
+        {candles}
         CREATE TABLE IF NOT EXISTS paper_state (
             key TEXT PRIMARY KEY,
             value TEXT NOT NULL
@@ -87,14 +316,73 @@ def init_schema(conn: sqlite3.Connection) -> None:
             results_json TEXT NOT NULL,
             UNIQUE(symbol, strategy)
         );
-        '''
+        CREATE TABLE IF NOT EXISTS optimization_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sweep_id TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            method TEXT NOT NULL,
+            strategy TEXT NOT NULL,
+            timeframe TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            params_json TEXT NOT NULL,
+            phase TEXT NOT NULL,
+            fold INTEGER,
+            trades INTEGER NOT NULL,
+            return_pct REAL NOT NULL,
+            max_dd_pct REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS backfill_gaps (
+            exchange TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            timeframe TEXT NOT NULL,
+            start_ts INTEGER NOT NULL,
+            end_ts INTEGER NOT NULL,
+            cursor INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            updated_ts INTEGER NOT NULL,
+            PRIMARY KEY(exchange, symbol, timeframe, start_ts)
+        );
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job TEXT NOT NULL,
+            start_ts INTEGER NOT NULL,
+            duration_ms REAL NOT NULL,
+            status TEXT NOT NULL,
+            rows INTEGER,
+            error TEXT
+        );
+        CREATE TABLE IF NOT EXISTS screener (
+            exchange TEXT NOT NULL,
+            timeframe TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            quote TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            close REAL NOT NULL,
+            rsi14 REAL,
+            sma_spread REAL,
+            volatility REAL,
+            ret_24 REAL,
+            quote_volume REAL,
+            volume_rank INTEGER,
+            updated_ts INTEGER NOT NULL,
+            PRIMARY KEY(exchange, timeframe, symbol)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_screener_volume ON screener(exchange, timeframe, quote, quote_volume);
+        CREATE INDEX IF NOT EXISTS idx_screener_rsi ON screener(exchange, timeframe, quote, rsi14);
+        CREATE INDEX IF NOT EXISTS idx_screener_ts ON screener(exchange, timeframe, ts);
+        CREATE INDEX IF NOT EXISTS idx_job_runs_job ON job_runs(job, start_ts);
+        CREATE INDEX IF NOT EXISTS idx_optimization_sweep ON optimization_results(sweep_id);
+        CREATE INDEX IF NOT EXISTS idx_optimization_symbol ON optimization_results(strategy, symbol, return_pct);
+        '''.replace("{candles}", CANDLES_DDL.format(table="candles"))
     )
+    if not any(r[1] == "version" for r in conn.execute("PRAGMA table_info(candle_series)")):
+        conn.execute("ALTER TABLE candle_series ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
     conn.commit()
 
 def save_backtest_result(conn: sqlite3.Connection, symbol: str, strategy: str, results_df):
     ts = int(__import__("time").time() * 1000)
     results_json = results_df.to_json(orient="records")
-    conn.execute(
+    _write(conn,
         """INSERT INTO backtest_results (ts, symbol, strategy, results_json)
            VALUES (?, ?, ?, ?)
            ON CONFLICT(symbol, strategy) DO UPDATE SET
@@ -102,7 +390,19 @@ def save_backtest_result(conn: sqlite3.Connection, symbol: str, strategy: str, r
         """,
         (ts, symbol, strategy, results_json)
     )
-    conn.commit()
+
+def save_backtest_results(conn: sqlite3.Connection, results: Iterable[Tuple[str, str, object]]) -> None:
+    """Batched save_backtest_result: writes every (symbol, strategy, results_df) in one commit."""
+    ts = int(__import__("time").time() * 1000)
+    _write(conn,
+        """INSERT INTO backtest_results (ts, symbol, strategy, results_json)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT(symbol, strategy) DO UPDATE SET
+             ts=excluded.ts, results_json=excluded.results_json
+        """,
+        [(ts, symbol, strategy, df.to_json(orient="records")) for symbol, strategy, df in results],
+        many=True,
+    )
 
 def get_backtest_results(conn: sqlite3.Connection, symbol: str):
     cur = conn.execute("SELECT strategy, results_json FROM backtest_results WHERE symbol = ? ORDER BY ts DESC", (symbol,))
@@ -111,8 +411,112 @@ def get_backtest_results(conn: sqlite3.Connection, symbol: str):
         results[row['strategy']] = json.loads(row['results_json'])
     return results
 
+def save_optimization_results(conn: sqlite3.Connection, rows: Iterable[Tuple]) -> None:
+    _write(conn,
+        """INSERT INTO optimization_results
+           (sweep_id, ts, method, strategy, timeframe, symbol, params_json, phase, fold, trades, return_pct, max_dd_pct)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        rows,
+        many=True,
+    )
+
+def get_optimization_results(conn: sqlite3.Connection, sweep_id: Optional[str]=None, symbol: Optional[str]=None, strategy: Optional[str]=None):
+    import pandas as pd
+    query = "SELECT * FROM optimization_results WHERE 1=1"
+    params = []
+    for col, val in (("sweep_id", sweep_id), ("symbol", symbol), ("strategy", strategy)):
+        if val is not None:
+            query += f" AND {col}=?"
+            params.append(val)
+    query += " ORDER BY return_pct DESC"
+    return pd.read_sql_query(query, conn, params=tuple(params))
+
+def record_job_run(conn: sqlite3.Connection, job: str, start_ts: int, duration_ms: float, status: str,
+                   rows: Optional[int]=None, error: Optional[str]=None) -> None:
+    _write(conn,
+        "INSERT INTO job_runs (job, start_ts, duration_ms, status, rows, error) VALUES (?, ?, ?, ?, ?, ?)",
+        (job, start_ts, duration_ms, status, rows, error),
+    )
+
+def get_job_runs(conn: sqlite3.Connection, job: Optional[str]=None, since_ts: Optional[int]=None, limit: int=1000) -> List[dict]:
+    """Most recent runs first."""
+    query = "SELECT job, start_ts, duration_ms, status, rows, error FROM job_runs WHERE 1=1"
+    params: list = []
+    if job is not None:
+        query += " AND job=?"
+        params.append(job)
+    if since_ts is not None:
+        query += " AND start_ts>=?"
+        params.append(since_ts)
+    query += " ORDER BY start_ts DESC LIMIT ?"
+    params.append(limit)
+    return [dict(r) for r in conn.execute(query, tuple(params)).fetchall()]
+
+SCREENER_COLUMNS = ("symbol", "quote", "ts", "close", "rsi14", "sma_spread", "volatility", "ret_24", "quote_volume", "volume_rank")
+
+def get_screener_ts(conn: sqlite3.Connection, exchange: str, timeframe: str) -> dict:
+    """{symbol: ts of the bar its snapshot was computed from}."""
+    cur = conn.execute("SELECT symbol, ts FROM screener WHERE exchange=? AND timeframe=?", (exchange, timeframe))
+    return {r[0]: r[1] for r in cur.fetchall()}
+
+_SCREENER_NEWEST = "(SELECT MAX(ts) FROM screener WHERE exchange=? AND timeframe=?)"
+
+def save_screener_rows(conn: sqlite3.Connection, exchange: str, timeframe: str, rows: Iterable[Tuple],
+                       max_age_ms: Optional[int]=None) -> None:
+    """
+    Upserts (symbol, quote, ts, close, rsi14, sma_spread, volatility, ret_24,
+    quote_volume) snapshots, drops those whose bar is more than `max_age_ms`
+    behind the newest one (symbols no longer ingested), then re-ranks every
+    symbol of the same quote by quote_volume (1 = most traded), all in one
+    transaction.
+    """
+    now = int(time.time() * 1000)
+    rows = [(exchange, timeframe, *r, now) for r in rows]
+    expire = [] if max_age_ms is None else [
+        (f"DELETE FROM screener WHERE exchange=? AND timeframe=? AND ts<{_SCREENER_NEWEST}-?",
+         (exchange, timeframe, exchange, timeframe, max_age_ms), False)]
+    _write_all(conn, [
+        ("""INSERT INTO screener (exchange, timeframe, symbol, quote, ts, close, rsi14, sma_spread, volatility, ret_24, quote_volume, updated_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(exchange, timeframe, symbol) DO UPDATE SET
+              quote=excluded.quote, ts=excluded.ts, close=excluded.close, rsi14=excluded.rsi14,
+              sma_spread=excluded.sma_spread, volatility=excluded.volatility, ret_24=excluded.ret_24,
+              quote_volume=excluded.quote_volume, updated_ts=excluded.updated_ts""", rows, True),
+        *expire,
+        ("""UPDATE screener SET volume_rank=(
+              SELECT COUNT(*) + 1 FROM screener o
+              WHERE o.exchange=screener.exchange AND o.timeframe=screener.timeframe AND o.quote=screener.quote
+                AND o.quote_volume > screener.quote_volume)
+            WHERE exchange=? AND timeframe=?""", (exchange, timeframe), False),
+    ])
+
+@metrics.timed("db_query_seconds", query="query_screener")
+def query_screener(conn: sqlite3.Connection, exchange: str, timeframe: str, quote: Optional[str]=None,
+                   rsi_below: Optional[float]=None, rsi_above: Optional[float]=None,
+                   min_quote_volume: Optional[float]=None, max_age_ms: Optional[int]=None, sort: str="quote_volume",
+                   descending: bool=True, limit: int=20) -> List[dict]:
+    """
+    Snapshot rows matching the filters, best first by `sort` (one of
+    SCREENER_COLUMNS). `max_age_ms` skips snapshots whose bar is that far behind the newest one.
+    """
+    if sort not in SCREENER_COLUMNS:
+        raise ValueError(f"Unknown screener column: {sort}")
+    query = f"SELECT {', '.join(SCREENER_COLUMNS)} FROM screener WHERE exchange=? AND timeframe=?"
+    params: list = [exchange, timeframe]
+    for clause, val in (("quote=?", quote), ("rsi14<?", rsi_below), ("rsi14>?", rsi_above),
+                        ("quote_volume>=?", min_quote_volume)):
+        if val is not None:
+            query += f" AND {clause}"
+            params.append(val)
+    if max_age_ms is not None:
+        query += f" AND ts>={_SCREENER_NEWEST}-?"
+        params += [exchange, timeframe, max_age_ms]
+    query += f" AND {sort} IS NOT NULL ORDER BY {sort} {'DESC' if descending else 'ASC'} LIMIT ?"
+    params.append(limit)
+    return [dict(r) for r in conn.execute(query, tuple(params)).fetchall()]
+
 def upsert_market(conn: sqlite3.Connection, row: Tuple[str, str, str, str, int]) -> None:
-    conn.execute(
+    _write(conn,
         """INSERT INTO markets (exchange, symbol, base, quote, active)
            VALUES (?, ?, ?, ?, ?)
            ON CONFLICT(exchange, symbol) DO UPDATE SET
@@ -120,15 +524,60 @@ def upsert_market(conn: sqlite3.Connection, row: Tuple[str, str, str, str, int])
         """,
         row,
     )
-    conn.commit()
 
+_candle_listeners: list = []
+
+def add_candle_listener(fn) -> None:
+    """Registers fn(conn, rows) to be called after bulk_insert_candles/upsert_candles store a batch through `conn`."""
+    if fn not in _candle_listeners:
+        _candle_listeners.append(fn)
+
+def _candle_statements(sql: str, rows: list) -> list:
+    """
+    Registers the rows' series first so `sql` can resolve their ids in the same
+    transaction, and bumps each series' write version along with the bars.
+    """
+    series = list(dict.fromkeys(r[:3] for r in rows))
+    return [
+        ("INSERT OR IGNORE INTO candle_series (exchange, symbol, timeframe) VALUES (?, ?, ?)", series, True),
+        (sql, rows, True),
+        ("UPDATE candle_series SET version=version+1 WHERE exchange=? AND symbol=? AND timeframe=?", series, True),
+    ]
+
+@metrics.timed("db_query_seconds", query="bulk_insert_candles")
 def bulk_insert_candles(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str, str, int, float, float, float, float, float]]) -> None:
-    conn.executemany(
-        """INSERT OR IGNORE INTO candles (exchange, symbol, timeframe, ts, open, high, low, close, volume)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        rows,
-    )
-    conn.commit()
+    rows = list(rows)
+    metrics.inc("candles_written_total", len(rows))
+    store = _columnar()
+    if store is not None:
+        store.append(rows)
+    else:
+        _write_all(conn, _candle_statements(
+            f"""INSERT OR IGNORE INTO candles (series_id, ts, open, high, low, close, volume)
+               VALUES ({_SERIES_ID}, ?, ?, ?, ?, ?, ?)""",
+            rows,
+        ))
+    for fn in _candle_listeners:
+        fn(conn, rows)
+
+@metrics.timed("db_query_seconds", query="upsert_candles")
+def upsert_candles(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str, str, int, float, float, float, float, float]]) -> None:
+    """Like bulk_insert_candles, but bars already stored are overwritten (for bars that are still forming)."""
+    rows = list(rows)
+    metrics.inc("candles_written_total", len(rows))
+    store = _columnar()
+    if store is not None:
+        store.append(rows, replace=True)
+    else:
+        _write_all(conn, _candle_statements(
+            f"""INSERT INTO candles (series_id, ts, open, high, low, close, volume)
+               VALUES ({_SERIES_ID}, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(series_id, ts) DO UPDATE SET
+                 open=excluded.open, high=excluded.high, low=excluded.low, close=excluded.close, volume=excluded.volume""",
+            rows,
+        ))
+    for fn in _candle_listeners:
+        fn(conn, rows)
 
 def get_symbols(conn: sqlite3.Connection, exchange: str, quote: Optional[str]=None) -> List[str]:
     if quote:
@@ -138,18 +587,47 @@ def get_symbols(conn: sqlite3.Connection, exchange: str, quote: Optional[str]=No
     return [r[0] for r in cur.fetchall()]
 
 def get_latest_ts(conn: sqlite3.Connection, exchange: str, symbol: str, timeframe: str) -> Optional[int]:
+    store = _columnar()
+    if store is not None:
+        return store.latest_ts(exchange, symbol, timeframe)
     cur = conn.execute(
-        "SELECT MAX(ts) FROM candles WHERE exchange=? AND symbol=? AND timeframe=?",
+        f"SELECT MAX(ts) FROM candles WHERE series_id={_SERIES_ID}",
         (exchange, symbol, timeframe)
     )
     r = cur.fetchone()
     return int(r[0]) if r and r[0] is not None else None
 
+def get_earliest_ts(conn: sqlite3.Connection, exchange: str, symbol: str, timeframe: str) -> Optional[int]:
+    store = _columnar()
+    if store is not None:
+        return next((int(ts[0]) for ts, _ in store.read_partitions(exchange, symbol, timeframe) if len(ts)), None)
+    r = conn.execute(f"SELECT MIN(ts) FROM candles WHERE series_id={_SERIES_ID}", (exchange, symbol, timeframe)).fetchone()
+    return int(r[0]) if r and r[0] is not None else None
+
+def get_series_version(conn: sqlite3.Connection, exchange: str, symbol: str, timeframe: str):
+    """Marker that changes on every write to the series, from any process; None when it has never been written."""
+    store = _columnar()
+    if store is not None:
+        return store.version(exchange, symbol, timeframe)
+    row = conn.execute(
+        "SELECT version FROM candle_series WHERE exchange=? AND symbol=? AND timeframe=?", (exchange, symbol, timeframe)
+    ).fetchone()
+    return row[0] if row else None
+
+@metrics.timed("db_query_seconds", query="get_candles_df")
 def get_candles_df(conn: sqlite3.Connection, exchange: str, symbol: str, timeframe: str):
     import pandas as pd
+    store = _columnar()
+    if store is not None:
+        ts, ohlcv = store.read(exchange, symbol, timeframe)
+        if not len(ts):
+            return pd.DataFrame(columns=["open", "high", "low", "close", "volume"])
+        index = pd.DatetimeIndex(pd.to_datetime(ts, unit="ms", utc=True), name="ts")
+        # Single-partition reads wrap the memmap directly; multi-month reads are one concatenate
+        return pd.DataFrame(ohlcv, index=index, columns=["open", "high", "low", "close", "volume"], copy=False)
     q = """        SELECT ts, open, high, low, close, volume
         FROM candles
-        WHERE exchange=? AND symbol=? AND timeframe=?
+        WHERE series_id=(SELECT id FROM candle_series WHERE exchange=? AND symbol=? AND timeframe=?)
         ORDER BY ts ASC
     """
     df = pd.read_sql_query(q, conn, params=(exchange, symbol, timeframe))
@@ -158,12 +636,132 @@ def get_candles_df(conn: sqlite3.Connection, exchange: str, symbol: str, timefra
         df = df.set_index("ts")
     return df
 
+def get_candles_after(conn: sqlite3.Connection, exchange: str, symbol: str, timeframe: str, after_ts: Optional[int]=None, tail: Optional[int]=None) -> List[Tuple[int, float]]:
+    """
+    (ts, close) rows newer than `after_ts`, oldest first. With `tail`, only the
+    most recent `tail` rows are returned, which bounds warm-up reads.
+    """
+    store = _columnar()
+    if store is not None:
+        ts, ohlcv = store.read(exchange, symbol, timeframe, after_ts=after_ts)
+        if tail:
+            ts, ohlcv = ts[-tail:], ohlcv[-tail:]
+        return [(int(t), float(c)) for t, c in zip(ts, ohlcv[:, 3])]
+    q = f"SELECT ts, close FROM candles WHERE series_id={_SERIES_ID}"
+    params = [exchange, symbol, timeframe]
+    if after_ts is not None:
+        q += " AND ts>?"
+        params.append(after_ts)
+    if tail:
+        q += " ORDER BY ts DESC LIMIT ?"
+        params.append(tail)
+        rows = conn.execute(q, tuple(params)).fetchall()[::-1]
+    else:
+        rows = conn.execute(q + " ORDER BY ts ASC", tuple(params)).fetchall()
+    return [(int(r[0]), float(r[1])) for r in rows]
+
+@metrics.timed("db_query_seconds", query="get_candles_arrays")
+def get_candles_arrays(conn: sqlite3.Connection, exchange: str, symbol: str, timeframe: str, limit: Optional[int]=None):
+    """Most recent `limit` bars (all when None), oldest first, as (int64 ts, float (n, 5) ohlcv) arrays."""
+    import numpy as np
+    store = _columnar()
+    if store is not None:
+        ts, ohlcv = store.read(exchange, symbol, timeframe)
+        return (ts[-limit:], ohlcv[-limit:]) if limit else (ts, ohlcv)
+    q = f"SELECT ts, open, high, low, close, volume FROM candles WHERE series_id={_SERIES_ID} ORDER BY ts DESC"
+    params: list = [exchange, symbol, timeframe]
+    if limit:
+        q += " LIMIT ?"
+        params.append(limit)
+    rows = conn.execute(q, tuple(params)).fetchall()[::-1]
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 5))
+    arr = np.array([tuple(r) for r in rows], dtype=float)
+    return arr[:, 0].astype(np.int64), arr[:, 1:]
+
+def get_candles_range(conn: sqlite3.Connection, exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int):
+    """Bars with ts in [start_ts, end_ts], oldest first, as (int64 ts, float (n, 5) ohlcv) arrays."""
+    import numpy as np
+    store = _columnar()
+    if store is not None:
+        ts, ohlcv = store.read(exchange, symbol, timeframe, after_ts=start_ts - 1)
+        keep = ts <= end_ts
+        return ts[keep], ohlcv[keep]
+    rows = conn.execute(
+        f"SELECT ts, open, high, low, close, volume FROM candles WHERE series_id={_SERIES_ID} AND ts BETWEEN ? AND ? ORDER BY ts",
+        (exchange, symbol, timeframe, start_ts, end_ts),
+    ).fetchall()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 5))
+    arr = np.array([tuple(r) for r in rows], dtype=float)
+    return arr[:, 0].astype(np.int64), arr[:, 1:]
+
+@metrics.timed("db_query_seconds", query="get_closes_after")
+def get_closes_after(conn: sqlite3.Connection, exchange: str, symbols: List[str], timeframe: str,
+                     after_ts: Union[None, int, Dict[str, Optional[int]]]=None) -> List[Tuple[str, int, float]]:
+    """
+    (symbol, ts, close) for many symbols in one pass, ordered by ts. `after_ts`
+    is one cutoff for every symbol or a {symbol: last_ts} dict, so each series
+    is read from its own position however far behind the others it is.
+    """
+    cutoff = after_ts if isinstance(after_ts, dict) else dict.fromkeys(symbols, after_ts)
+    store = _columnar()
+    if store is not None:
+        out = []
+        for symbol in symbols:
+            ts, ohlcv = store.read(exchange, symbol, timeframe, after_ts=cutoff.get(symbol))
+            out.extend((symbol, int(t), float(c)) for t, c in zip(ts, ohlcv[:, 3]))
+        return sorted(out, key=lambda r: r[1])
+    if not symbols:
+        return []
+    # One primary-key range seek per series: (series_id, ts > that symbol's cutoff)
+    q = f"""WITH w(symbol, after_ts) AS (VALUES {",".join(["(?, ?)"] * len(symbols))})
+           SELECT s.symbol, c.ts, c.close FROM w
+           JOIN candle_series s ON s.exchange=? AND s.symbol=w.symbol AND s.timeframe=?
+           JOIN candles c ON c.series_id=s.id AND c.ts>w.after_ts
+           ORDER BY c.ts"""
+    params: list = []
+    for symbol in symbols:
+        after = cutoff.get(symbol)
+        params += [symbol, -1 if after is None else int(after)]
+    params += [exchange, timeframe]
+    return [(r[0], int(r[1]), float(r[2])) for r in conn.execute(q, tuple(params)).fetchall()]
+
+def get_stored_timeframes(conn: sqlite3.Connection, exchange: str, symbol: str) -> List[str]:
+    store = _columnar()
+    if store is not None:
+        return store.timeframes(exchange, symbol)
+    cur = conn.execute(
+        "SELECT timeframe FROM candle_series s WHERE exchange=? AND symbol=? AND EXISTS (SELECT 1 FROM candles WHERE series_id=s.id)",
+        (exchange, symbol),
+    )
+    return [r[0] for r in cur.fetchall()]
+
+def get_candle_ts(conn: sqlite3.Connection, exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int):
+    """Sorted int64 array of stored bar timestamps in [start_ts, end_ts]."""
+    import numpy as np
+    store = _columnar()
+    if store is not None:
+        ts, _ = store.read(exchange, symbol, timeframe, after_ts=start_ts - 1)
+        return np.asarray(ts[ts <= end_ts], dtype=np.int64)
+    cur = conn.execute(
+        f"SELECT ts FROM candles WHERE series_id={_SERIES_ID} AND ts BETWEEN ? AND ? ORDER BY ts",
+        (exchange, symbol, timeframe, start_ts, end_ts),
+    )
+    return np.fromiter((r[0] for r in cur), dtype=np.int64)
+
+def get_unfillable_ranges(conn: sqlite3.Connection, exchange: str, symbol: str, timeframe: str) -> List[Tuple[int, int]]:
+    """Inclusive (start_ts, end_ts) bar ranges backfill found to have no data upstream."""
+    return [tuple(r) for r in conn.execute(
+        "SELECT start_ts, end_ts FROM backfill_gaps WHERE exchange=? AND symbol=? AND timeframe=? AND status='unfillable' ORDER BY start_ts",
+        (exchange, symbol, timeframe),
+    ).fetchall()]
+
 def paper_set(conn: sqlite3.Connection, key: str, value: str) -> None:
-    conn.execute(
+    _write(conn,
         "INSERT INTO paper_state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
         (key, value),
     )
-    conn.commit()
 
 def paper_get(conn: sqlite3.Connection, key: str, default: Optional[str]=None) -> Optional[str]:
     cur = conn.execute("SELECT value FROM paper_state WHERE key=?", (key,))
@@ -171,11 +769,11 @@ def paper_get(conn: sqlite3.Connection, key: str, default: Optional[str]=None) -
     return r[0] if r else default
 
 def paper_trade(conn: sqlite3.Connection, ts: int, symbol: str, side: str, qty: float, price: float, fee: float=0.0, note: str="") -> None:
-    conn.execute(
+    metrics.inc("paper_trades_total", side=side)
+    _write(conn,
         "INSERT INTO paper_trades (ts, symbol, side, qty, price, fee, note) VALUES (?, ?, ?, ?, ?, ?, ?)",
         (ts, symbol, side, qty, price, fee, note),
     )
-    conn.commit()
 
 def get_paper_trades_df(conn: sqlite3.Connection):
     import pandas as pd
@@ -189,24 +787,23 @@ def list_state_prefix(conn: sqlite3.Connection, prefix: str):
     return cur.fetchall()
 
 def get_latest_close(conn: sqlite3.Connection, exchange: str, symbol: str):
+    store = _columnar()
+    if store is not None:
+        return store.latest_close(exchange, symbol)
+    # Each series' last bar is one seek on (series_id, ts); the freshest across timeframes wins
     cur = conn.execute(
-        "SELECT timeframe, MAX(ts) FROM candles WHERE exchange=? AND symbol=? GROUP BY timeframe ORDER BY MAX(ts) DESC LIMIT 1",
+        """SELECT c.close FROM candle_series s
+           JOIN candles c ON c.series_id=s.id AND c.ts=(SELECT MAX(ts) FROM candles WHERE series_id=s.id)
+           WHERE s.exchange=? AND s.symbol=?
+           ORDER BY c.ts DESC LIMIT 1""",
         (exchange, symbol),
     )
-    row = cur.fetchone()
-    if not row:
-        return None
-    timeframe = row[0]
-    cur2 = conn.execute(
-        "SELECT close FROM candles WHERE exchange=? AND symbol=? AND timeframe=? ORDER BY ts DESC LIMIT 1",
-        (exchange, symbol, timeframe),
-    )
-    r2 = cur2.fetchone()
-    return float(r2[0]) if r2 else None
+    r = cur.fetchone()
+    return float(r[0]) if r else None
 
 def upsert_insight(conn: sqlite3.Connection, symbol: str, signal: str, justification: str) -> None:
     ts = int(__import__("time").time() * 1000)
-    conn.execute(
+    _write(conn,
         """INSERT INTO insights (ts, symbol, signal, justification)
            VALUES (?, ?, ?, ?)
            ON CONFLICT(symbol) DO UPDATE SET
@@ -214,7 +811,6 @@ def upsert_insight(conn: sqlite3.Connection, symbol: str, signal: str, justifica
         """,
         (ts, symbol, signal, justification),
     )
-    conn.commit()
 
 def get_all_insights(conn: sqlite3.Connection) -> List[dict]:
     cur = conn.execute("SELECT symbol, signal, justification FROM insights ORDER BY ts DESC")
@@ -0,0 +1,70 @@
+import numpy as np
+
+def resample_ohlcv(ts: np.ndarray, ohlcv: np.ndarray, step_ms: int):
+    """
+    Aggregates sorted bars into `step_ms` buckets aligned to the epoch:
+    first open, max high, min low, last close, summed volume.
+    """
+    if not len(ts):
+        return ts, ohlcv
+    bucket = ts // step_ms * step_ms
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    out = np.empty((len(starts), 5))
+    out[:, 0] = ohlcv[starts, 0]
+    out[:, 1] = np.maximum.reduceat(ohlcv[:, 1], starts)
+    out[:, 2] = np.minimum.reduceat(ohlcv[:, 2], starts)
+    out[:, 3] = ohlcv[ends, 3]
+    out[:, 4] = np.add.reduceat(ohlcv[:, 4], starts)
+    return bucket[starts], out
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `n_out` points that keep the
+    visual shape of y(x). First and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = x.astype(float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+def decimate_ohlcv(ts: np.ndarray, ohlcv: np.ndarray, n_out: int):
+    """
+    LTTB on closes, then each kept bar is widened to the high/low/volume of the
+    bars it stands in for, so wicks survive the decimation.
+    """
+    idx = lttb(ts, ohlcv[:, 3], n_out)
+    if len(idx) == len(ts):
+        return ts, ohlcv
+    # Each kept bar represents the run up to the next kept bar
+    bounds = np.r_[idx, len(ts)]
+    out = ohlcv[idx].copy()
+    out[:, 1] = np.maximum.reduceat(ohlcv[:, 1], idx)
+    out[:, 2] = np.minimum.reduceat(ohlcv[:, 2], idx)
+    out[:, 4] = np.add.reduceat(ohlcv[:, 4], idx)
+    out[:, 3] = ohlcv[bounds[1:] - 1, 3]
+    return ts[idx], out
+
+def encode_binary(ts: np.ndarray, ohlcv: np.ndarray) -> bytes:
+    """
+    Little-endian: uint32 row count, then float64 columns time (seconds),
+    open, high, low, close, volume, each `count` long.
+    """
+    n = len(ts)
+    cols = np.empty((6, n), dtype="<f8")
+    cols[0] = ts / 1000.0
+    cols[1:] = ohlcv.T
+    return np.uint32(n).astype("<u4").tobytes() + cols.tobytes()
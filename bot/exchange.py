@@ -1,14 +1,33 @@
+import threading
 import ccxt
 # --- This is the corrected import statement ---
 from uphold_python import Uphold 
 from .config import cfg
+from .metadata import metadata
+
+_instances: dict = {}
+_instances_lock = threading.Lock()
+
+def _shared(exchange_id: str, **options) -> ccxt.Exchange:
+    # Keyed by credentials too, so the public data instance and an authenticated one for the same exchange stay apart
+    key = (exchange_id, options.get("apiKey", ""))
+    with _instances_lock:
+        exchange = _instances.get(key)
+        if exchange is None:
+            exchange = _instances[key] = getattr(ccxt, exchange_id)(options)
+            exchange.enableRateLimit = True
+            metadata.prime(exchange)
+        return exchange
 
 def get_data_exchange() -> ccxt.Exchange:
-    """Returns a ccxt instance for the public data source (e.g., Binance)."""
-    klass = getattr(ccxt, cfg.data_source_exchange)
-    exchange = klass()
-    exchange.enableRateLimit = True
-    return exchange
+    """The process-wide ccxt instance for the public data source (e.g., Binance), seeded with cached markets."""
+    return _shared(cfg.data_source_exchange)
+
+def get_exchange() -> ccxt.Exchange:
+    """The process-wide ccxt instance for cfg.exchange, authenticated when EXCHANGE_API_KEY/SECRET are set."""
+    if cfg.exchange_api_key:
+        return _shared(cfg.exchange, apiKey=cfg.exchange_api_key, secret=cfg.exchange_api_secret)
+    return _shared(cfg.exchange)
 
 def get_trading_exchange(sandbox: bool = True) -> Uphold:
     """Returns an authenticated Uphold SDK client."""
@@ -17,3 +36,13 @@ def get_trading_exchange(sandbox: bool = True) -> Uphold:
     
     # The SDK takes a fourth argument for sandbox mode.
     return Uphold(cfg.uphold_api_key, cfg.uphold_api_secret, sandbox)
+
+def get_async_data_exchange():
+    """Returns a ccxt.async_support instance for the public data source."""
+    import ccxt.async_support as ccxt_async
+    klass = getattr(ccxt_async, cfg.data_source_exchange)
+    exchange = klass()
+    # Concurrent callers throttle through a shared TokenBucket instead (see ratelimit.py)
+    exchange.enableRateLimit = False
+    metadata.prime(exchange)
+    return exchange
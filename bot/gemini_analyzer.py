@@ -1,7 +1,15 @@
+import functools
 import google.generativeai as genai
 from .config import cfg
 import pandas as pd
 
+@functools.lru_cache(maxsize=None)
+def _model(api_key: str):
+    """Configures the client and builds the model once per key instead of on every call."""
+    genai.configure(api_key=api_key)
+    # Use the official 2.5 Pro model name
+    return genai.GenerativeModel('gemini-2.5-pro')
+
 def get_gemini_sentiment(headlines: list[str]) -> str:
     """
     Analyzes the sentiment of a list of news headlines using the Gemini API.
@@ -9,16 +17,15 @@ def get_gemini_sentiment(headlines: list[str]) -> str:
     if not cfg.gemini_api_key:
         raise ValueError("GEMINI_API_KEY not set in .env file.")
 
-    genai.configure(api_key=cfg.gemini_api_key)
-    # Use the official 2.5 Pro model name
-    model = genai.GenerativeModel('gemini-2.5-pro')
+    model = _model(cfg.gemini_api_key)
 
+    headlines_str = "\n- ".join(headlines)
     prompt = f"""
     Analyze the sentiment of the following cryptocurrency news headlines and classify it as 'bullish', 'bearish', or 'neutral'.
     Provide a brief justification for your classification.
 
     Headlines:
-    - {'\n- '.join(headlines)}
+    - {headlines_str}
     """
     
     try:
@@ -34,9 +41,7 @@ def get_gemini_trade_suggestion(symbol: str, df: pd.DataFrame) -> str:
     if not cfg.gemini_api_key:
         raise ValueError("GEMINI_API_KEY not set in .env file.")
 
-    genai.configure(api_key=cfg.gemini_api_key)
-    # Use the official 2.5 Pro model name
-    model = genai.GenerativeModel('gemini-2.5-pro')
+    model = _model(cfg.gemini_api_key)
 
     # Prepare the data for the prompt
     df_recent = df.tail(50) # Use the last 50 candles
@@ -0,0 +1,268 @@
+import json
+from collections import deque
+from typing import Optional
+import numpy as np
+
+class RollingMean:
+    """Fixed-window mean over a ring buffer with a running sum; O(1) per update."""
+    def __init__(self, window: int):
+        self.window = window
+        self.buf: deque = deque(maxlen=window)
+        self.total = 0.0
+        self._since_resum = 0
+
+    def update(self, x: float) -> Optional[float]:
+        if len(self.buf) == self.window:
+            self.total -= self.buf[0]
+        self.buf.append(x)
+        self.total += x
+        self._since_resum += 1
+        if self._since_resum >= self.window:
+            # Re-sum once per window so float drift can't accumulate; amortized O(1)
+            self.total = sum(self.buf)
+            self._since_resum = 0
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.total / self.window if len(self.buf) == self.window else None
+
+    def to_state(self) -> list:
+        return list(self.buf)
+
+    def load_state(self, values: list) -> None:
+        self.buf = deque(values[-self.window:], maxlen=self.window)
+        self.total = sum(self.buf)
+        self._since_resum = 0
+
+class StreamingStrategy:
+    """Per-bar counterpart of a Strategy: feed closes in order, read the latest signal."""
+    kind = ""
+    last_ts: Optional[int] = None
+    last_close: Optional[float] = None
+    signal: int = 0
+
+    def params(self) -> dict:
+        raise NotImplementedError
+
+    def warmup_bars(self) -> int:
+        raise NotImplementedError
+
+    def update(self, ts: int, close: float) -> int:
+        raise NotImplementedError
+
+    def to_json(self) -> str:
+        return json.dumps({"kind": self.kind, "params": self.params(), "last_ts": self.last_ts,
+                           "last_close": self.last_close, "signal": self.signal, "state": self._state()})
+
+    def load_json(self, raw: str) -> bool:
+        """Restores a checkpoint; returns False if it belongs to a different setup."""
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError):
+            return False
+        if data.get("kind") != self.kind or data.get("params") != self.params():
+            return False
+        self.last_ts = data["last_ts"]
+        self.last_close = data.get("last_close")
+        self.signal = data["signal"]
+        self._load_state(data["state"])
+        return True
+
+    def _state(self) -> dict:
+        raise NotImplementedError
+
+    def _load_state(self, state: dict) -> None:
+        raise NotImplementedError
+
+class StreamingSMACrossover(StreamingStrategy):
+    kind = "sma_crossover"
+
+    def __init__(self, fast: int = 20, slow: int = 50):
+        self.fast = fast
+        self.slow = slow
+        self.fast_ma = RollingMean(fast)
+        self.slow_ma = RollingMean(slow)
+
+    def params(self) -> dict:
+        return {"fast": self.fast, "slow": self.slow}
+
+    def warmup_bars(self) -> int:
+        return max(self.fast, self.slow)
+
+    def update(self, ts: int, close: float) -> int:
+        f = self.fast_ma.update(close)
+        s = self.slow_ma.update(close)
+        self.signal = int(f is not None and s is not None and f > s)
+        self.last_ts = ts
+        self.last_close = close
+        return self.signal
+
+    def _state(self) -> dict:
+        return {"fast": self.fast_ma.to_state(), "slow": self.slow_ma.to_state()}
+
+    def _load_state(self, state: dict) -> None:
+        self.fast_ma.load_state(state["fast"])
+        self.slow_ma.load_state(state["slow"])
+
+class StreamingRSI(StreamingStrategy):
+    """Simple-average RSI, matching RSIStrategy (not Wilder smoothing)."""
+    kind = "rsi"
+
+    def __init__(self, rsi_period: int = 14, rsi_oversold: int = 30, rsi_overbought: int = 70):
+        self.rsi_period = rsi_period
+        self.rsi_oversold = rsi_oversold
+        self.rsi_overbought = rsi_overbought
+        self.gain = RollingMean(rsi_period)
+        self.loss = RollingMean(rsi_period)
+        self.prev_close: Optional[float] = None
+        self.rsi: Optional[float] = None
+
+    def params(self) -> dict:
+        return {"rsi_period": self.rsi_period, "rsi_oversold": self.rsi_oversold, "rsi_overbought": self.rsi_overbought}
+
+    def warmup_bars(self) -> int:
+        return self.rsi_period + 1
+
+    def update(self, ts: int, close: float) -> int:
+        # The first bar has no delta; RSIStrategy counts it as a zero gain/loss
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        g = self.gain.update(max(delta, 0.0))
+        l = self.loss.update(max(-delta, 0.0))
+        if g is None:
+            self.rsi = None
+        elif l == 0:
+            self.rsi = None if g == 0 else 100.0
+        else:
+            self.rsi = 100 - (100 / (1 + g / l))
+        self.signal = 0
+        if self.rsi is not None:
+            if self.rsi < self.rsi_oversold:
+                self.signal = 1
+            elif self.rsi > self.rsi_overbought:
+                self.signal = -1
+        self.last_ts = ts
+        self.last_close = close
+        return self.signal
+
+    def _state(self) -> dict:
+        return {"gain": self.gain.to_state(), "loss": self.loss.to_state(), "prev_close": self.prev_close}
+
+    def _load_state(self, state: dict) -> None:
+        self.gain.load_state(state["gain"])
+        self.loss.load_state(state["loss"])
+        self.prev_close = state["prev_close"]
+
+def feed_ohlcv(stream: StreamingStrategy, ohlcv: list, forming: bool=True) -> bool:
+    """
+    Folds closed bars from a ccxt fetch_ohlcv result into the stream. The last
+    row is still forming and is skipped (pass forming=False for closed bars
+    only). Returns False when the fetch doesn't overlap the stream's last bar,
+    i.e. bars were missed and it must re-warm.
+    """
+    closed = ohlcv[:-1] if forming else ohlcv
+    if not closed:
+        return True
+    if stream.last_ts is not None and int(closed[0][0]) > stream.last_ts:
+        return False
+    for row in closed:
+        ts = int(row[0])
+        if stream.last_ts is None or ts > stream.last_ts:
+            stream.update(ts, float(row[4]))
+    return True
+
+class RollingMeanVec:
+    """RollingMean over many series at once: one ring-buffer column per series, masked updates."""
+    def __init__(self, window: int, n: int):
+        self.window = window
+        self.buf = np.zeros((window, n))
+        self.idx = np.zeros(n, dtype=np.int64)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.total = np.zeros(n)
+        self._updates = 0
+
+    def update(self, cols: np.ndarray, x: np.ndarray) -> None:
+        i = self.idx[cols]
+        # Slots not yet written hold 0, so subtracting them is a no-op during warm-up
+        self.total[cols] += x - self.buf[i, cols]
+        self.buf[i, cols] = x
+        self.idx[cols] = (i + 1) % self.window
+        self.count[cols] += 1
+        self._updates += 1
+        if self._updates >= self.window:
+            self.total = self.buf.sum(axis=0)
+            self._updates = 0
+
+    @property
+    def value(self) -> np.ndarray:
+        out = self.total / self.window
+        out[self.count < self.window] = np.nan
+        return out
+
+    def to_state(self) -> dict:
+        return {"buf": self.buf.tolist(), "idx": self.idx.tolist(), "count": self.count.tolist()}
+
+    def load_state(self, state: dict) -> None:
+        self.buf = np.asarray(state["buf"], dtype=float).reshape(self.window, -1)
+        self.idx = np.asarray(state["idx"], dtype=np.int64)
+        self.count = np.asarray(state["count"], dtype=np.int64)
+        self.total = self.buf.sum(axis=0)
+
+class VectorSMACrossover:
+    """StreamingSMACrossover for n symbols, updated with whichever subset has a new bar."""
+    kind = "sma_crossover"
+
+    def __init__(self, n: int, fast: int = 20, slow: int = 50):
+        self.params = {"fast": fast, "slow": slow}
+        self.fast_ma = RollingMeanVec(fast, n)
+        self.slow_ma = RollingMeanVec(slow, n)
+        self.signal = np.zeros(n, dtype=np.int64)
+
+    def update(self, cols: np.ndarray, closes: np.ndarray) -> None:
+        self.fast_ma.update(cols, closes)
+        self.slow_ma.update(cols, closes)
+        with np.errstate(invalid="ignore"):
+            self.signal = (self.fast_ma.value > self.slow_ma.value).astype(np.int64)
+
+    def to_state(self) -> dict:
+        return {"fast": self.fast_ma.to_state(), "slow": self.slow_ma.to_state()}
+
+    def load_state(self, state: dict) -> None:
+        self.fast_ma.load_state(state["fast"])
+        self.slow_ma.load_state(state["slow"])
+        self.update(np.empty(0, dtype=np.int64), np.empty(0))
+
+class VectorRSI:
+    """StreamingRSI for n symbols (simple-average RSI, as RSIStrategy)."""
+    kind = "rsi"
+
+    def __init__(self, n: int, rsi_period: int = 14, rsi_oversold: int = 30, rsi_overbought: int = 70):
+        self.params = {"rsi_period": rsi_period, "rsi_oversold": rsi_oversold, "rsi_overbought": rsi_overbought}
+        self.gain = RollingMeanVec(rsi_period, n)
+        self.loss = RollingMeanVec(rsi_period, n)
+        self.prev_close = np.full(n, np.nan)
+        self.signal = np.zeros(n, dtype=np.int64)
+
+    def update(self, cols: np.ndarray, closes: np.ndarray) -> None:
+        if len(cols):
+            delta = np.nan_to_num(closes - self.prev_close[cols], nan=0.0)
+            self.prev_close[cols] = closes
+            self.gain.update(cols, np.maximum(delta, 0.0))
+            self.loss.update(cols, np.maximum(-delta, 0.0))
+        g, l = self.gain.value, self.loss.value
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = 100 - (100 / (1 + g / l))
+        self.signal = np.zeros_like(self.signal)
+        self.signal[rsi < self.params["rsi_oversold"]] = 1
+        self.signal[rsi > self.params["rsi_overbought"]] = -1
+
+    def to_state(self) -> dict:
+        return {"gain": self.gain.to_state(), "loss": self.loss.to_state(),
+                "prev_close": [None if np.isnan(x) else float(x) for x in self.prev_close]}
+
+    def load_state(self, state: dict) -> None:
+        self.gain.load_state(state["gain"])
+        self.loss.load_state(state["loss"])
+        self.prev_close = np.array([np.nan if x is None else x for x in state["prev_close"]], dtype=float)
+        self.update(np.empty(0, dtype=np.int64), np.empty(0))
@@ -0,0 +1,82 @@
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from .ai_analyzer import AIAnalyzer, PROMPT_VERSION
+from .cache import TTLCache
+from .config import cfg
+from .db import get_candles_arrays, upsert_insight, write_batch
+
+# The analyzer only ever sees the last 50 bars
+BARS = 50
+
+insight_cache = TTLCache(ttl_s=cfg.insight_ttl_s)
+
+def parse_signal(suggestion: str) -> str:
+    match = re.match(r"^\s*(\w+)", suggestion)
+    return match.group(1).upper() if match else "HOLD"
+
+def insight_key(provider: str, symbol: str, timeframe: str, last_ts: int) -> str:
+    """Content hash of everything that determines an answer: same inputs, same (already paid for) insight."""
+    raw = f"{provider}|{PROMPT_VERSION}|{symbol}|{timeframe}|{last_ts}|{BARS}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def _recent_df(conn, exchange: str, symbol: str, timeframe: str) -> Optional[pd.DataFrame]:
+    ts, ohlcv = get_candles_arrays(conn, exchange, symbol, timeframe, limit=BARS)
+    if not len(ts):
+        return None
+    return pd.DataFrame(ohlcv, columns=["open", "high", "low", "close", "volume"],
+                        index=pd.to_datetime(ts, unit="ms", utc=True))
+
+def generate_insights(
+    conn,
+    ai: AIAnalyzer,
+    symbols: List[str],
+    timeframe: str="1h",
+    exchange: Optional[str]=None,
+    max_workers: Optional[int]=None,
+    cache: TTLCache=insight_cache,
+    save: bool=True,
+) -> Dict[str, Tuple[str, str]]:
+    """
+    Trade suggestions for `symbols` as {symbol: (signal, suggestion)}. Symbols
+    whose latest bar was already analyzed come from the cache; the rest are
+    grouped into prompts of up to `ai.max_batch` symbols and sent concurrently
+    through a bounded pool. Errors are returned but neither cached nor saved.
+    """
+    exchange = exchange or cfg.exchange
+    provider = type(ai).__name__
+    out: Dict[str, Tuple[str, str]] = {}
+    todo: List[Tuple[str, pd.DataFrame, str]] = []
+    for symbol in symbols:
+        df = _recent_df(conn, exchange, symbol, timeframe)
+        if df is None:
+            continue
+        key = insight_key(provider, symbol, timeframe, int(df.index[-1].value // 1_000_000))
+        hit = cache.get(key)
+        if hit is not None:
+            out[symbol] = hit
+        else:
+            todo.append((symbol, df, key))
+
+    batches = [todo[i:i + max(1, ai.max_batch)] for i in range(0, len(todo), max(1, ai.max_batch))]
+    fresh: Dict[str, Tuple[str, str]] = {}
+    if batches:
+        workers = min(max_workers or cfg.insight_workers, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            answers = pool.map(lambda b: ai.get_trade_suggestions([(s, df) for s, df, _ in b]), batches)
+            for batch, answer in zip(batches, answers):
+                for symbol, _, key in batch:
+                    suggestion = answer.get(symbol, f"Error: no answer for {symbol}")
+                    result = (parse_signal(suggestion), suggestion)
+                    out[symbol] = result
+                    if not suggestion.startswith("Error"):
+                        cache.put(key, result)
+                        fresh[symbol] = result
+
+    if save and fresh:
+        with write_batch(conn):
+            for symbol, (signal, suggestion) in fresh.items():
+                upsert_insight(conn, symbol, signal, suggestion)
+    return out
@@ -0,0 +1,85 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+import schedule
+from .db import get_conn, init_schema, record_job_run
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+@dataclass
+class Job:
+    name: str
+    fn: Callable[[], Optional[int]]  # returns rows processed, or None
+    every_s: float
+    jitter_s: float = 0.0
+    max_concurrency: int = 1
+    running: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+class JobEngine:
+    """
+    Runs scheduled jobs on a shared worker pool so a slow job never delays the
+    others. A trigger that finds a job already at `max_concurrency` is skipped
+    rather than queued, so runs cannot pile up. Each interval is stretched by a
+    random 0..jitter_s so jobs sharing a period do not fire in lockstep. Every
+    run (or skip) is recorded in job_runs with its duration, rows and error.
+    """
+    def __init__(self, database_url: str, workers: int = 4):
+        self.conn = get_conn(database_url)
+        init_schema(self.conn)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.scheduler = schedule.Scheduler()
+        self.jobs: Dict[str, Job] = {}
+
+    def add(self, name: str, fn: Callable[[], Optional[int]], every_s: float, jitter_s: float = 0.0,
+            max_concurrency: int = 1) -> Job:
+        job = Job(name, fn, every_s, jitter_s, max_concurrency)
+        self.jobs[name] = job
+        every = self.scheduler.every(int(every_s))
+        if jitter_s:
+            every = every.to(int(every_s + jitter_s))
+        every.seconds.do(self.submit, name)
+        return job
+
+    def submit(self, name: str) -> Optional[Future]:
+        """Starts `name` on the pool now, or records a skip if it is already at its concurrency limit."""
+        job = self.jobs[name]
+        with job.lock:
+            if job.running >= job.max_concurrency:
+                print(f"[jobs] {name} still running, skipped")
+                record_job_run(self.conn, name, _now_ms(), 0.0, "skipped")
+                return None
+            job.running += 1
+        return self.pool.submit(self._run, job)
+
+    def _run(self, job: Job) -> Optional[int]:
+        start_ts, t0 = _now_ms(), time.perf_counter()
+        rows, status, error = None, "ok", None
+        try:
+            rows = job.fn()
+        except Exception as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+            print(f"[jobs] {job.name} failed: {error}")
+        finally:
+            with job.lock:
+                job.running -= 1
+        duration_ms = (time.perf_counter() - t0) * 1000
+        record_job_run(self.conn, job.name, start_ts, duration_ms, status,
+                       rows if isinstance(rows, int) else None, error)
+        print(f"[jobs] {job.name} {status} in {duration_ms / 1000:.1f}s" + (f", {rows} rows" if isinstance(rows, int) else ""))
+        return rows
+
+    def run_all(self) -> None:
+        for name in self.jobs:
+            self.submit(name)
+
+    def run_forever(self, tick_s: float = 1.0) -> None:
+        while True:
+            self.scheduler.run_pending()
+            time.sleep(tick_s)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.pool.shutdown(wait=wait)
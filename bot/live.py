@@ -1,14 +1,15 @@
-import time
+from typing import Optional
+from .clock import Clock, WALL_CLOCK
 from .exchange import get_exchange
+from .metadata import metadata
 from .db import get_conn, paper_get, paper_set
-from .strategy import sma_crossover
+from .strategy import SMACrossoverStrategy
+from .indicators import feed_ohlcv
+from .marketstream import market_feed
 from .config import cfg
+from . import metrics
 
-def _now_ms():
-    return int(time.time() * 1000)
-
-def _quantize_amount(ex, symbol, amount):
-    m = ex.market(symbol)
+def _quantize_amount(m, amount):
     step = m.get('precision', {}).get('amount', None)
     if step is None:
         lot = m.get('lot', None)
@@ -18,40 +19,62 @@ def _quantize_amount(ex, symbol, amount):
     decimals = int(step)
     return float(f"{amount:.{decimals}f}")
 
-def live_loop(symbol: str, timeframe: str="1m", fast: int=10, slow: int=30, cash_per_trade: float=50.0, sleep_s: int=60, confirm: bool=False):
+def live_loop(symbol: str, timeframe: str="1m", fast: int=10, slow: int=30, cash_per_trade: float=50.0, sleep_s: int=60, confirm: bool=False,
+              exchange=None, clock: Clock=WALL_CLOCK, database_url: Optional[str]=None):
+    """`exchange` (a ccxt-like object), `clock` and `database_url` are injectable for replays."""
     if not confirm:
         print("Refusing to place live orders without --confirm TRADE.")
         return
 
-    ex = get_exchange()
-    markets = ex.load_markets()
+    ex = exchange or get_exchange()
+    markets = metadata.markets(ex) if exchange is None else ex.load_markets()
     if symbol not in markets:
         raise ValueError(f"Symbol {symbol} not available on {cfg.exchange}")
+    market = markets[symbol]
 
-    conn = get_conn(cfg.database_url)
+    conn = get_conn(database_url or cfg.database_url)
     pos_key = f"live:pos:{symbol}"
     pos_qty = float(paper_get(conn, pos_key, default="0"))
 
+    strategy = SMACrossoverStrategy(fast=fast, slow=slow)
+    state_key = f"live:ind:{symbol}:{timeframe}"
+    stream = strategy.streaming()
+    if not stream.load_json(paper_get(conn, state_key)):
+        stream = strategy.streaming()
+
+    # Bars and tickers are pushed over the exchange WebSocket when available; REST polling otherwise
+    feed = market_feed(ex, [symbol], timeframe, warmup=max(slow*2, 100), poll_s=sleep_s) if exchange is None else None
+
     print(f"[live] Starting live loop on {cfg.exchange} {symbol}, pos={pos_qty}")
     while True:
+        # A full window is only fetched to warm up; after that a few recent bars suffice
+        limit = max(slow*2, 100) if stream.last_ts is None else 5
         try:
-            ohlcv = ex.fetch_ohlcv(symbol, timeframe=timeframe, limit=max(slow*2, 100))
+            if feed is not None:
+                ohlcv = feed.bars(symbol)
+            else:
+                with metrics.exchange_call(ex.id, "fetch_ohlcv"):
+                    ohlcv = ex.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
         except Exception as e:
             print(f"[live] fetch_ohlcv error: {e}")
-            time.sleep(sleep_s)
+            clock.sleep(sleep_s)
             continue
-        import pandas as pd
-        df = pd.DataFrame(ohlcv, columns=["ts","open","high","low","close","volume"]).set_index("ts")
-        sig = sma_crossover(df, fast=fast, slow=slow)
-        sig_last = int(sig.iloc[-1]) if len(sig) else 0
+        prev_ts = stream.last_ts
+        if not feed_ohlcv(stream, ohlcv, forming=feed is None):
+            print(f"[live] indicator state is stale for {symbol}, re-warming")
+            stream = strategy.streaming()
+            continue
+        if stream.last_ts != prev_ts:
+            paper_set(conn, state_key, stream.to_json())
+        sig_last = stream.signal
 
-        ticker = ex.fetch_ticker(symbol)
-        price = float(ticker.get("last") or ticker.get("close") or df["close"].iloc[-1])
+        ticker = (feed.ticker(symbol) if feed is not None else None) or ex.fetch_ticker(symbol)
+        price = float(ticker.get("last") or ticker.get("close") or ohlcv[-1][4])
 
         if sig_last == 1 and pos_qty <= 0:
             quote = cash_per_trade
             amount = quote / price
-            amount = _quantize_amount(ex, symbol, amount)
+            amount = _quantize_amount(market, amount)
             if amount > 0:
                 try:
                     order = ex.create_order(symbol, "market", "buy", amount)
@@ -62,7 +85,7 @@ def live_loop(symbol: str, timeframe: str="1m", fast: int=10, slow: int=30, cash
                     print(f"[live] BUY failed: {e}")
         elif sig_last == 0 and pos_qty > 0:
             amount = pos_qty
-            amount = _quantize_amount(ex, symbol, amount)
+            amount = _quantize_amount(market, amount)
             if amount > 0:
                 try:
                     order = ex.create_order(symbol, "market", "sell", amount)
@@ -74,4 +97,7 @@ def live_loop(symbol: str, timeframe: str="1m", fast: int=10, slow: int=30, cash
         else:
             print(f"[live] HOLD {symbol} @ {price}")
 
-        time.sleep(sleep_s)
+        if feed is not None:
+            feed.wait_for_bar(symbol, stream.last_ts, timeout=sleep_s)
+        else:
+            clock.sleep(sleep_s)
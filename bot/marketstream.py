@@ -0,0 +1,241 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from .config import cfg
+from . import metrics
+from .symbols import binance_symbol
+from .timeframes import timeframe_ms
+
+BINANCE_WS_URL = "wss://stream.binance.com:9443"
+
+# fetch_ohlcv(symbol, timeframe, limit) -> ccxt rows, the last one still forming
+FetchOHLCV = Callable[[str, str, int], list]
+
+def stream_url(base: str, symbols: List[str], timeframe: str) -> str:
+    """Binance combined-stream URL for the kline and 24h ticker streams of `symbols`."""
+    names = []
+    for s in symbols:
+        code = binance_symbol(s).lower()
+        names += [f"{code}@kline_{timeframe}", f"{code}@ticker"]
+    return f"{base.rstrip('/')}/stream?streams={'/'.join(names)}"
+
+class MarketDataClient:
+    """
+    Live bars and tickers for a few symbols from the exchange's WebSocket kline
+    and ticker streams, kept in rolling per-symbol buffers of the last
+    `buffer_bars` closed bars. Callers block in wait_for_bar() or register a
+    listener and are woken as soon as a bar closes. While the socket is down or
+    silent for `stale_s`, bars are polled through `fetch_ohlcv` every `poll_s`
+    instead; the same callable warms the buffers up and fills reconnect gaps.
+    """
+    def __init__(self, symbols: List[str], timeframe: str="1m", url: Optional[str]=None,
+                 fetch_ohlcv: Optional[FetchOHLCV]=None, buffer_bars: int=500, warmup: int=100,
+                 poll_s: float=60.0, stale_s: float=30.0):
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self.url = stream_url(url or cfg.market_ws_url, self.symbols, timeframe)
+        self.fetch_ohlcv = fetch_ohlcv
+        self.warmup = min(warmup, buffer_bars)
+        self.poll_s = poll_s
+        self.stale_s = stale_s
+        self.connected = False
+        self.reconnects = 0
+        self.last_message = 0.0
+        self._codes = {binance_symbol(s).upper(): s for s in self.symbols}
+        self._bars: Dict[str, deque] = {s: deque(maxlen=buffer_bars) for s in self.symbols}
+        self._forming: Dict[str, list] = {}
+        self._tickers: Dict[str, dict] = {}
+        self._listeners: List[Callable[[str, str, list], None]] = []
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # --- reading ---
+
+    def bars(self, symbol: str) -> List[list]:
+        """Closed bars, oldest first, as ccxt [ts, o, h, l, c, v] rows."""
+        with self._cond:
+            return list(self._bars[symbol])
+
+    def forming(self, symbol: str) -> Optional[list]:
+        with self._cond:
+            return self._forming.get(symbol)
+
+    def ticker(self, symbol: str) -> Optional[dict]:
+        """Latest streamed ticker ({last, bid, ask, quoteVolume, timestamp}), or None if missing or stale."""
+        t = self._tickers.get(symbol)
+        if t is None or time.time() - t["timestamp"] / 1000 > self.stale_s:
+            return None
+        return t
+
+    def healthy(self) -> bool:
+        return self.connected and time.monotonic() - self.last_message < self.stale_s
+
+    def add_listener(self, fn: Callable[[str, str, list], None]) -> None:
+        """Registers fn(symbol, timeframe, bar), called from the feed thread for every newly closed bar."""
+        self._listeners.append(fn)
+
+    def wait_for_bar(self, symbol: str, after_ts: Optional[int], timeout: float) -> bool:
+        """Blocks until `symbol` has a closed bar newer than `after_ts`, up to `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                buf = self._bars[symbol]
+                if buf and (after_ts is None or buf[-1][0] > after_ts):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop:
+                    return False
+                self._cond.wait(remaining)
+
+    # --- updating ---
+
+    def _on_bar(self, symbol: str, bar: list, closed: bool) -> None:
+        new = False
+        with self._cond:
+            buf = self._bars[symbol]
+            if not closed:
+                if not buf or bar[0] > buf[-1][0]:
+                    self._forming[symbol] = bar
+                return
+            if not buf or bar[0] > buf[-1][0]:
+                buf.append(bar)
+                new = True
+                forming = self._forming.get(symbol)
+                if forming is not None and forming[0] <= bar[0]:
+                    del self._forming[symbol]
+                self._cond.notify_all()
+            elif bar[0] == buf[-1][0]:
+                buf[-1] = bar
+        if new:
+            for fn in self._listeners:
+                try:
+                    fn(symbol, self.timeframe, bar)
+                except Exception as e:
+                    print(f"[marketstream] listener error: {e}")
+
+    def _merge(self, symbol: str, ohlcv: list) -> None:
+        rows = [[int(r[0]), float(r[1]), float(r[2]), float(r[3]), float(r[4]), float(r[5])] for r in ohlcv]
+        for row in rows[:-1]:
+            self._on_bar(symbol, row, closed=True)
+        if rows:
+            self._on_bar(symbol, rows[-1], closed=False)
+
+    def handle_message(self, raw: str) -> None:
+        """Applies one Binance stream message (combined-stream envelope or bare event)."""
+        msg = json.loads(raw)
+        data = msg.get("data", msg)
+        symbol = self._codes.get(str(data.get("s", "")).upper())
+        if symbol is None:
+            return
+        event = data.get("e")
+        metrics.inc("market_stream_messages_total", kind=event or "unknown")
+        if event == "kline":
+            k = data["k"]
+            bar = [int(k["t"]), float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), float(k["v"])]
+            self._on_bar(symbol, bar, closed=bool(k["x"]))
+        elif event == "24hrTicker":
+            self._tickers[symbol] = {"symbol": symbol, "last": float(data["c"]), "bid": float(data.get("b") or 0),
+                                     "ask": float(data.get("a") or 0), "quoteVolume": float(data.get("q") or 0),
+                                     "timestamp": int(data.get("E") or time.time() * 1000)}
+
+    def poll(self) -> None:
+        """One REST pass: fetches what each buffer is missing (a full warm-up when empty)."""
+        if self.fetch_ohlcv is None:
+            return
+        step = timeframe_ms(self.timeframe)
+        now = int(time.time() * 1000)
+        for symbol in self.symbols:
+            buf = self._bars[symbol]
+            limit = self.warmup if not buf else min(self.warmup, max(5, (now - buf[-1][0]) // step + 2))
+            try:
+                self._merge(symbol, self.fetch_ohlcv(symbol, self.timeframe, int(limit)))
+            except Exception as e:
+                print(f"[marketstream] poll {symbol} failed: {e}")
+
+    # --- running ---
+
+    def start(self) -> "MarketDataClient":
+        if self._thread is None:
+            self.poll()
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._main()), name="marketstream", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop = True
+        with self._cond:
+            self._cond.notify_all()
+        if self._task is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._task.cancel)
+            except RuntimeError:
+                pass  # loop already finished
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    async def _main(self) -> None:
+        self._loop, self._task = asyncio.get_running_loop(), asyncio.current_task()
+        try:
+            await asyncio.gather(self._consume(), self._fallback())
+        except asyncio.CancelledError:
+            pass
+
+    async def _consume(self) -> None:
+        try:
+            from websockets.asyncio.client import connect
+        except ImportError:
+            print("[marketstream] websockets is not installed; polling only")
+            return
+        backoff = 1.0
+        while not self._stop:
+            try:
+                async with connect(self.url, ping_interval=20, open_timeout=10) as ws:
+                    self.connected = True
+                    self.last_message = time.monotonic()
+                    backoff = 1.0
+                    print(f"[marketstream] connected: {len(self.symbols)} symbols {self.timeframe}")
+                    # Bars that closed while disconnected come from REST once
+                    await asyncio.to_thread(self.poll)
+                    async for raw in ws:
+                        self.last_message = time.monotonic()
+                        self.handle_message(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[marketstream] disconnected: {e}")
+            self.connected = False
+            if self._stop:
+                return
+            self.reconnects += 1
+            metrics.inc("market_stream_reconnects_total")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+    async def _fallback(self) -> None:
+        while not self._stop:
+            await asyncio.sleep(self.poll_s)
+            if not self.healthy():
+                await asyncio.to_thread(self.poll)
+
+def market_feed(exchange, symbols: List[str], timeframe: str, warmup: int, poll_s: float) -> Optional[MarketDataClient]:
+    """
+    A started MarketDataClient backed by `exchange` (a ccxt instance) for REST
+    warm-up and fallback, or None when streaming is disabled or the exchange
+    has no Binance-compatible stream (callers then poll as before). Pointing
+    MARKET_WS_URL elsewhere, e.g. at bot.ws_replay, enables it for any exchange.
+    """
+    if not cfg.market_stream or (getattr(exchange, "id", None) != "binance" and cfg.market_ws_url == BINANCE_WS_URL):
+        return None
+    def fetch(symbol: str, timeframe: str, limit: int) -> list:
+        with metrics.exchange_call(exchange.id, "fetch_ohlcv"):
+            return exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
+    return MarketDataClient(symbols, timeframe, fetch_ohlcv=fetch, warmup=warmup, poll_s=poll_s).start()
+
+metrics.describe("market_stream_messages_total", "WebSocket market-data messages applied, by event type.")
+metrics.describe("market_stream_reconnects_total", "WebSocket market-data reconnect attempts.")
@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from .config import cfg
+from . import metrics
+
+# Exchange method each cached field stands in for
+METHODS = {"markets": "load_markets", "tickers": "fetch_tickers"}
+
+class ExchangeMetadataCache:
+    """
+    Markets and tickers per exchange id, each field with its own TTL. Entries
+    are mirrored to one JSON file per (exchange, field) under `path`, so a
+    restarted process starts warm instead of reloading markets. Concurrent
+    callers of the same field share one fetch. Cached markets are also handed
+    to ccxt instances so their implicit load_markets() is skipped.
+    """
+    def __init__(self, path: str="", ttls: Optional[Dict[str, float]]=None):
+        self.path = path
+        self.ttls = ttls or {"markets": cfg.metadata_markets_ttl_s, "tickers": cfg.metadata_tickers_ttl_s}
+        self.hits = 0
+        self.misses = 0
+        self._data: Dict[Tuple[str, str], Tuple[float, Any, str]] = {}  # (fetched_at, value, source)
+        self._read: set = set()
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _file(self, key: Tuple[str, str]) -> str:
+        return os.path.join(self.path, f"{key[0]}.{key[1]}.json")
+
+    def _fresh(self, key: Tuple[str, str]) -> Optional[Tuple[float, Any, str]]:
+        if self.path and key not in self._read:
+            self._read.add(key)
+            try:
+                with open(self._file(key)) as f:
+                    raw = json.load(f)
+                self._data.setdefault(key, (raw["fetched_at"], raw["value"], "disk"))
+            except (OSError, ValueError, KeyError):
+                pass
+        entry = self._data.get(key)
+        if entry is not None and time.time() - entry[0] < self.ttls[key[1]]:
+            return entry
+        return None
+
+    def _store(self, key: Tuple[str, str], value: Any) -> None:
+        now = time.time()
+        self._data[key] = (now, value, "memory")
+        if not self.path:
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            tmp = self._file(key) + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"fetched_at": now, "value": value}, f, default=str)
+            os.replace(tmp, self._file(key))
+        except OSError as e:
+            print(f"[metadata] could not persist {key[0]} {key[1]}: {e}")
+
+    def _hit(self, ex, field: str, entry: Tuple[float, Any, str]) -> Any:
+        self.hits += 1
+        metrics.inc("exchange_metadata_hits_total", exchange=ex.id, field=field, source=entry[2])
+        metrics.inc("exchange_calls_avoided_total", exchange=ex.id, method=METHODS[field])
+        return self._seed(ex, field, entry[1])
+
+    def _seed(self, ex, field: str, value: Any) -> Any:
+        if field == "markets" and not getattr(ex, "markets", None) and hasattr(ex, "set_markets"):
+            ex.set_markets(value)
+        return value
+
+    def _key_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, ex, field: str, fetch: Optional[Callable[[], Any]]=None, refresh: bool=False) -> Any:
+        """`field` of exchange `ex`, fetched with `fetch` (default: the matching ccxt method) when missing or expired."""
+        key = (ex.id, field)
+        entry = None if refresh else self._fresh(key)
+        if entry is None:
+            with self._key_lock(key):
+                entry = None if refresh else self._fresh(key)
+                if entry is None:
+                    self.misses += 1
+                    with metrics.exchange_call(ex.id, METHODS[field]):
+                        value = (fetch or getattr(ex, METHODS[field]))()
+                    self._store(key, value)
+                    return self._seed(ex, field, value)
+        return self._hit(ex, field, entry)
+
+    async def get_async(self, ex, field: str, fetch: Optional[Callable[[], Awaitable[Any]]]=None, refresh: bool=False) -> Any:
+        """get() for ccxt.async_support instances; `fetch` is a coroutine function."""
+        key = (ex.id, field)
+        entry = None if refresh else self._fresh(key)
+        if entry is not None:
+            return self._hit(ex, field, entry)
+        self.misses += 1
+        with metrics.exchange_call(ex.id, METHODS[field]):
+            value = await (fetch or getattr(ex, METHODS[field]))()
+        self._store(key, value)
+        return self._seed(ex, field, value)
+
+    def markets(self, ex, refresh: bool=False) -> dict:
+        return self.get(ex, "markets", refresh=refresh)
+
+    def tickers(self, ex, refresh: bool=False) -> dict:
+        return self.get(ex, "tickers", refresh=refresh)
+
+    def market(self, ex, symbol: str) -> dict:
+        """One market's metadata (precision, limits, lot size...)."""
+        return self.markets(ex)[symbol]
+
+    def prime(self, ex) -> None:
+        """Gives a new exchange instance the cached markets, if fresh, without any API call."""
+        entry = self._fresh((ex.id, "markets"))
+        if entry is not None and not getattr(ex, "markets", None):
+            self._hit(ex, "markets", entry)
+
+    def invalidate(self, exchange_id: Optional[str]=None, field: Optional[str]=None) -> None:
+        with self._lock:
+            for key in [k for k in self._data if exchange_id in (None, k[0]) and field in (None, k[1])]:
+                del self._data[key]
+                self._read.add(key)
+
+metadata = ExchangeMetadataCache(cfg.metadata_cache_dir)
+
+metrics.describe("exchange_metadata_hits_total", "Markets/tickers served from the metadata cache, by source.")
+metrics.describe("exchange_calls_avoided_total", "Exchange API calls answered by the metadata cache instead.")
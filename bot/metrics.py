@@ -0,0 +1,160 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Tuple
+from .config import cfg
+
+# Latency buckets in seconds, from sub-millisecond db reads up to slow exchange/AI calls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_help: Dict[str, str] = {}
+_counters: Dict[Tuple[str, tuple], float] = {}
+_hists: Dict[Tuple[str, tuple], list] = {}  # [bucket counts..., +Inf count, sum]
+_NULL = nullcontext()
+
+def enabled() -> bool:
+    return cfg.metrics
+
+def describe(name: str, help_text: str) -> None:
+    _help[name] = help_text
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    if not cfg.metrics:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+def observe(name: str, value: float, **labels) -> None:
+    if not cfg.metrics:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        h = _hists.get(key)
+        if h is None:
+            h = _hists[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, b in enumerate(BUCKETS):
+            if value <= b:
+                h[i] += 1
+                break
+        else:
+            h[len(BUCKETS)] += 1
+        h[-1] += value
+
+@contextmanager
+def _timer(name: str, labels: dict):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **labels)
+
+def timer(name: str, **labels):
+    """Context manager observing the block's duration in seconds into histogram `name`."""
+    return _timer(name, labels) if cfg.metrics else _NULL
+
+def timed(name: str, **labels):
+    """
+    Decorator form of timer(). When metrics are disabled at import time the
+    function is returned unwrapped, so instrumented hot paths pay nothing.
+    """
+    def wrap(fn):
+        if not cfg.metrics:
+            return fn
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - t0, **labels)
+        return inner
+    return wrap
+
+@contextmanager
+def exchange_call(exchange: str, method: str):
+    """Times one exchange API call and counts it as an error if it raises."""
+    if not cfg.metrics:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("exchange_request_errors_total", exchange=exchange, method=method)
+        raise
+    finally:
+        observe("exchange_request_seconds", time.perf_counter() - t0, exchange=exchange, method=method)
+
+def _fmt_labels(labels: tuple, extra: tuple = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = dict(_counters)
+        hists = {k: list(v) for k, v in _hists.items()}
+    lines = []
+    seen = set()
+    def header(name: str, kind: str) -> None:
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {value:g}")
+    for (name, labels), h in sorted(hists.items()):
+        header(name, "histogram")
+        cum = 0
+        for b, n in zip(BUCKETS, h):
+            cum += n
+            lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', f'{b:g}'),))} {cum}")
+        cum += h[len(BUCKETS)]
+        lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {cum}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {h[-1]:.6f}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {cum}")
+    return "\n".join(lines) + "\n"
+
+def start_http_server(port: int, host: str = "0.0.0.0"):
+    """Serves render() on http://host:port/metrics from a daemon thread, for processes without the webapp."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200 if self.path.startswith("/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _hists.clear()
+
+describe("db_query_seconds", "Time spent in instrumented db helpers.")
+describe("candles_written_total", "Candle rows passed to bulk_insert_candles/upsert_candles.")
+describe("exchange_request_seconds", "Exchange API call latency.")
+describe("exchange_request_errors_total", "Exchange API calls that raised.")
+describe("strategy_signals_seconds", "Strategy.generate_signals duration.")
+describe("backtest_seconds", "Backtest run duration.")
+describe("ai_request_seconds", "AI analyzer call latency.")
+describe("ai_prompt_tokens_total", "Estimated prompt tokens sent to AI providers.")
+describe("paper_trades_total", "Paper trades executed.")
+describe("http_request_seconds", "Flask request latency by route.")
@@ -0,0 +1,247 @@
+import inspect
+import itertools
+import json
+import random
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from .db import get_conn, init_schema, get_symbols, save_optimization_results
+from .config import cfg
+from .strategy import SMACrossoverStrategy, RSIStrategy
+from .backtest import (
+    PriceMatrix, load_price_matrix, stack_bars, bar_returns, IndicatorCache,
+    grid_signals, evaluate_segment, SegmentState, _default_params,
+)
+
+STRATEGIES = {"sma_crossover": SMACrossoverStrategy, "rsi": RSIStrategy}
+
+DEFAULT_SPACES: Dict[str, Dict[str, list]] = {
+    "sma_crossover": {"fast": [5, 10, 15, 20, 30], "slow": [30, 50, 75, 100, 150, 200]},
+    "rsi": {"rsi_period": [7, 10, 14, 21], "rsi_oversold": [20, 25, 30, 35], "rsi_overbought": [65, 70, 75, 80]},
+}
+
+def strategy_params(strategy_name: str) -> List[str]:
+    """Tunable parameters are the strategy's constructor arguments."""
+    if strategy_name not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy_name}")
+    sig = inspect.signature(STRATEGIES[strategy_name].__init__)
+    return [p for p in sig.parameters if p != "self"]
+
+def _validate_space(strategy_name: str, space: Dict[str, Sequence]) -> None:
+    unknown = set(space) - set(strategy_params(strategy_name))
+    if unknown:
+        raise ValueError(f"{strategy_name} has no parameter(s): {', '.join(sorted(unknown))}")
+
+def _is_valid(strategy_name: str, combo: dict) -> bool:
+    p = {**_default_params(), **combo}
+    if strategy_name == "sma_crossover":
+        return p["fast"] < p["slow"]
+    return p["rsi_oversold"] < p["rsi_overbought"]
+
+def grid_combos(strategy_name: str, space: Dict[str, Sequence]) -> List[dict]:
+    _validate_space(strategy_name, space)
+    keys = list(space)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+    return [c for c in combos if _is_valid(strategy_name, c)]
+
+def random_combos(strategy_name: str, space: Dict[str, Sequence], n_iter: int, seed: Optional[int]=None) -> List[dict]:
+    """
+    Samples distinct combos. A value list is sampled from directly; a
+    `(low, high)` tuple is treated as an inclusive integer range.
+    """
+    _validate_space(strategy_name, space)
+    rng = random.Random(seed)
+    seen, combos = set(), []
+    for _ in range(n_iter * 20):
+        if len(combos) >= n_iter:
+            break
+        combo = {
+            k: (rng.randint(v[0], v[1]) if isinstance(v, tuple) else rng.choice(list(v)))
+            for k, v in space.items()
+        }
+        key = tuple(sorted(combo.items()))
+        if key not in seen and _is_valid(strategy_name, combo):
+            seen.add(key)
+            combos.append(combo)
+    return combos
+
+class _Sweep:
+    """
+    Evaluates combos over per-symbol bar ranges of one price matrix, sharing
+    indicator memos. Ranges are (lo, hi) arrays of bar indices, one per symbol.
+    """
+    def __init__(self, pm: PriceMatrix, strategy_name: str):
+        self.pm = pm
+        self.strategy_name = strategy_name
+        self.bars, self.lengths = stack_bars(pm)
+        self.valid = ~np.isnan(self.bars)
+        self.ret = bar_returns(self.bars)
+        self.cache = IndicatorCache(self.bars)
+        # Bars each symbol has before time row t, so calendar cut points map to bar indices
+        self._before = np.vstack([np.zeros((1, len(pm.symbols)), dtype=np.int64), np.cumsum(~np.isnan(pm.close), axis=0)])
+
+    def full(self):
+        return np.zeros_like(self.lengths), self.lengths.copy()
+
+    def bars_before(self, time_row: int) -> np.ndarray:
+        """Per-symbol bar index of the first bar at or after row `time_row` of pm.ts."""
+        return self._before[time_row]
+
+    def evaluate(self, combo: dict, lo: np.ndarray, hi: np.ndarray, state: Optional[SegmentState]=None):
+        """
+        Per-symbol (trades, return_pct, max_dd_pct) over each symbol's bars [lo, hi),
+        continuing from `state` when given. Signals are only computed for the
+        rows the range covers. Returns (result, state).
+        """
+        r0, r1 = (int(lo.min()), int(hi.max())) if len(lo) else (0, 0)
+        sig = grid_signals(self.cache, self.strategy_name, {**_default_params(), **combo}, slice(r0, r1))
+        # Realign so every symbol's window starts at row 0
+        k = np.arange(int((hi - lo).max()) if len(lo) else 0)[:, None]
+        idx = lo[None, :] + k
+        inside = idx < hi[None, :]
+        idx = np.clip(idx, r0, max(r1 - 1, r0))
+        take = lambda a, base=0: np.take_along_axis(a, idx - base, axis=0)
+        return evaluate_segment(take(sig, r0), take(self.ret), take(self.valid) & inside, state)
+
+    def eligible(self, combo: dict) -> np.ndarray:
+        p = {**_default_params(), **combo}
+        return self.lengths >= max(p["fast"], p["slow"], p["rsi_period"]) + 2
+
+def _score(ret_pct: np.ndarray, mask: np.ndarray) -> float:
+    return float(ret_pct[mask].mean()) if mask.any() else float("-inf")
+
+def _rows(sweep: _Sweep, combo: dict, result, phase: str, fold: Optional[int]=None) -> List[dict]:
+    trades, ret_pct, max_dd_pct = result
+    mask = sweep.eligible(combo)
+    return [
+        dict(symbol=symbol, params=combo, phase=phase, fold=fold, trades=int(trades[j]),
+             return_pct=round(float(ret_pct[j]), 2), max_dd_pct=round(float(max_dd_pct[j]), 2))
+        for j, symbol in enumerate(sweep.pm.symbols) if mask[j]
+    ]
+
+def _search(sweep: _Sweep, combos: List[dict], start: np.ndarray, stop: np.ndarray,
+            prune_frac: float, prune_margin: float, fold: Optional[int]=None, phase: str="full"):
+    """
+    Scores combos on each symbol's bars [start, stop). With pruning enabled each
+    combo is first scored on the leading `prune_frac` of the range; those
+    trailing the best prefix score by more than `prune_margin` return points
+    stop there, the rest continue from where the prefix left off. Returns
+    (rows, best_combo).
+    """
+    rows: List[dict] = []
+    runs = [(combo, start, None) for combo in combos]
+    if 0 < prune_frac < 1 and len(combos) > 2:
+        cut = start + ((stop - start) * prune_frac).astype(np.int64)
+        scored = []
+        for combo in combos:
+            result, state = sweep.evaluate(combo, start, cut)
+            scored.append((_score(result[1], sweep.eligible(combo)), combo, result, state))
+        leader = max(score for score, _, _, _ in scored)
+        runs = []
+        for score, combo, result, state in scored:
+            if score < leader - prune_margin:
+                rows.extend(_rows(sweep, combo, result, "pruned", fold))
+            else:
+                runs.append((combo, cut, state))
+
+    best, best_score = None, float("-inf")
+    for combo, lo, state in runs:
+        result, _ = sweep.evaluate(combo, lo, stop, state)
+        rows.extend(_rows(sweep, combo, result, phase, fold))
+        score = _score(result[1], sweep.eligible(combo))
+        if best is None or score > best_score:
+            best, best_score = combo, score
+    return rows, best
+
+def _load(conn, timeframe: str, quote: Optional[str], top: Optional[int], symbols: Optional[List[str]]) -> PriceMatrix:
+    if symbols is None:
+        symbols = get_symbols(conn, cfg.exchange, quote=quote)
+        symbols = symbols[: top or len(symbols)]
+    return load_price_matrix(conn, cfg.exchange, symbols, timeframe)
+
+def _finish(conn, rows: List[dict], method: str, strategy_name: str, timeframe: str, save: bool) -> pd.DataFrame:
+    sweep_id = uuid.uuid4().hex[:12]
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    df.insert(0, "sweep_id", sweep_id)
+    if save:
+        ts = int(time.time() * 1000)
+        save_optimization_results(conn, [
+            (sweep_id, ts, method, strategy_name, timeframe, r["symbol"], json.dumps(r["params"], sort_keys=True),
+             r["phase"], r["fold"], r["trades"], r["return_pct"], r["max_dd_pct"])
+            for r in rows
+        ])
+        print(f"[optimize] sweep {sweep_id}: {method} {strategy_name} {timeframe}, {len(rows)} rows saved")
+    return df
+
+def optimize(
+    database_url: str,
+    strategy_name: str="sma_crossover",
+    method: str="grid",
+    space: Optional[Dict[str, Sequence]]=None,
+    timeframe: str="1h",
+    quote: Optional[str]=None,
+    top: Optional[int]=20,
+    symbols: Optional[List[str]]=None,
+    n_iter: int=50,
+    seed: Optional[int]=None,
+    folds: int=4,
+    train_frac: float=0.7,
+    prune_frac: float=0.3,
+    prune_margin: float=10.0,
+    save: bool=True,
+) -> pd.DataFrame:
+    """
+    Parameter sweep for SMACrossoverStrategy/RSIStrategy.
+
+    method="grid" tries every combo in `space`, "random" samples `n_iter` of
+    them, "walkforward" splits the calendar into `folds` consecutive windows, grid
+    searches the first `train_frac` of each and reports the winner on the rest
+    (phase "train"/"test"). Combos trailing the leader by more than
+    `prune_margin` points on the leading `prune_frac` of the range stop early
+    (phase "pruned"); prune_frac=0 runs every combo to the end.
+    Returns one row per (combo, symbol, phase) tagged with the sweep id.
+    """
+    if strategy_name not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy_name}")
+    space = space or DEFAULT_SPACES[strategy_name]
+    conn = get_conn(database_url)
+    init_schema(conn)
+    pm = _load(conn, timeframe, quote, top, symbols)
+    if not pm.symbols:
+        return pd.DataFrame()
+    sweep = _Sweep(pm, strategy_name)
+
+    if method == "grid":
+        rows, _ = _search(sweep, grid_combos(strategy_name, space), *sweep.full(), prune_frac, prune_margin)
+    elif method == "random":
+        rows, _ = _search(sweep, random_combos(strategy_name, space, n_iter, seed), *sweep.full(), prune_frac, prune_margin)
+    elif method == "walkforward":
+        combos = grid_combos(strategy_name, space)
+        rows = []
+        # Folds are cut in calendar time (rows of pm.ts), so every symbol trains and tests on the same dates
+        edges = np.linspace(0, len(pm.ts), folds + 1).astype(int)
+        for fold, (a, b) in enumerate(zip(edges[:-1], edges[1:])):
+            split = a + int((b - a) * train_frac)
+            if split <= a or split >= b:
+                continue
+            lo, mid, hi = sweep.bars_before(a), sweep.bars_before(split), sweep.bars_before(b)
+            train_rows, best = _search(sweep, combos, lo, mid, prune_frac, prune_margin, fold, "train")
+            rows.extend(train_rows)
+            if best is not None:
+                rows.extend(_rows(sweep, best, sweep.evaluate(best, mid, hi)[0], "test", fold))
+    else:
+        raise ValueError(f"Unknown optimization method: {method}")
+
+    return _finish(conn, rows, method, strategy_name, timeframe, save)
+
+def best_params(df: pd.DataFrame, phase: str="full") -> Optional[dict]:
+    """Combo with the highest mean return across symbols for the given phase."""
+    sub = df[df["phase"] == phase] if not df.empty else df
+    if sub.empty:
+        return None
+    key = sub["params"].map(lambda p: json.dumps(p, sort_keys=True))
+    return json.loads(sub.groupby(key)["return_pct"].mean().idxmax())
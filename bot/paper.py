@@ -1,13 +1,40 @@
-import time
-from .db import get_conn, get_candles_df, paper_get, paper_set, paper_trade
+from typing import Optional
+from .clock import Clock, WALL_CLOCK
+from .db import get_conn, get_candles_after, paper_get, paper_set, paper_trade, write_batch
 from .config import cfg
 from .strategy import SMACrossoverStrategy
+from .stream import publish_trade
+from .backtest import fill_price
 
-def _now_ms() -> int:
-    return int(time.time() * 1000)
+class StoredCandles:
+    """paper_loop's default data source: closed bars as stored in the database."""
+    def __init__(self, conn, exchange: str):
+        self.conn = conn
+        self.exchange = exchange
 
-def paper_loop(database_url: str, symbol: str, timeframe: str="1m", strategy: SMACrossoverStrategy = SMACrossoverStrategy(), cash_per_trade: float=100.0, stop_loss_pct: float=0.05, take_profit_pct: float=0.1, sleep_s: int=60):
+    def candles_after(self, symbol: str, timeframe: str, after_ts: Optional[int]=None, tail: Optional[int]=None):
+        return get_candles_after(self.conn, self.exchange, symbol, timeframe, after_ts=after_ts, tail=tail)
+
+def load_stream(conn, symbol: str, timeframe: str, strategy, source=None):
+    """
+    Restores the strategy's incremental state from paper_state, or warms it up
+    from only the last few stored bars when there is no usable checkpoint.
+    """
+    source = source or StoredCandles(conn, cfg.exchange)
+    stream = strategy.streaming()
+    if not stream.load_json(paper_get(conn, f"ind:{symbol}:{timeframe}")):
+        stream = strategy.streaming()
+        for ts, close in source.candles_after(symbol, timeframe, tail=stream.warmup_bars() + 1):
+            stream.update(ts, close)
+    return stream
+
+def paper_loop(database_url: str, symbol: str, timeframe: str="1m", strategy: SMACrossoverStrategy = SMACrossoverStrategy(), cash_per_trade: float=100.0, stop_loss_pct: float=0.05, take_profit_pct: float=0.1, sleep_s: int=60,
+               fee_rate: float | None=None, slippage_bps: float | None=None, clock: Clock=WALL_CLOCK, source=None):
+    """`clock` and `source` (anything with StoredCandles.candles_after) are injectable for replays."""
     conn = get_conn(database_url)
+    source = source or StoredCandles(conn, cfg.exchange)
+    fee_rate = cfg.paper_fee_rate if fee_rate is None else fee_rate
+    slippage_bps = cfg.paper_slippage_bps if slippage_bps is None else slippage_bps
     pos_key = f"pos:{symbol}"
     cash_key = "cash"
     cash = float(paper_get(conn, cash_key, default=str(cfg.paper_starting_cash)))
@@ -16,22 +43,30 @@ def paper_loop(database_url: str, symbol: str, timeframe: str="1m", strategy: SM
     
     print(f"[paper] starting cash £{cash:.2f}, position {symbol} qty={pos_qty}")
 
+    stream = load_stream(conn, symbol, timeframe, strategy, source)
+    state_key = f"ind:{symbol}:{timeframe}"
+    if stream.last_ts is not None:
+        paper_set(conn, state_key, stream.to_json())
     last_ts = None
     while True:
-        df = get_candles_df(conn, cfg.exchange, symbol, timeframe)
-        if df.empty:
+        # Only bars newer than the stream's last one are read and folded in
+        new_bars = source.candles_after(symbol, timeframe, after_ts=stream.last_ts)
+        for bar_ts, close in new_bars:
+            stream.update(bar_ts, close)
+        if new_bars:
+            paper_set(conn, state_key, stream.to_json())
+        if stream.last_ts is None:
             print(f"[paper] no candles for {symbol} {timeframe}. Waiting...")
-            time.sleep(sleep_s)
+            clock.sleep(sleep_s)
             continue
-        ts = int(df.index[-1].timestamp() * 1000)
+        ts = stream.last_ts
         if ts == last_ts:
-            time.sleep(sleep_s)
+            clock.sleep(sleep_s)
             continue
         last_ts = ts
-        
-        sig = strategy.generate_signals(df)
-        sig_last = int(sig.iloc[-1]) if len(sig) else 0
-        price = float(df['close'].iloc[-1])
+
+        sig_last = stream.signal
+        price = stream.last_close
         
         # Risk management
         if pos_qty > 0:
@@ -43,27 +78,37 @@ def paper_loop(database_url: str, symbol: str, timeframe: str="1m", strategy: SM
                 sig_last = 0
 
         if sig_last == 1 and cash > 0:
-            qty = max(0.0, (cash_per_trade / price))
+            px = fill_price(price, "buy", slippage_bps)
+            qty = max(0.0, (cash_per_trade / px))
             if qty > 0:
-                cash -= qty * price
+                fee = qty * px * fee_rate
+                cash -= qty * px + fee
                 pos_qty += qty
-                entry_price = price
-                paper_set(conn, cash_key, str(cash))
-                paper_set(conn, pos_key, str(pos_qty))
-                paper_set(conn, f"entry_price:{symbol}", str(entry_price))
-                paper_trade(conn, ts=_now_ms(), symbol=symbol, side="buy", qty=qty, price=price, note="Strategy BUY")
-                print(f"[paper] BUY {symbol} qty={qty:.6f} @ {price:.4f} | cash £{cash:.2f}")
+                entry_price = px
+                with write_batch(conn):
+                    paper_set(conn, cash_key, str(cash))
+                    paper_set(conn, pos_key, str(pos_qty))
+                    paper_set(conn, f"entry_price:{symbol}", str(entry_price))
+                    trade_ts = clock.now_ms()
+                    paper_trade(conn, ts=trade_ts, symbol=symbol, side="buy", qty=qty, price=px, fee=fee, note="Strategy BUY")
+                publish_trade(symbol, "buy", qty, px, trade_ts, "Strategy BUY")
+                print(f"[paper] BUY {symbol} qty={qty:.6f} @ {px:.4f} fee £{fee:.4f} | cash £{cash:.2f}")
         elif sig_last == 0 and pos_qty > 0:
             qty = pos_qty
-            cash += qty * price
+            px = fill_price(price, "sell", slippage_bps)
+            fee = qty * px * fee_rate
+            cash += qty * px - fee
             pos_qty = 0.0
             entry_price = 0.0
-            paper_set(conn, cash_key, str(cash))
-            paper_set(conn, pos_key, str(pos_qty))
-            paper_set(conn, f"entry_price:{symbol}", str(entry_price))
-            paper_trade(conn, ts=_now_ms(), symbol=symbol, side="sell", qty=qty, price=price, note="Strategy SELL")
-            print(f"[paper] SELL {symbol} qty={qty:.6f} @ {price:.4f} | cash £{cash:.2f}")
+            with write_batch(conn):
+                paper_set(conn, cash_key, str(cash))
+                paper_set(conn, pos_key, str(pos_qty))
+                paper_set(conn, f"entry_price:{symbol}", str(entry_price))
+                trade_ts = clock.now_ms()
+                paper_trade(conn, ts=trade_ts, symbol=symbol, side="sell", qty=qty, price=px, fee=fee, note="Strategy SELL")
+            publish_trade(symbol, "sell", qty, px, trade_ts, "Strategy SELL")
+            print(f"[paper] SELL {symbol} qty={qty:.6f} @ {px:.4f} fee £{fee:.4f} | cash £{cash:.2f}")
         else:
             print(f"[paper] HOLD {symbol} @ {price:.4f} | cash £{cash:.2f}, pos {pos_qty:.6f}")
 
-        time.sleep(sleep_s)
+        clock.sleep(sleep_s)
@@ -0,0 +1,106 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .db import get_conn, save_backtest_results
+from .config import cfg
+from .backtest import (
+    load_price_matrix, stack_bars, bar_returns, IndicatorCache, grid_signals,
+    evaluate_signals, _default_params,
+)
+
+# (symbol, strategy_name, params)
+Job = Tuple[str, str, dict]
+
+# Per-worker state, populated by _init_worker
+_shm: Optional[shared_memory.SharedMemory] = None
+_bars: Optional[np.ndarray] = None
+_lengths: Optional[np.ndarray] = None
+_caches: Dict[int, IndicatorCache] = {}
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 has no `track`; workers share the parent's tracker
+        return shared_memory.SharedMemory(name=name)
+
+def _init_worker(name: str, shape: Tuple[int, int], lengths: np.ndarray) -> None:
+    global _shm, _bars, _lengths
+    _shm = _attach(name)
+    _bars = np.ndarray(shape, dtype=np.float64, buffer=_shm.buf)
+    _lengths = lengths
+    _caches.clear()
+
+def _run_job(col: int, strategy_name: str, params: dict) -> Optional[dict]:
+    params = {**_default_params(), **params}
+    n = int(_lengths[col])
+    if n < max(params["fast"], params["slow"], params["rsi_period"]) + 2:
+        return None
+    cache = _caches.get(col)
+    if cache is None:
+        # Zero-copy view of this symbol's column in shared memory
+        cache = _caches[col] = IndicatorCache(_bars[:n, col:col + 1])
+    valid = np.ones((n, 1), dtype=bool)
+    sig = grid_signals(cache, strategy_name, params)
+    trades, ret_pct, max_dd_pct = evaluate_signals(sig, bar_returns(cache.bars), valid)
+    return dict(trades=int(trades[0]), return_pct=round(float(ret_pct[0]), 2), max_dd_pct=round(float(max_dd_pct[0]), 2))
+
+def run_parallel_backtests(
+    database_url: str,
+    jobs: List[Job],
+    timeframe: str="1h",
+    max_workers: Optional[int]=None,
+    save: bool=True,
+) -> pd.DataFrame:
+    """
+    Runs (symbol, strategy, params) jobs across a process pool. Candles are read
+    once, packed into bar space and published through shared memory; workers
+    attach to the block instead of reading SQLite or unpickling DataFrames.
+    Results are merged into backtest_results in a single transaction.
+    """
+    conn = get_conn(database_url)
+    symbols = sorted({j[0] for j in jobs})
+    pm = load_price_matrix(conn, cfg.exchange, symbols, timeframe)
+    col_of = {s: i for i, s in enumerate(pm.symbols)}
+
+    rows = []
+    if pm.symbols:
+        bars, lengths = stack_bars(pm)
+        shm = shared_memory.SharedMemory(create=True, size=max(bars.nbytes, 1))
+        try:
+            np.ndarray(bars.shape, dtype=np.float64, buffer=shm.buf)[:] = bars
+            with ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count(),
+                initializer=_init_worker,
+                initargs=(shm.name, bars.shape, lengths),
+            ) as pool:
+                futures = [
+                    (job, pool.submit(_run_job, col_of[job[0]], job[1], job[2]))
+                    for job in jobs if job[0] in col_of
+                ]
+                for (symbol, strategy_name, params), fut in futures:
+                    r = fut.result()
+                    if r is not None:
+                        rows.append(dict(params, symbol=symbol, strategy=strategy_name, **r))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    summary = pd.DataFrame(rows)
+    if save:
+        batch = []
+        for symbol, strategy_name in sorted({(j[0], j[1]) for j in jobs}):
+            part = summary[(summary["symbol"] == symbol) & (summary["strategy"] == strategy_name)] if rows else summary
+            if part.empty:
+                part = pd.DataFrame([{"symbol": symbol, "trades": 0, "return_pct": 0, "max_dd_pct": 0, "error": "No result. Ingest more data for this symbol and timeframe."}])
+            else:
+                # Params of other strategies show up as all-NaN columns after the merge
+                part = part.drop(columns=["strategy"]).dropna(axis=1, how="all").convert_dtypes()
+                part = part.sort_values("return_pct", ascending=False)
+            batch.append((symbol, strategy_name, part))
+        save_backtest_results(conn, batch)
+    if summary.empty:
+        return summary
+    return summary.sort_values("return_pct", ascending=False).reset_index(drop=True)
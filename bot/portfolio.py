@@ -0,0 +1,162 @@
+import json
+import time
+from typing import List
+import numpy as np
+from .db import get_conn, get_candles_after, get_closes_after, paper_get, paper_set, paper_trade, write_batch
+from .config import cfg
+from .strategy import SMACrossoverStrategy
+from .stream import publish_trade
+from .backtest import fill_price
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+class PortfolioEngine:
+    """
+    Paper-trades many symbols against one in-memory cash/position ledger, using
+    paper_loop's rules (fixed cash per BUY while the signal is long, stop-loss /
+    take-profit exits, SELL of the whole position when the signal goes flat).
+    Indicators for all symbols live in parallel arrays and are updated with
+    masked vector ops; every step's ledger changes commit in one transaction.
+    State uses paper_loop's keys (cash, pos:*, entry_price:*), so it replaces
+    one-process-per-symbol loops without a migration.
+    """
+    def __init__(self, database_url: str, symbols: List[str], timeframe: str="1m", strategy=SMACrossoverStrategy(),
+                 cash_per_trade: float=100.0, stop_loss_pct: float=0.05, take_profit_pct: float=0.1,
+                 fee_rate: float | None=None, slippage_bps: float | None=None):
+        self.conn = get_conn(database_url)
+        self.symbols = list(symbols)
+        self.col = {s: i for i, s in enumerate(self.symbols)}
+        self.timeframe = timeframe
+        self.cash_per_trade = cash_per_trade
+        self.stop_loss_pct = stop_loss_pct
+        self.take_profit_pct = take_profit_pct
+        self.fee_rate = cfg.paper_fee_rate if fee_rate is None else fee_rate
+        self.slippage_bps = cfg.paper_slippage_bps if slippage_bps is None else slippage_bps
+        n = len(self.symbols)
+
+        self.cash = float(paper_get(self.conn, "cash", default=str(cfg.paper_starting_cash)))
+        self.pos = np.array([float(paper_get(self.conn, f"pos:{s}", default="0")) for s in self.symbols])
+        self.entry = np.array([float(paper_get(self.conn, f"entry_price:{s}", default="0")) for s in self.symbols])
+        self.last_ts = np.full(n, -1, dtype=np.int64)
+        self.price = np.full(n, np.nan)
+
+        self.strategy = strategy.vectorized(n)
+        self.state_key = f"portfolio:ind:{timeframe}"
+        if not self._restore():
+            self._warm_up(strategy)
+
+    def _restore(self) -> bool:
+        raw = paper_get(self.conn, self.state_key)
+        if not raw:
+            return False
+        data = json.loads(raw)
+        if data.get("symbols") != self.symbols or data.get("kind") != self.strategy.kind or data.get("params") != self.strategy.params:
+            return False
+        self.strategy.load_state(data["state"])
+        self.last_ts = np.asarray(data["last_ts"], dtype=np.int64)
+        self.price = np.array([np.nan if p is None else p for p in data["price"]], dtype=float)
+        return True
+
+    def _warm_up(self, strategy) -> None:
+        # Only the last warm-up window of each symbol is read, never full history
+        window = strategy.streaming().warmup_bars() + 1
+        bars = []
+        for s in self.symbols:
+            bars.extend((s, ts, c) for ts, c in get_candles_after(self.conn, cfg.exchange, s, self.timeframe, tail=window))
+        self._apply_bars(sorted(bars, key=lambda b: b[1]))
+
+    def _checkpoint(self) -> None:
+        paper_set(self.conn, self.state_key, json.dumps({
+            "symbols": self.symbols, "kind": self.strategy.kind, "params": self.strategy.params,
+            "state": self.strategy.to_state(), "last_ts": self.last_ts.tolist(),
+            "price": [None if np.isnan(p) else float(p) for p in self.price],
+        }))
+
+    def _apply_bars(self, bars) -> np.ndarray:
+        """Folds (symbol, ts, close) bars in time order; returns the mask of symbols that moved."""
+        updated = np.zeros(len(self.symbols), dtype=bool)
+        i = 0
+        while i < len(bars):
+            j = i
+            while j < len(bars) and bars[j][1] == bars[i][1]:
+                j += 1
+            group = [(self.col[s], c) for s, ts, c in bars[i:j] if ts > self.last_ts[self.col[s]]]
+            if group:
+                cols = np.array([g[0] for g in group], dtype=np.int64)
+                closes = np.array([g[1] for g in group], dtype=float)
+                self.strategy.update(cols, closes)
+                self.price[cols] = closes
+                self.last_ts[cols] = bars[i][1]
+                updated[cols] = True
+            i = j
+        return updated
+
+    def step(self) -> int:
+        """Processes bars that arrived since the last step. Returns the number of trades."""
+        # Each symbol is read from its own last bar, so a halted one doesn't drag the others' window back
+        after = {s: (int(t) if t >= 0 else None) for s, t in zip(self.symbols, self.last_ts)}
+        updated = self._apply_bars(get_closes_after(self.conn, cfg.exchange, self.symbols, self.timeframe, after))
+        if not updated.any():
+            return 0
+
+        sig = self.strategy.signal.copy()
+        price = self.price
+        held = self.pos > 0
+        with np.errstate(invalid="ignore"):
+            stop = updated & held & (price <= self.entry * (1 - self.stop_loss_pct))
+            take = updated & held & (price >= self.entry * (1 + self.take_profit_pct))
+        sig[stop | take] = 0
+
+        # Buys are funded in symbol order while cash stays positive, as sequential paper_loops would be
+        want = np.flatnonzero(updated & (sig == 1))
+        cost = np.full(len(want), self.cash_per_trade)
+        buys = want[(self.cash - np.cumsum(cost) + cost) > 0]
+        sells = np.flatnonzero(updated & (sig == 0) & held)
+
+        px_buy = fill_price(price[buys], "buy", self.slippage_bps)
+        qty_buy = self.cash_per_trade / px_buy
+        fee_buy = qty_buy * px_buy * self.fee_rate
+        self.cash -= float((qty_buy * px_buy + fee_buy).sum())
+        self.pos[buys] += qty_buy
+        self.entry[buys] = px_buy
+        px_sell = fill_price(price[sells], "sell", self.slippage_bps)
+        qty_sell = self.pos[sells].copy()
+        fee_sell = qty_sell * px_sell * self.fee_rate
+        self.cash += float((qty_sell * px_sell - fee_sell).sum())
+        self.pos[sells] = 0.0
+        self.entry[sells] = 0.0
+        ts = _now_ms()
+        trades = [(self.symbols[c], "buy", float(q), float(p), float(f), "Strategy BUY")
+                  for c, q, p, f in zip(buys, qty_buy, px_buy, fee_buy)]
+        for c, q, p, f in zip(sells, qty_sell, px_sell, fee_sell):
+            note = "STOP-LOSS" if stop[c] else "TAKE-PROFIT" if take[c] else "Strategy SELL"
+            trades.append((self.symbols[c], "sell", float(q), float(p), float(f), note))
+
+        with write_batch(self.conn):
+            if trades:
+                paper_set(self.conn, "cash", str(self.cash))
+                for c in np.concatenate([buys, sells]):
+                    s = self.symbols[c]
+                    paper_set(self.conn, f"pos:{s}", str(self.pos[c]))
+                    paper_set(self.conn, f"entry_price:{s}", str(self.entry[c]))
+                for symbol, side, qty, px, fee, note in trades:
+                    paper_trade(self.conn, ts=ts, symbol=symbol, side=side, qty=qty, price=px, fee=fee, note=note)
+            self._checkpoint()
+        for symbol, side, qty, px, fee, note in trades:
+            publish_trade(symbol, side, qty, px, ts, note)
+        return len(trades)
+
+    def equity(self) -> float:
+        return self.cash + float(np.nansum(self.pos * self.price))
+
+def portfolio_loop(database_url: str, symbols: List[str], timeframe: str="1m", strategy=SMACrossoverStrategy(),
+                   cash_per_trade: float=100.0, stop_loss_pct: float=0.05, take_profit_pct: float=0.1, sleep_s: int=60):
+    engine = PortfolioEngine(database_url, symbols, timeframe, strategy, cash_per_trade, stop_loss_pct, take_profit_pct)
+    print(f"[portfolio] {len(symbols)} symbols on {timeframe}, starting cash £{engine.cash:.2f}")
+    while True:
+        n = engine.step()
+        if n:
+            print(f"[portfolio] {n} trades | cash £{engine.cash:.2f}, equity £{engine.equity():.2f}, "
+                  f"{int((engine.pos > 0).sum())} open positions")
+        time.sleep(sleep_s)
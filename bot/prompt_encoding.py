@@ -0,0 +1,81 @@
+import re
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+
+# Rough BPE behaviour: digits go in runs of up to 3, words are one token, punctuation one each
+_TOKEN_RE = re.compile(r"\d{1,3}|[A-Za-z]+|[^\sA-Za-z\d]")
+
+FORMAT_NOTE = (
+    "Data format: ret_Nb = % return over the last N bars, vol = stdev of bar returns in %, "
+    "sma20/sma50 = % distance of close from each average, rsi14, range50 = close position in the "
+    "50-bar high-low range (0-100), volx = last volume / 20-bar mean. Series are the last price "
+    "followed by per-bar changes in basis points, oldest first (c = close, h/l = high/low vs close)."
+)
+
+def estimate_tokens(text: str) -> int:
+    return len(_TOKEN_RE.findall(text))
+
+def _pct(a: float, b: float) -> float:
+    return (a / b - 1) * 100 if b else 0.0
+
+def feature_summary(df: pd.DataFrame) -> str:
+    """One line of precomputed features that stands in for the raw bars."""
+    close = df["close"].to_numpy(dtype=float)
+    last = close[-1]
+    ret = np.diff(close) / close[:-1] * 100 if len(close) > 1 else np.zeros(1)
+    parts = [f"last={last:.6g}"]
+    for n in (1, 5, 20, 50):
+        if len(close) > n:
+            parts.append(f"ret_{n}b={_pct(last, close[-1 - n]):.2f}")
+    parts.append(f"vol={ret[-20:].std():.2f}")
+    for n in (20, 50):
+        if len(close) >= n:
+            parts.append(f"sma{n}={_pct(last, close[-n:].mean()):.2f}")
+    if len(close) > 14:
+        d = np.diff(close[-15:])
+        gain, loss = d[d > 0].sum() / 14, -d[d < 0].sum() / 14
+        parts.append(f"rsi14={100 - 100 / (1 + gain / loss) if loss else 100.0:.0f}")
+    hi, lo = df["high"].to_numpy(dtype=float)[-50:].max(), df["low"].to_numpy(dtype=float)[-50:].min()
+    if hi > lo:
+        parts.append(f"range50={(last - lo) / (hi - lo) * 100:.0f}")
+    vol = df["volume"].to_numpy(dtype=float)
+    if len(vol) >= 20 and vol[-20:].mean() > 0:
+        parts.append(f"volx={vol[-1] / vol[-20:].mean():.2f}")
+    return " ".join(parts)
+
+def delta_series(close: np.ndarray) -> str:
+    """'last | d1,d2,...' where d are integer basis-point changes from one close to the next."""
+    bps = np.round(np.diff(close) / close[:-1] * 10_000).astype(int)
+    return f"{close[-1]:.6g} | " + ",".join(map(str, bps.tolist()))
+
+def ohlc_series(df: pd.DataFrame) -> str:
+    """Close deltas plus each bar's high/low as basis points above/below its close."""
+    close = df["close"].to_numpy(dtype=float)
+    hi = np.round((df["high"].to_numpy(dtype=float) / close - 1) * 10_000).astype(int)
+    lo = np.round((1 - df["low"].to_numpy(dtype=float) / close) * 10_000).astype(int)
+    return f"c: {delta_series(close)}\nh/l: " + ",".join(f"{h}/{l}" for h, l in zip(hi[1:].tolist(), lo[1:].tolist()))
+
+def encodings(df: pd.DataFrame) -> List[Tuple[str, str]]:
+    """Candidate (name, text) encodings of the last 50 bars, richest first."""
+    df = df.tail(50)
+    summary = feature_summary(df)
+    close = df["close"].to_numpy(dtype=float)
+    out = [("summary+ohlc50", f"{summary}\n{ohlc_series(df)}")]
+    for n in (50, 20):
+        out.append((f"summary+close{n}", f"{summary}\nc: {delta_series(close[-n - 1:])}"))
+    out.append(("summary", summary))
+    return out
+
+def encode_market(df: pd.DataFrame, budget_tokens: int) -> Tuple[str, str, int]:
+    """
+    The richest encoding of `df` that fits in `budget_tokens`, as (name, text,
+    estimated tokens). Falls back to the bare summary when nothing fits.
+    """
+    options = encodings(df)
+    for name, text in options:
+        tokens = estimate_tokens(text)
+        if tokens <= budget_tokens:
+            return name, text, tokens
+    name, text = options[-1]
+    return name, text, estimate_tokens(text)
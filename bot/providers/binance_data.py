@@ -1,10 +1,12 @@
 from binance.spot import Spot as Binance
 from ..config import cfg
+from .. import metrics
 
 class BinanceData:
     def __init__(self, base_url: str | None = None):
         self.client = Binance(base_url=(base_url or cfg.binance_base_url))
 
+    @metrics.timed("exchange_request_seconds", exchange="binance", method="klines")
     def klines(self, symbol: str, interval: str="1h", start_ms: int | None=None, limit: int=1000):
         return self.client.klines(symbol=symbol, interval=interval, startTime=start_ms, limit=limit)
 
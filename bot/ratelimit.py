@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+
+class TokenBucket:
+    """
+    Shared request-weight budget. `rate` tokens refill per second up to
+    `capacity`. Callers reserve weight up front and wait out any deficit, so
+    concurrent callers queue fairly instead of all retrying at once. Safe to
+    share between threads and between tasks on one event loop.
+    """
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, weight: float = 1.0) -> float:
+        """Takes `weight` tokens and returns how many seconds the caller must wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= weight
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self, weight: float = 1.0) -> None:
+        wait = self.reserve(weight)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, weight: float = 1.0) -> None:
+        wait = self.reserve(weight)
+        if wait:
+            await asyncio.sleep(wait)
+
+def binance_klines_weight(limit: int) -> int:
+    """Request weight Binance charges for a klines call of `limit` rows."""
+    if limit <= 100:
+        return 1
+    if limit <= 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+def bucket_for_exchange(ex, weight_per_minute: float | None = None) -> TokenBucket:
+    """
+    Budget from an explicit weight-per-minute limit, or from ccxt's `rateLimit`
+    (milliseconds per unit of request cost) when none is given.
+    """
+    if weight_per_minute:
+        rate = weight_per_minute / 60.0
+    else:
+        rate = 1000.0 / max(getattr(ex, "rateLimit", 1000) or 1000, 1)
+    return TokenBucket(rate=rate, capacity=max(rate, 10.0))
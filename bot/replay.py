@@ -0,0 +1,277 @@
+"""
+Drives paper_loop, live_loop and trading_loop over stored candles on a
+simulated clock, far faster than real time, so their trading logic can be
+regression-tested and profiled against months of history and compared with
+the event backtester.
+"""
+import contextlib
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .backtest import IndicatorCache, fill_price, grid_signals, simulate_paper
+from .clock import ReplayFinished, SimClock
+from .config import cfg
+from .db import get_candles_arrays, get_candles_range, get_conn, get_paper_trades_df, paper_get, prepare_database
+from .timeframes import timeframe_ms
+from .writequeue import close_write_queue
+
+class ReplaySource:
+    """
+    Stored bars revealed as simulated time passes: a bar becomes visible once it
+    has closed (ts + timeframe <= clock.now_ms()). Serves paper_loop through
+    candles_after() and is the market behind ReplayExchange.
+    """
+    def __init__(self, series: Dict[str, Tuple[np.ndarray, np.ndarray]], timeframe: str, clock: SimClock):
+        self.series = series
+        self.timeframe = timeframe
+        self.step = timeframe_ms(timeframe)
+        self.clock = clock
+
+    def _visible(self, symbol: str) -> int:
+        ts = self.series[symbol][0]
+        return int(np.searchsorted(ts, self.clock.now_ms() - self.step, side="right"))
+
+    def closed(self, symbol: str) -> Tuple[np.ndarray, np.ndarray]:
+        ts, ohlcv = self.series[symbol]
+        n = self._visible(symbol)
+        return ts[:n], ohlcv[:n]
+
+    def candles_after(self, symbol: str, timeframe: str, after_ts: Optional[int]=None, tail: Optional[int]=None):
+        ts, ohlcv = self.closed(symbol)
+        if after_ts is not None:
+            start = int(np.searchsorted(ts, after_ts, side="right"))
+            ts, ohlcv = ts[start:], ohlcv[start:]
+        if tail:
+            ts, ohlcv = ts[-tail:], ohlcv[-tail:]
+        return list(zip(ts.tolist(), ohlcv[:, 3].tolist()))
+
+    def last_close(self, symbol: str) -> Optional[float]:
+        n = self._visible(symbol)
+        return float(self.series[symbol][1][n - 1, 3]) if n else None
+
+class ReplayExchange:
+    """
+    Simulated venue over a ReplaySource. Speaks the subset of ccxt that
+    live_loop uses (load_markets, fetch_ohlcv, fetch_ticker, create_order) and
+    of the Uphold client that trading_loop uses (get_cards, create_transaction).
+    Orders fill immediately at the last closed bar's close with the paper fee
+    and slippage; balances are one account per currency.
+    """
+    id = "replay"
+    rateLimit = 0
+
+    def __init__(self, source: ReplaySource, balances: Optional[Dict[str, float]]=None,
+                 fee_rate: Optional[float]=None, slippage_bps: Optional[float]=None):
+        self.source = source
+        self.balances: Dict[str, float] = dict(balances or {})
+        self.fee_rate = cfg.paper_fee_rate if fee_rate is None else fee_rate
+        self.slippage_bps = cfg.paper_slippage_bps if slippage_bps is None else slippage_bps
+        self.fills: List[dict] = []
+
+    # --- ccxt subset ---
+
+    def load_markets(self) -> dict:
+        return {s: {"symbol": s, "base": s.split("/")[0], "quote": s.split("/")[1], "active": True,
+                    "precision": {"amount": 8}} for s in self.source.series}
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str="1m", since: Optional[int]=None, limit: int=500) -> list:
+        ts, ohlcv = self.source.closed(symbol)
+        rows = [[t, *bar] for t, bar in zip(ts[-limit:].tolist(), ohlcv[-limit:].tolist())]
+        if rows:
+            # The bar now forming, which callers skip; only its open is known at this point
+            c = rows[-1][4]
+            rows.append([rows[-1][0] + self.source.step, c, c, c, c, 0.0])
+        return rows
+
+    def fetch_ticker(self, symbol: str) -> dict:
+        last = self.source.last_close(symbol)
+        return {"symbol": symbol, "last": last, "close": last, "timestamp": self.source.clock.now_ms()}
+
+    def create_order(self, symbol: str, type: str, side: str, amount: float, price: Optional[float]=None) -> dict:
+        base, quote = symbol.split("/")
+        px = fill_price(self.source.last_close(symbol), side, self.slippage_bps)
+        fee = amount * px * self.fee_rate
+        sign = 1 if side == "buy" else -1
+        self.balances[base] = self.balances.get(base, 0.0) + sign * amount
+        self.balances[quote] = self.balances.get(quote, 0.0) - sign * amount * px - fee
+        fill = {"id": str(len(self.fills) + 1), "ts": self.source.clock.now_ms(), "symbol": symbol, "side": side,
+                "qty": amount, "price": px, "fee": fee}
+        self.fills.append(fill)
+        return {"id": fill["id"], "price": px, "amount": amount, "fee": {"cost": fee, "currency": quote}}
+
+    # --- Uphold subset ---
+
+    def get_cards(self) -> List[dict]:
+        return [{"id": cur, "currency": cur, "available": str(max(0.0, bal))} for cur, bal in self.balances.items()]
+
+    def create_transaction(self, card_id: str, to_currency: str, amount: float, from_currency: str) -> dict:
+        """Converts `amount` of `from_currency` (the card's currency) into `to_currency`."""
+        amount = float(amount)
+        if f"{to_currency}/{from_currency}" in self.source.series:
+            symbol = f"{to_currency}/{from_currency}"
+            qty = amount / fill_price(self.source.last_close(symbol), "buy", self.slippage_bps)
+            self.create_order(symbol, "market", "buy", qty)
+        else:
+            self.create_order(f"{from_currency}/{to_currency}", "market", "sell", amount)
+        return {"id": self.fills[-1]["id"], "status": "completed"}
+
+    def equity(self, quote: str) -> float:
+        total = self.balances.get(quote, 0.0)
+        for cur, bal in self.balances.items():
+            if cur != quote and f"{cur}/{quote}" in self.source.series:
+                total += bal * (self.source.last_close(f"{cur}/{quote}") or 0.0)
+        return total
+
+@dataclass
+class ReplayResult:
+    loop: str
+    symbol: str
+    timeframe: str
+    bars: int
+    steps: int
+    wall_s: float
+    sim_s: float
+    trades: pd.DataFrame
+    final_equity: float
+    backtest: Optional[dict] = None
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def speedup(self) -> float:
+        return self.sim_s / self.wall_s if self.wall_s > 0 else float("inf")
+
+    def summary(self) -> dict:
+        out = {"loop": self.loop, "symbol": self.symbol, "timeframe": self.timeframe, "bars": self.bars,
+               "steps": self.steps, "trades": len(self.trades), "final_equity": round(self.final_equity, 2),
+               "wall_s": round(self.wall_s, 3), "speedup": round(self.speedup)}
+        if self.backtest is not None:
+            out["backtest"] = self.backtest
+        return out
+
+def load_series(database_url: str, symbol: str, timeframe: str, exchange: Optional[str]=None,
+                start_ms: Optional[int]=None, end_ms: Optional[int]=None) -> Tuple[np.ndarray, np.ndarray]:
+    conn = get_conn(database_url)
+    exchange = exchange or cfg.exchange
+    if start_ms is None and end_ms is None:
+        ts, ohlcv = get_candles_arrays(conn, exchange, symbol, timeframe)
+    else:
+        ts, ohlcv = get_candles_range(conn, exchange, symbol, timeframe, start_ms or 0, end_ms or 2**62)
+    if not len(ts):
+        raise ValueError(f"No stored {timeframe} candles for {symbol}")
+    return np.asarray(ts, dtype=np.int64), np.asarray(ohlcv, dtype=float)
+
+@contextlib.contextmanager
+def _quiet(quiet: bool):
+    """Silences the loops' per-bar logging."""
+    if not quiet:
+        yield
+        return
+    with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+        yield
+
+@contextlib.contextmanager
+def _workspace(work_url: Optional[str], quiet: bool):
+    """A scratch database for the loop's own state unless `work_url` is given, with logging silenced."""
+    if work_url is not None:
+        prepare_database(work_url)
+        with _quiet(quiet):
+            yield work_url
+        return
+    with tempfile.TemporaryDirectory(prefix="replay-") as tmp:
+        path = os.path.join(tmp, "replay.db")
+        try:
+            prepare_database(f"sqlite:///{path}")
+            with _quiet(quiet):
+                yield f"sqlite:///{path}"
+        finally:
+            close_write_queue(path)
+
+def _drive(loop, *args, **kwargs) -> float:
+    """Runs `loop` until its SimClock passes the end of the data; returns the wall seconds it took."""
+    t0 = time.perf_counter()
+    try:
+        loop(*args, **kwargs)
+    except ReplayFinished:
+        pass
+    return time.perf_counter() - t0
+
+def backtest_reference(closes: np.ndarray, strategy, cash_per_trade: float, stop_loss_pct: float, take_profit_pct: float,
+                       fee_rate: float, slippage_bps: float) -> dict:
+    """run_event_backtest's simulation of the same closes, for comparison with a paper replay."""
+    stream = strategy.streaming()
+    sig = grid_signals(IndicatorCache(closes.reshape(-1, 1)), stream.kind, stream.params())
+    res = simulate_paper(closes.reshape(-1, 1), sig, cfg.paper_starting_cash, cash_per_trade, stop_loss_pct,
+                         take_profit_pct, fee_rate, slippage_bps)
+    return {"trades": int(res["trades"][0]), "fees": round(float(res["fees"][0]), 4),
+            "final_equity": round(float(res["final_equity"][0]), 2)}
+
+def replay_paper(database_url: str, symbol: str, timeframe: str, strategy, cash_per_trade: float=100.0,
+                 stop_loss_pct: float=0.05, take_profit_pct: float=0.1, fee_rate: Optional[float]=None,
+                 slippage_bps: Optional[float]=None, start_ms: Optional[int]=None, end_ms: Optional[int]=None,
+                 sleep_s: Optional[float]=None, work_url: Optional[str]=None, quiet: bool=True,
+                 compare: bool=True) -> ReplayResult:
+    """
+    Runs paper_loop over the stored bars of `symbol`, waking once per bar
+    (every `sleep_s` simulated seconds if given). Its state and trades go to a
+    scratch database. With `compare`, the backtester's result for the same bars
+    is attached; at one bar per wake-up the two should agree exactly.
+    """
+    from .paper import paper_loop
+    fee_rate = cfg.paper_fee_rate if fee_rate is None else fee_rate
+    slippage_bps = cfg.paper_slippage_bps if slippage_bps is None else slippage_bps
+    ts, ohlcv = load_series(database_url, symbol, timeframe, start_ms=start_ms, end_ms=end_ms)
+    step = timeframe_ms(timeframe)
+    clock = SimClock(int(ts[0]) + step, end_ms=int(ts[-1]) + step)
+    source = ReplaySource({symbol: (ts, ohlcv)}, timeframe, clock)
+    with _workspace(work_url, quiet) as url:
+        wall = _drive(paper_loop, url, symbol, timeframe, strategy, cash_per_trade, stop_loss_pct,
+                      take_profit_pct, sleep_s or step / 1000, fee_rate, slippage_bps, clock=clock, source=source)
+        conn = get_conn(url)
+        trades = get_paper_trades_df(conn)
+        cash = float(paper_get(conn, "cash", default=str(cfg.paper_starting_cash)))
+        pos = float(paper_get(conn, f"pos:{symbol}", default="0"))
+        conn.close()
+    result = ReplayResult("paper", symbol, timeframe, len(ts), clock.sleeps, wall, (clock.t - clock.start_ms) / 1000,
+                          trades, cash + pos * float(ohlcv[-1, 3]))
+    if compare:
+        result.backtest = backtest_reference(ohlcv[:, 3], strategy, cash_per_trade, stop_loss_pct, take_profit_pct,
+                                             fee_rate, slippage_bps)
+    return result
+
+def replay_live(database_url: str, symbol: str, timeframe: str, fast: int=10, slow: int=30, cash_per_trade: float=50.0,
+                starting_quote: Optional[float]=None, start_ms: Optional[int]=None, end_ms: Optional[int]=None,
+                sleep_s: Optional[float]=None, work_url: Optional[str]=None, quiet: bool=True) -> ReplayResult:
+    """Runs live_loop against a ReplayExchange funded with `starting_quote` of the symbol's quote currency."""
+    from .live import live_loop
+    ts, ohlcv = load_series(database_url, symbol, timeframe, start_ms=start_ms, end_ms=end_ms)
+    step = timeframe_ms(timeframe)
+    quote = symbol.split("/")[1]
+    clock = SimClock(int(ts[0]) + step, end_ms=int(ts[-1]) + step)
+    ex = ReplayExchange(ReplaySource({symbol: (ts, ohlcv)}, timeframe, clock),
+                        {quote: cfg.paper_starting_cash if starting_quote is None else starting_quote})
+    with _workspace(work_url, quiet) as url:
+        wall = _drive(live_loop, symbol, timeframe, fast, slow, cash_per_trade, sleep_s or step / 1000,
+                      confirm=True, exchange=ex, clock=clock, database_url=url)
+    return ReplayResult("live", symbol, timeframe, len(ts), clock.sleeps, wall, (clock.t - clock.start_ms) / 1000,
+                        pd.DataFrame(ex.fills), ex.equity(quote), extra={"balances": ex.balances})
+
+def replay_trader(database_url: str, symbol: str, timeframe: str, strategy, trade_amount: float=50.0,
+                  starting_quote: Optional[float]=None, start_ms: Optional[int]=None, end_ms: Optional[int]=None,
+                  sleep_s: Optional[float]=None, quiet: bool=True) -> ReplayResult:
+    """Runs trading_loop with a ReplayExchange as both its data source and its Uphold account."""
+    from .trader import trading_loop
+    ts, ohlcv = load_series(database_url, symbol, timeframe, start_ms=start_ms, end_ms=end_ms)
+    step = timeframe_ms(timeframe)
+    quote = symbol.split("/")[1]
+    clock = SimClock(int(ts[0]) + step, end_ms=int(ts[-1]) + step)
+    ex = ReplayExchange(ReplaySource({symbol: (ts, ohlcv)}, timeframe, clock),
+                        {quote: cfg.paper_starting_cash if starting_quote is None else starting_quote})
+    with _quiet(quiet):
+        wall = _drive(trading_loop, symbol, timeframe, strategy, trade_amount, sleep_s or step / 1000,
+                      trading_exchange=ex, data_exchange=ex, clock=clock)
+    return ReplayResult("trader", symbol, timeframe, len(ts), clock.sleeps, wall, (clock.t - clock.start_ms) / 1000,
+                        pd.DataFrame(ex.fills), ex.equity(quote), extra={"balances": ex.balances})
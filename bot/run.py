@@ -1,5 +1,4 @@
 import argparse
-import sqlite3
 import time
 import json
 from .config import cfg
@@ -7,50 +6,105 @@ from .providers.binance_data import BinanceData
 from .providers.uphold_exec import create_market_exchange
 from .symbols import binance_symbol, uphold_pair
 
-def _ensure_candles_table(conn: sqlite3.Connection):
-    conn.execute("""
-    CREATE TABLE IF NOT EXISTS candles(
-      exchange TEXT NOT NULL,
-      symbol TEXT NOT NULL,
-      timeframe TEXT NOT NULL,
-      ts INTEGER NOT NULL,
-      open REAL, high REAL, low REAL, close REAL, volume REAL,
-      PRIMARY KEY(exchange, symbol, timeframe, ts)
-    )""")
-    conn.commit()
-
-def _insert_klines(conn: sqlite3.Connection, exchange: str, symbol_ui: str, tf: str, klines: list[list]):
-    _ensure_candles_table(conn)
-    rows = [
-        (exchange, symbol_ui, tf, int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5]))
-        for k in klines
-    ]
-    conn.executemany("""INSERT OR REPLACE INTO candles
-        (exchange,symbol,timeframe,ts,open,high,low,close,volume)
-        VALUES (?,?,?,?,?,?,?,?,?)""", rows)
-    conn.commit()
-
 def cmd_datapull(args):
     from .db import get_conn
+    from .backfill import backfill, gap_report
     conn = get_conn(cfg.database_url)
-    bd = BinanceData()
     symbols = [s.strip() for s in args.symbols.split(",")]
-    for ui_sym in symbols:
-        b_sym = binance_symbol(ui_sym)
-        start_ms = args.since_ms
-        got_total = 0
-        while True:
-            # Binance's API can fetch in batches of 1000
-            batch = bd.klines(b_sym, interval=args.timeframe, start_ms=start_ms, limit=1000)
-            if not batch:
-                break
-            _insert_klines(conn, "binance", ui_sym, args.timeframe, batch)
-            got_total += len(batch)
-            start_ms = int(batch[-1][0]) + 1 # Use the timestamp of the last candle to get the next batch
-            if len(batch) < 1000:
-                break
-            time.sleep(0.2)
-        print(f"[datapull] {ui_sym} {args.timeframe}: {got_total} rows")
+    if not args.report_only:
+        bd = BinanceData()
+        fetch = lambda ui_sym, tf, start_ms, limit: bd.klines(binance_symbol(ui_sym), interval=tf, start_ms=start_ms, limit=limit)
+        got = backfill(conn, fetch, "binance", symbols, args.timeframe, start_ms=args.since_ms,
+                       end_ms=args.until_ms, workers=args.workers)
+        for ui_sym, n in got.items():
+            print(f"[datapull] {ui_sym} {args.timeframe}: {n} rows")
+    for g in gap_report(conn, "binance", symbols, args.timeframe, args.since_ms, args.until_ms):
+        tag = " (no upstream data)" if g["unfillable"] else ""
+        print(f"[datapull] gap {g['symbol']} {g['timeframe']}: {g['start_ts']}..{g['end_ts']} ({g['bars']} bars){tag}")
+
+def cmd_ingest(args):
+    from .data import ingest_candles, ingest_candles_concurrent
+    if args.concurrency > 1:
+        ingest_candles_concurrent(cfg.database_url, timeframe=args.timeframe, limit=args.limit, quote=args.quote,
+                                  top_by_volume=args.top, concurrency=args.concurrency,
+                                  weight_per_minute=args.weight_per_minute)
+    else:
+        ingest_candles(cfg.database_url, timeframe=args.timeframe, limit=args.limit, quote=args.quote, top_by_volume=args.top)
+
+def cmd_aggregate(args):
+    from .db import get_conn, get_symbols
+    from .aggregate import rebuild, target_timeframes
+    conn = get_conn(cfg.database_url)
+    symbols = [s.strip() for s in args.symbols.split(",")] if args.symbols else get_symbols(conn, args.exchange)
+    targets = target_timeframes(args.timeframes)
+    for symbol, n in rebuild(conn, args.exchange, symbols, targets).items():
+        print(f"[aggregate] {symbol} {','.join(targets)}: {n} rows")
+
+def cmd_migrate_candles(args):
+    import os
+    from .db import db_path_from_url, get_conn, migrate_candles, init_schema
+    path = db_path_from_url(cfg.database_url)
+    before = os.path.getsize(path) if os.path.exists(path) else 0
+    conn = get_conn(cfg.database_url)
+    n = migrate_candles(conn)
+    init_schema(conn)
+    if not n:
+        print("[migrate] candles already use the series layout")
+        return
+    if args.vacuum:
+        conn.execute("VACUUM")
+    print(f"[migrate] {n} candles, {before / 1e6:.1f} MB -> {os.path.getsize(path) / 1e6:.1f} MB")
+
+def cmd_screen(args):
+    from .db import get_conn
+    from .screener import refresh, top
+    conn = get_conn(cfg.database_url)
+    if args.refresh:
+        refresh(conn, cfg.exchange, args.timeframe, force=args.refresh == "all")
+    rows = top(conn, cfg.exchange, args.timeframe, limit=args.limit, quote=args.quote or None, rsi_below=args.rsi_below,
+               rsi_above=args.rsi_above, sort=args.sort, descending=not args.asc)
+    fmt = lambda v, d: "-" if v is None else f"{v:.{d}f}"
+    for r in rows:
+        print(f"{r['symbol']:<14} close={r['close']:<12.6g} ret24={fmt(r['ret_24'], 2):>7} rsi={fmt(r['rsi14'], 0):>3} "
+              f"sma={fmt(r['sma_spread'], 2):>6} vol={fmt(r['volatility'], 2):>5} qvol={fmt(r['quote_volume'], 0):>14} rank={r['volume_rank']}")
+
+def cmd_portfolio(args):
+    from .portfolio import portfolio_loop
+    from .strategy import SMACrossoverStrategy, RSIStrategy
+    from .db import get_conn, get_symbols
+    if args.symbols:
+        symbols = [s.strip() for s in args.symbols.split(",")]
+    else:
+        symbols = get_symbols(get_conn(cfg.database_url), cfg.exchange, quote=args.quote)
+    strategy = RSIStrategy() if args.strategy == "rsi" else SMACrossoverStrategy(fast=args.fast, slow=args.slow)
+    portfolio_loop(cfg.database_url, symbols, timeframe=args.timeframe, strategy=strategy,
+                   cash_per_trade=args.cash_per_trade, sleep_s=args.sleep)
+
+def cmd_backtest(args):
+    from .backtest import run_event_backtest
+    params = json.loads(args.params) if args.params else None
+    symbols = [s.strip() for s in args.symbols.split(",")] if args.symbols else None
+    df = run_event_backtest(cfg.database_url, timeframe=args.timeframe, strategy_name=args.strategy, params=params,
+                            cash_per_trade=args.cash_per_trade, fee_rate=args.fee_rate,
+                            slippage_bps=args.slippage_bps, symbols=symbols, top=args.top)
+    if df.empty:
+        print("[backtest] no results. Ingest more data first.")
+        return
+    print(df.to_string(index=False))
+
+def cmd_optimize(args):
+    from .optimizer import optimize, best_params
+    space = json.loads(args.space) if args.space else None
+    symbols = [s.strip() for s in args.symbols.split(",")] if args.symbols else None
+    df = optimize(cfg.database_url, strategy_name=args.strategy, method=args.method, space=space,
+                  timeframe=args.timeframe, symbols=symbols, top=args.top, n_iter=args.n_iter,
+                  seed=args.seed, folds=args.folds, prune_frac=args.prune_frac,
+                  prune_margin=args.prune_margin)
+    if df.empty:
+        print("[optimize] no results. Ingest more data first.")
+        return
+    phase = "test" if args.method == "walkforward" else "full"
+    print(f"[optimize] sweep {df['sweep_id'].iloc[0]} best {phase} params: {best_params(df, phase)}")
 
 def cmd_uphold_trade(args):
     if not cfg.sandbox:
@@ -85,16 +139,121 @@ def cmd_uphold_trade(args):
         print(f"Failed to log trade to local DB: {db_e}")
 
 
+def cmd_replay(args):
+    from .replay import replay_paper, replay_live, replay_trader
+    from .strategy import SMACrossoverStrategy, RSIStrategy
+    strategy = RSIStrategy() if args.strategy == "rsi" else SMACrossoverStrategy(fast=args.fast, slow=args.slow)
+    window = dict(start_ms=args.since_ms, end_ms=args.until_ms)
+    if args.loop == "paper":
+        res = replay_paper(cfg.database_url, args.symbol, args.timeframe, strategy, cash_per_trade=args.cash_per_trade,
+                           compare=args.compare, quiet=not args.verbose, **window)
+    elif args.loop == "live":
+        res = replay_live(cfg.database_url, args.symbol, args.timeframe, fast=args.fast, slow=args.slow,
+                          cash_per_trade=args.cash_per_trade, quiet=not args.verbose, **window)
+    else:
+        res = replay_trader(cfg.database_url, args.symbol, args.timeframe, strategy, trade_amount=args.cash_per_trade,
+                            quiet=not args.verbose, **window)
+    print(f"[replay] {json.dumps(res.summary())}")
+    if args.compare and res.backtest is not None:
+        same = res.backtest["trades"] == len(res.trades) and abs(res.backtest["final_equity"] - res.final_equity) < 0.01
+        print(f"[replay] {'matches' if same else 'DIFFERS FROM'} the backtester")
+
 def main(argv=None):
     p = argparse.ArgumentParser(description="Trading Bot CLI")
     sub = p.add_subparsers(dest="cmd", required=True)
 
-    sp = sub.add_parser("datapull", help="Backfill OHLCV from Binance public API")
+    sp = sub.add_parser("datapull", help="Backfill OHLCV from Binance public API (resumable, gaps only)")
     sp.add_argument("--symbols", type=str, required=True, help="Comma-separated, e.g. BTC/USDT,ETH/USDT")
     sp.add_argument("--timeframe", type=str, default="1h", help="1m,5m,15m,1h,4h,1d...")
-    sp.add_argument("--since-ms", type=int, default=None, dest="since_ms")
+    sp.add_argument("--since-ms", type=int, default=None, dest="since_ms", help="Default: the last 1000 bars")
+    sp.add_argument("--until-ms", type=int, default=None, dest="until_ms", help="Default: now")
+    sp.add_argument("--workers", type=int, default=4, help="Symbols fetched in parallel")
+    sp.add_argument("--report-only", action="store_true", dest="report_only", help="Only print remaining gaps")
     sp.set_defaults(func=cmd_datapull)
 
+    sp = sub.add_parser("ingest", help="Ingest recent OHLCV for discovered markets via ccxt")
+    sp.add_argument("--timeframe", type=str, default="1h")
+    sp.add_argument("--limit", type=int, default=500)
+    sp.add_argument("--quote", type=str, default=None)
+    sp.add_argument("--top", type=int, default=None, help="Only the top N markets by quote volume")
+    sp.add_argument("--concurrency", type=int, default=8, help="Concurrent fetches; 1 uses the sequential path")
+    sp.add_argument("--weight-per-minute", type=float, default=None, dest="weight_per_minute")
+    sp.set_defaults(func=cmd_ingest)
+
+    sp = sub.add_parser("aggregate", help="Rebuild higher timeframes from stored 1m candles")
+    sp.add_argument("--symbols", type=str, default=None, help="Comma-separated; defaults to all active markets")
+    sp.add_argument("--exchange", type=str, default="binance")
+    sp.add_argument("--timeframes", type=str, default=None, help="Defaults to AGGREGATE_TIMEFRAMES")
+    sp.set_defaults(func=cmd_aggregate)
+
+    sp = sub.add_parser("migrate-candles", help="Convert a legacy candles table to the series-keyed WITHOUT ROWID layout")
+    sp.add_argument("--vacuum", action="store_true", help="Rewrite the file afterwards to return freed pages to the OS")
+    sp.set_defaults(func=cmd_migrate_candles)
+
+    sp = sub.add_parser("screen", help="Rank stored symbols by their latest indicator snapshot")
+    sp.add_argument("--timeframe", type=str, default="1h")
+    sp.add_argument("--quote", type=str, default=cfg.default_quote, help="Empty for every quote currency")
+    sp.add_argument("--rsi-below", type=float, default=None, dest="rsi_below")
+    sp.add_argument("--rsi-above", type=float, default=None, dest="rsi_above")
+    sp.add_argument("--sort", type=str, default="quote_volume", help="quote_volume, rsi14, sma_spread, volatility, ret_24...")
+    sp.add_argument("--asc", action="store_true", help="Lowest first")
+    sp.add_argument("--limit", type=int, default=20)
+    sp.add_argument("--refresh", nargs="?", const="stale", default=None, choices=["stale", "all"],
+                    help="Update snapshots with new bars first (or all of them)")
+    sp.set_defaults(func=cmd_screen)
+
+    sp = sub.add_parser("portfolio", help="Paper-trade many symbols from one process with a shared ledger")
+    sp.add_argument("--symbols", type=str, default=None, help="Comma-separated; defaults to all active markets")
+    sp.add_argument("--quote", type=str, default=None)
+    sp.add_argument("--timeframe", type=str, default="1m")
+    sp.add_argument("--strategy", type=str, default="sma_crossover", choices=["sma_crossover", "rsi"])
+    sp.add_argument("--fast", type=int, default=20)
+    sp.add_argument("--slow", type=int, default=50)
+    sp.add_argument("--cash-per-trade", type=float, default=100.0, dest="cash_per_trade")
+    sp.add_argument("--sleep", type=int, default=60)
+    sp.set_defaults(func=cmd_portfolio)
+
+    sp = sub.add_parser("backtest", help="Replay stored candles through the paper-trading rules (SL/TP, fees, slippage)")
+    sp.add_argument("--strategy", type=str, default="sma_crossover", choices=["sma_crossover", "rsi"])
+    sp.add_argument("--params", type=str, default=None, help='JSON, e.g. {"fast": 10, "slow": 50}')
+    sp.add_argument("--symbols", type=str, default=None, help="Comma-separated; defaults to top markets")
+    sp.add_argument("--timeframe", type=str, default="1h")
+    sp.add_argument("--top", type=int, default=20)
+    sp.add_argument("--cash-per-trade", type=float, default=100.0, dest="cash_per_trade")
+    sp.add_argument("--fee-rate", type=float, default=None, dest="fee_rate", help="Defaults to PAPER_FEE_RATE")
+    sp.add_argument("--slippage-bps", type=float, default=None, dest="slippage_bps", help="Defaults to PAPER_SLIPPAGE_BPS")
+    sp.set_defaults(func=cmd_backtest)
+
+    sp = sub.add_parser("optimize", help="Sweep strategy parameters over stored candles")
+    sp.add_argument("--strategy", type=str, default="sma_crossover", choices=["sma_crossover", "rsi"])
+    sp.add_argument("--method", type=str, default="grid", choices=["grid", "random", "walkforward"])
+    sp.add_argument("--space", type=str, default=None, help='JSON, e.g. {"fast": [5,10], "slow": [50,100]}')
+    sp.add_argument("--symbols", type=str, default=None, help="Comma-separated; defaults to top markets")
+    sp.add_argument("--timeframe", type=str, default="1h")
+    sp.add_argument("--top", type=int, default=20)
+    sp.add_argument("--n-iter", type=int, default=50, dest="n_iter")
+    sp.add_argument("--seed", type=int, default=None)
+    sp.add_argument("--folds", type=int, default=4)
+    sp.add_argument("--prune-frac", type=float, default=0.3, dest="prune_frac",
+                    help="Score combos on this leading fraction of history first; 0 disables early stopping")
+    sp.add_argument("--prune-margin", type=float, default=10.0, dest="prune_margin",
+                    help="Drop combos trailing the best early score by more than this many return points")
+    sp.set_defaults(func=cmd_optimize)
+
+    sp = sub.add_parser("replay", help="Run a trading loop over stored candles on a simulated clock")
+    sp.add_argument("--loop", type=str, default="paper", choices=["paper", "live", "trader"])
+    sp.add_argument("--symbol", type=str, required=True, help="UI symbol, e.g. BTC/USDT")
+    sp.add_argument("--timeframe", type=str, default="1h")
+    sp.add_argument("--strategy", type=str, default="sma_crossover", choices=["sma_crossover", "rsi"], help="paper and trader loops")
+    sp.add_argument("--fast", type=int, default=20)
+    sp.add_argument("--slow", type=int, default=50)
+    sp.add_argument("--cash-per-trade", type=float, default=100.0, dest="cash_per_trade")
+    sp.add_argument("--since-ms", type=int, default=None, dest="since_ms", help="Default: every stored bar")
+    sp.add_argument("--until-ms", type=int, default=None, dest="until_ms")
+    sp.add_argument("--compare", action="store_true", help="Check the paper loop's result against the backtester")
+    sp.add_argument("--verbose", action="store_true", help="Keep the loop's own logging")
+    sp.set_defaults(func=cmd_replay)
+
     sp = sub.add_parser("uphold-trade", help="Sandbox market exchange via Uphold")
     sp.add_argument("--symbol", type=str, required=True, help="UI symbol, e.g. BTC/USDT")
     sp.add_argument("--side", type=str, default="buy")
@@ -103,6 +262,9 @@ def main(argv=None):
     sp.set_defaults(func=cmd_uphold_trade)
     
     args = p.parse_args(argv)
+    if cfg.metrics and cfg.metrics_port:
+        from .metrics import start_http_server
+        start_http_server(cfg.metrics_port)
     return args.func(args)
 
 if __name__ == "__main__":
@@ -1,58 +1,45 @@
-import schedule
-import time
-import re
 from .data import ingest_candles
+from .jobs import JobEngine
 from .ai_analyzer import get_ai_analyzer
-from .db import get_conn, upsert_insight, get_symbols, get_candles_df
+from .insights import generate_insights
+from .screener import refresh, top_symbols
+from .db import get_conn
 from .config import cfg
-from .exchange import get_exchange
 
 def ingest_data_job():
     print("[Scheduler] Running hourly data ingestion job...")
-    ingest_candles(cfg.database_url, timeframe="1h", top_by_volume=20, limit=100)
+    # Only 1m bars come from the API; the aggregation listener derives 1h (and the other AGGREGATE_TIMEFRAMES) from them
+    rows = ingest_candles(cfg.database_url, timeframe="1m", top_by_volume=20, limit=1000)
     print("[Scheduler] Data ingestion job finished.")
+    return rows
+
+def refresh_screener_job():
+    conn = get_conn(cfg.database_url)
+    return refresh(conn, cfg.exchange, "1h")
 
 def generate_insights_job():
     print("[Scheduler] Running insights generation job...")
     conn = get_conn(cfg.database_url)
     ai = get_ai_analyzer()
-    
-    # --- Get top 5 symbols by volume ---
-    ex = get_exchange()
-    tickers = ex.fetch_tickers()
-    all_symbols_in_db = get_symbols(conn, cfg.exchange, quote=cfg.default_quote)
-    
-    liquid_symbols = sorted(
-        [s for s in all_symbols_in_db if s in tickers],
-        key=lambda s: (tickers.get(s, {}).get("quoteVolume") or 0),
-        reverse=True
-    )
-    symbols_to_analyze = liquid_symbols[:5]
-
-    for symbol in symbols_to_analyze:
-        print(f"[Scheduler] Analyzing {symbol}...")
-        df = get_candles_df(conn, cfg.exchange, symbol, "1h")
-        if df.empty:
-            continue
-            
-        suggestion = ai.get_trade_suggestion(symbol, df)
-        
-        match = re.match(r"^\s*(\w+)", suggestion)
-        signal = match.group(1).upper() if match else "HOLD"
-        
-        upsert_insight(conn, symbol, signal, suggestion)
-        print(f"[Scheduler] Saved new insight for {symbol}: {signal}")
+
+    # Most traded symbols from the screener snapshot; brings only symbols with new bars up to date
+    refresh(conn, cfg.exchange, "1h")
+    symbols_to_analyze = top_symbols(conn, cfg.exchange, "1h", limit=5, quote=cfg.default_quote)
+
+    print(f"[Scheduler] Analyzing {', '.join(symbols_to_analyze)}...")
+    insights = generate_insights(conn, ai, symbols_to_analyze, "1h")
+    for symbol, (signal, suggestion) in insights.items():
+        print(f"[Scheduler] Insight for {symbol}: {signal}")
 
     print("[Scheduler] Insights generation job finished.")
+    return len(insights)
 
 def run_scheduler():
     print("--- Starting Automated Scheduler ---")
-    schedule.every().hour.do(ingest_data_job)
-    schedule.every(30).minutes.do(generate_insights_job)
-
-    ingest_data_job()
-    generate_insights_job()
+    engine = JobEngine(cfg.database_url, workers=cfg.scheduler_workers)
+    engine.add("ingest_data", ingest_data_job, every_s=3600, jitter_s=60)
+    engine.add("generate_insights", generate_insights_job, every_s=1800, jitter_s=60)
+    engine.add("refresh_screener", refresh_screener_job, every_s=300, jitter_s=30)
 
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    engine.run_all()
+    engine.run_forever()
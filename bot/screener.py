@@ -0,0 +1,89 @@
+import time
+from typing import Iterable, List, Optional
+import numpy as np
+from .config import cfg
+from .db import get_candles_arrays, get_ingested_symbols, get_latest_ts, get_screener_ts, query_screener, save_screener_rows
+from .timeframes import timeframe_ms
+
+# Bars read per symbol: enough for sma50 plus the 24-bar return
+LOOKBACK = 60
+VOLUME_BARS = 24
+# A snapshot this many bars behind the newest one belongs to a symbol no longer ingested (delisted, dropped)
+MAX_AGE_BARS = 3
+
+def snapshot_features(close: np.ndarray, volume: np.ndarray) -> dict:
+    """
+    Latest indicator values for each row of right-aligned (n_symbols, LOOKBACK)
+    close/volume matrices, NaN-padded on the left. A window that reaches into
+    the padding yields NaN, so short histories simply have no value.
+    """
+    last = close[:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = np.diff(close[:, -15:], axis=1)
+        gain = np.clip(d, 0, None).sum(axis=1) / 14
+        loss = -np.clip(d, None, 0).sum(axis=1) / 14
+        rsi = np.where(loss > 0, 100 - 100 / (1 + gain / loss), 100.0)
+        rsi[np.isnan(gain)] = np.nan
+        ret = np.diff(close[:, -21:], axis=1) / close[:, -21:-1] * 100
+        return {
+            "rsi14": rsi,
+            "sma_spread": (close[:, -20:].mean(axis=1) / close[:, -50:].mean(axis=1) - 1) * 100,
+            "volatility": ret.std(axis=1),
+            "ret_24": (last / close[:, -VOLUME_BARS - 1] - 1) * 100,
+            "quote_volume": (close[:, -VOLUME_BARS:] * volume[:, -VOLUME_BARS:]).sum(axis=1),
+        }
+
+def _num(x) -> Optional[float]:
+    return None if np.isnan(x) else float(x)
+
+def refresh(conn, exchange: Optional[str]=None, timeframe: str="1h", symbols: Optional[Iterable[str]]=None,
+            force: bool=False) -> int:
+    """
+    Recomputes the snapshot of every symbol whose latest stored bar is newer than
+    the one its snapshot was built from (all of them with `force`), then re-ranks
+    by volume. Snapshots more than MAX_AGE_BARS bars behind the newest are
+    dropped so they no longer hold a rank, and symbols that far behind are not
+    recomputed. `symbols` defaults to everything with candles.
+    Returns the number of snapshots rewritten.
+    """
+    exchange = exchange or cfg.exchange
+    t0 = time.perf_counter()
+    symbols = list(symbols) if symbols is not None else get_ingested_symbols(conn, exchange)
+    seen = get_screener_ts(conn, exchange, timeframe)
+    latest = {s: get_latest_ts(conn, exchange, s, timeframe) for s in symbols}
+    max_age_ms = MAX_AGE_BARS * timeframe_ms(timeframe)
+    newest = max([t for t in latest.values() if t is not None] + list(seen.values()), default=0)
+    # Symbols already past the expiry cutoff would only be recomputed to be dropped again
+    stale = [s for s in symbols if latest[s] is not None and latest[s] >= newest - max_age_ms
+             and (force or latest[s] != seen.get(s))]
+    close = np.full((len(stale), LOOKBACK), np.nan)
+    volume = np.full((len(stale), LOOKBACK), np.nan)
+    last_ts: List[int] = []
+    for i, symbol in enumerate(stale):
+        ts, ohlcv = get_candles_arrays(conn, exchange, symbol, timeframe, limit=LOOKBACK)
+        last_ts.append(int(ts[-1]) if len(ts) else 0)
+        if len(ts):
+            close[i, LOOKBACK - len(ts):] = ohlcv[:, 3]
+            volume[i, LOOKBACK - len(ts):] = ohlcv[:, 4]
+    feats = snapshot_features(close, volume)
+    rows = [
+        (symbol, symbol.split("/")[-1], last_ts[i], float(close[i, -1]),
+         *(_num(feats[k][i]) for k in ("rsi14", "sma_spread", "volatility", "ret_24", "quote_volume")))
+        for i, symbol in enumerate(stale) if last_ts[i]
+    ]
+    save_screener_rows(conn, exchange, timeframe, rows, max_age_ms=max_age_ms)
+    print(f"[screener] {exchange} {timeframe}: {len(rows)}/{len(symbols)} snapshots refreshed in {time.perf_counter() - t0:.2f}s")
+    return len(rows)
+
+def top(conn, exchange: Optional[str]=None, timeframe: str="1h", limit: int=20,
+        max_age_bars: Optional[int]=MAX_AGE_BARS, **filters) -> List[dict]:
+    """
+    e.g. top(conn, quote="USDT", rsi_below=30) -> the 20 most traded oversold
+    USDT pairs. Snapshots more than `max_age_bars` bars behind the newest are
+    skipped (None keeps them).
+    """
+    max_age_ms = None if max_age_bars is None else max_age_bars * timeframe_ms(timeframe)
+    return query_screener(conn, exchange or cfg.exchange, timeframe, limit=limit, max_age_ms=max_age_ms, **filters)
+
+def top_symbols(conn, exchange: Optional[str]=None, timeframe: str="1h", limit: int=20, **filters) -> List[str]:
+    return [r["symbol"] for r in top(conn, exchange, timeframe, limit, **filters)]
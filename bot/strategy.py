@@ -1,16 +1,26 @@
 import pandas as pd
 from abc import ABC, abstractmethod
+from . import metrics
 
 class Strategy(ABC):
     @abstractmethod
     def generate_signals(self, df: pd.DataFrame) -> pd.Series:
         pass
 
+    def streaming(self):
+        """Returns an incremental (per-bar) version of this strategy."""
+        raise NotImplementedError(f"{type(self).__name__} has no streaming version")
+
+    def vectorized(self, n: int):
+        """Returns an incremental version that tracks `n` symbols in parallel arrays."""
+        raise NotImplementedError(f"{type(self).__name__} has no vectorized version")
+
 class SMACrossoverStrategy(Strategy):
     def __init__(self, fast: int = 20, slow: int = 50):
         self.fast = fast
         self.slow = slow
 
+    @metrics.timed("strategy_signals_seconds", strategy="sma_crossover")
     def generate_signals(self, df: pd.DataFrame) -> pd.Series:
         """Returns signal series: 1 for long, 0 for flat. No shorting."""
         if df.empty:
@@ -20,12 +30,21 @@ class SMACrossoverStrategy(Strategy):
         signal = (fast_ma > slow_ma).astype(int)
         return signal
 
+    def streaming(self):
+        from .indicators import StreamingSMACrossover
+        return StreamingSMACrossover(fast=self.fast, slow=self.slow)
+
+    def vectorized(self, n: int):
+        from .indicators import VectorSMACrossover
+        return VectorSMACrossover(n, fast=self.fast, slow=self.slow)
+
 class RSIStrategy(Strategy):
     def __init__(self, rsi_period: int = 14, rsi_oversold: int = 30, rsi_overbought: int = 70):
         self.rsi_period = rsi_period
         self.rsi_oversold = rsi_oversold
         self.rsi_overbought = rsi_overbought
 
+    @metrics.timed("strategy_signals_seconds", strategy="rsi")
     def generate_signals(self, df: pd.DataFrame) -> pd.Series:
         """Returns signal series: 1 for long, -1 for short, 0 for flat."""
         if df.empty:
@@ -41,6 +60,14 @@ class RSIStrategy(Strategy):
         signal[rsi > self.rsi_overbought] = -1
         return signal
 
+    def streaming(self):
+        from .indicators import StreamingRSI
+        return StreamingRSI(rsi_period=self.rsi_period, rsi_oversold=self.rsi_oversold, rsi_overbought=self.rsi_overbought)
+
+    def vectorized(self, n: int):
+        from .indicators import VectorRSI
+        return VectorRSI(n, rsi_period=self.rsi_period, rsi_oversold=self.rsi_oversold, rsi_overbought=self.rsi_overbought)
+
 def position_changes(signal: pd.Series) -> pd.Series:
     if signal.empty:
         return signal
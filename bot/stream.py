@@ -0,0 +1,188 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set
+from .db import add_candle_listener, get_candles_arrays, pooled_conn
+
+def candle_topic(symbol: str, timeframe: str) -> str:
+    return f"candles:{symbol}:{timeframe}"
+
+TRADES_TOPIC = "trades"
+
+class Subscription:
+    """A subscriber's bounded mailbox of SSE-encoded messages; the oldest is dropped when full."""
+    def __init__(self, topics: List[str], maxsize: int):
+        self.topics = topics
+        self.q: "queue.Queue[str]" = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, message: str) -> None:
+        while True:
+            try:
+                self.q.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self.q.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float) -> Optional[str]:
+        try:
+            return self.q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class Broker:
+    """
+    In-process pub/sub for dashboard streams. Each event is serialized once and
+    the same message is handed to every subscriber of its topic. Bars are
+    deduplicated per topic by timestamp so several publishers can feed one topic.
+    """
+    def __init__(self):
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._last_bar: Dict[str, float] = {}
+        self._last_close: Dict[str, float] = {}
+        self._recent_trades: deque = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, *topics: str, maxsize: int = 1000) -> Subscription:
+        sub = Subscription(list(topics), maxsize)
+        with self._lock:
+            for t in topics:
+                self._subs.setdefault(t, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            for t in sub.topics:
+                subs = self._subs.get(t)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subs[t]
+
+    def topics(self) -> List[str]:
+        with self._lock:
+            return list(self._subs)
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self._subs
+
+    def subscriber_count(self, topic: str) -> int:
+        with self._lock:
+            return len(self._subs.get(topic, ()))
+
+    def publish(self, topic: str, event: str, data: dict) -> int:
+        with self._lock:
+            subs = list(self._subs.get(topic, ()))
+        if not subs:
+            return 0
+        message = f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+        for sub in subs:
+            sub.put(message)
+        self.published += 1
+        return len(subs)
+
+    def mark_bar(self, symbol: str, timeframe: str, time_s: float, close: Optional[float] = None) -> None:
+        """Records a bar as already seen by clients (they load history via /api/ohlcv)."""
+        topic = candle_topic(symbol, timeframe)
+        with self._lock:
+            if time_s >= self._last_bar.get(topic, float("-inf")):
+                self._last_bar[topic] = time_s
+                self._last_close[topic] = close
+
+    def publish_bar(self, symbol: str, timeframe: str, bar: dict) -> int:
+        topic = candle_topic(symbol, timeframe)
+        with self._lock:
+            last = self._last_bar.get(topic, float("-inf"))
+            # A rewrite of the latest bar (an aggregated bar still forming) is passed on as an update
+            if bar["time"] < last or (bar["time"] == last and bar["close"] == self._last_close.get(topic)):
+                return 0
+            self._last_bar[topic] = bar["time"]
+            self._last_close[topic] = bar["close"]
+        return self.publish(topic, "bar", bar)
+
+    def publish_trade(self, trade: dict) -> int:
+        key = (trade["ts"], trade["symbol"], trade["side"], trade["qty"])
+        with self._lock:
+            if key in self._recent_trades:
+                return 0
+            self._recent_trades.append(key)
+        return self.publish(TRADES_TOPIC, "trade", trade)
+
+broker = Broker()
+
+def publish_trade(symbol: str, side: str, qty: float, price: float, ts: int, note: str = "") -> None:
+    broker.publish_trade({"ts": ts, "symbol": symbol, "side": side, "qty": qty, "price": price, "note": note})
+
+def _on_candles(conn, rows) -> None:
+    for ex, symbol, tf, ts, o, h, l, c, v in sorted(rows, key=lambda r: r[3]):
+        if broker.has_subscribers(candle_topic(symbol, tf)):
+            broker.publish_bar(symbol, tf, {"time": ts / 1000, "open": o, "high": h, "low": l, "close": c, "volume": v})
+
+add_candle_listener(_on_candles)
+
+class StoreWatcher:
+    """
+    Feeds the broker from the database for writers in other processes (the
+    scheduler, paper loops). One poll per subscribed topic per interval,
+    however many clients share that topic; idle topics are not polled.
+    """
+    def __init__(self, database_url: str, exchange: str = "binance", interval_s: float = 2.0):
+        self.database_url = database_url
+        self.exchange = exchange
+        self.interval_s = interval_s
+        self._last_trade_id: Optional[int] = None
+        self._seen: Set[str] = set()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StoreWatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stream-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[stream] watcher error: {e}")
+            time.sleep(self.interval_s)
+
+    def poll(self) -> None:
+        conn = pooled_conn(self.database_url)
+        for topic in broker.topics():
+            if topic.startswith("candles:"):
+                _, symbol, tf = topic.split(":", 2)
+                ts, ohlcv = get_candles_arrays(conn, self.exchange, symbol, tf, limit=5)
+                if topic not in self._seen:
+                    self._seen.add(topic)
+                    if len(ts):
+                        broker.mark_bar(symbol, tf, int(ts[-1]) / 1000, float(ohlcv[-1, 3]))
+                    continue
+                for t, (o, h, l, c, v) in zip(ts.tolist(), ohlcv.tolist()):
+                    broker.publish_bar(symbol, tf, {"time": t / 1000, "open": o, "high": h, "low": l, "close": c, "volume": v})
+        if self._last_trade_id is None:
+            r = conn.execute("SELECT MAX(id) FROM paper_trades").fetchone()
+            self._last_trade_id = r[0] or 0
+        elif broker.has_subscribers(TRADES_TOPIC):
+            for r in conn.execute("SELECT id, ts, symbol, side, qty, price, note FROM paper_trades WHERE id>? ORDER BY id",
+                                  (self._last_trade_id,)).fetchall():
+                self._last_trade_id = r["id"]
+                publish_trade(r["symbol"], r["side"], r["qty"], r["price"], r["ts"], r["note"] or "")
+
+def sse_events(sub: Subscription, heartbeat_s: float = 15.0):
+    """Generator of SSE text for one client; unsubscribes when the client goes away."""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            message = sub.get(timeout=heartbeat_s)
+            yield message if message is not None else ": ping\n\n"
+    finally:
+        broker.unsubscribe(sub)
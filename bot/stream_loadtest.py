@@ -0,0 +1,73 @@
+"""
+Local load test for /api/stream: serves the webapp in-process, connects N
+simulated SSE clients and publishes synthetic bars through the broker.
+
+    python -m bot.stream_loadtest --clients 50 --bars 200
+"""
+import argparse
+import http.client
+import threading
+import time
+from werkzeug.serving import make_server, WSGIRequestHandler
+from .stream import broker
+from .webapp import create_app
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+def _client(port: int, symbol: str, timeframe: str, expected: int, latencies: list, ready: threading.Barrier) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request("GET", f"/api/stream?symbol={symbol}&timeframe={timeframe}")
+    resp = conn.getresponse()
+    ready.wait()
+    got = 0
+    while got < expected:
+        line = resp.readline()
+        if not line:
+            break
+        if line.startswith(b"data: {\"time\""):
+            # Publishers stamp bars with send time in `volume` for latency measurement
+            sent = float(line.split(b"\"volume\":")[1].rstrip(b"}\n"))
+            latencies.append(time.perf_counter() - sent)
+            got += 1
+    conn.close()
+
+def run(clients: int = 50, bars: int = 200, interval_s: float = 0.005, symbol: str = "LOAD/USDT", timeframe: str = "1m") -> dict:
+    server = make_server("127.0.0.1", 0, create_app(watch_store=False), threaded=True, request_handler=_QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    latencies: list = []
+    ready = threading.Barrier(clients + 1)
+    threads = [threading.Thread(target=_client, args=(server.port, symbol, timeframe, bars, latencies, ready), daemon=True)
+               for _ in range(clients)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    while broker.subscriber_count(f"candles:{symbol}:{timeframe}") < clients:
+        time.sleep(0.01)
+
+    started = time.perf_counter()
+    for i in range(bars):
+        broker.publish_bar(symbol, timeframe, {"time": 1_700_000_000 + i * 60, "open": 1.0, "high": 1.0, "low": 1.0,
+                                               "close": 1.0, "volume": time.perf_counter()})
+        time.sleep(interval_s)
+    for t in threads:
+        t.join(timeout=30)
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    latencies.sort()
+    pct = lambda p: round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2) if latencies else None
+    stats = {"clients": clients, "bars": bars, "delivered": len(latencies), "expected": clients * bars,
+             "seconds": round(elapsed, 3), "messages_per_sec": round(len(latencies) / elapsed, 1),
+             "latency_ms_p50": pct(0.5), "latency_ms_p99": pct(0.99)}
+    print(stats)
+    return stats
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Load-test the /api/stream SSE endpoint")
+    p.add_argument("--clients", type=int, default=50)
+    p.add_argument("--bars", type=int, default=200)
+    p.add_argument("--interval", type=float, default=0.005, help="Seconds between published bars")
+    args = p.parse_args()
+    run(clients=args.clients, bars=args.bars, interval_s=args.interval)
@@ -0,0 +1,8 @@
+_UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+def timeframe_ms(timeframe: str) -> int:
+    """Bar length in ms for a ccxt/Binance timeframe string such as '1m', '4h' or '1d'."""
+    try:
+        return int(timeframe[:-1]) * _UNIT_MS[timeframe[-1]]
+    except (KeyError, ValueError):
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
@@ -1,25 +1,36 @@
-import time
+from .clock import Clock, WALL_CLOCK
 from .strategy import RSIStrategy
-from .config import cfg
+from . import metrics
 from .exchange import get_trading_exchange, get_data_exchange
+from .indicators import feed_ohlcv
+from .marketstream import market_feed
 
-def trading_loop(symbol: str, timeframe: str="1h", strategy=RSIStrategy(), trade_amount: float=50.0, sleep_s: int=300, sandbox_mode: bool=True):
-    
+def trading_loop(symbol: str, timeframe: str="1h", strategy=RSIStrategy(), trade_amount: float=50.0, sleep_s: int=300, sandbox_mode: bool=True,
+                 trading_exchange=None, data_exchange=None, clock: Clock=WALL_CLOCK):
+    """The Uphold client (`trading_exchange`), the ccxt-like `data_exchange` and `clock` are injectable for replays."""
     mode = "Sandbox" if sandbox_mode else "LIVE"
     print(f"[{mode}] Starting Uphold trading loop for {symbol} on {timeframe}.")
     
-    uphold_ex = get_trading_exchange(sandbox=sandbox_mode)
-    data_ex = get_data_exchange()
+    uphold_ex = trading_exchange or get_trading_exchange(sandbox=sandbox_mode)
+    data_ex = data_exchange or get_data_exchange()
+    stream = strategy.streaming()
+    # Closed bars are pushed over the Binance WebSocket when available; REST polling otherwise
+    feed = market_feed(data_ex, [symbol], timeframe, warmup=100, poll_s=sleep_s) if data_exchange is None else None
 
     while True:
         try:
-            # 1. Get price data from Binance
-            ohlcv = data_ex.fetch_ohlcv(symbol, timeframe=timeframe, limit=100)
-            df = __import__("pandas").DataFrame(ohlcv, columns=["ts", "open", "high", "low", "close", "volume"]).set_index("ts")
+            # 1. Get price data from Binance (a full window only to warm up)
+            if feed is not None:
+                ohlcv = feed.bars(symbol)
+            else:
+                with metrics.exchange_call(data_ex.id, "fetch_ohlcv"):
+                    ohlcv = data_ex.fetch_ohlcv(symbol, timeframe=timeframe, limit=100 if stream.last_ts is None else 5)
 
-            # 2. Generate signal
-            sig = strategy.generate_signals(df)
-            last_sig = int(sig.iloc[-1]) if len(sig) else 0
+            # 2. Update the incremental signal with newly closed bars
+            if not feed_ohlcv(stream, ohlcv, forming=feed is None):
+                stream = strategy.streaming()
+                continue
+            last_sig = stream.signal
 
             # 3. Get Uphold balance
             cards = uphold_ex.get_cards()
@@ -48,4 +59,7 @@ def trading_loop(symbol: str, timeframe: str="1h", strategy=RSIStrategy(), trade
         except Exception as e:
             print(f"[{mode}][{symbol}] An error occurred: {e}")
 
-        time.sleep(sleep_s)
+        if feed is not None:
+            feed.wait_for_bar(symbol, stream.last_ts, timeout=sleep_s)
+        else:
+            clock.sleep(sleep_s)
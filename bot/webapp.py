@@ -1,43 +1,178 @@
-from flask import Flask, render_template, jsonify, request, abort
-import sqlite3
-import json
+from flask import Flask, Response, render_template, jsonify, request, abort, g
 import time
+import hashlib
+from datetime import datetime, timezone
 from .config import cfg
+from . import metrics
+from .db import (
+    connection_pool, prepare_database, get_candles_arrays, get_stored_timeframes, get_job_runs, get_latest_ts,
+    get_series_version,
+)
+from .cache import ohlcv_cache, ohlcv_versions
+from .stream import broker, candle_topic, sse_events, StoreWatcher, TRADES_TOPIC
+from .downsample import resample_ohlcv, decimate_ohlcv, encode_binary
+from .timeframes import timeframe_ms
 from .symbols import uphold_pair
+from .screener import top as screener_top
 from .providers.uphold_exec import create_market_exchange
 
 app = Flask(__name__)
 
 def _get_conn():
-    from .db import get_conn
-    c = get_conn(cfg.database_url)
-    c.row_factory = sqlite3.Row
-    return c
+    # Checked out of the shared pool once per request (the dev server runs each on a new thread); schema and PRAGMAs were applied when it opened
+    if "db_conn" not in g:
+        g.db_conn = connection_pool(cfg.database_url).acquire()
+    return g.db_conn
+
+@app.teardown_appcontext
+def _release_conn(exc):
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        connection_pool(cfg.database_url).release(conn)
+
+@app.before_request
+def _start_timer():
+    g.t0 = time.perf_counter()
+
+@app.after_request
+def _server_timing(response):
+    if "t0" in g:
+        elapsed = time.perf_counter() - g.t0
+        response.headers["Server-Timing"] = f"app;dur={elapsed * 1000:.2f}"
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe("http_request_seconds", elapsed, route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition of this process's counters and histograms."""
+    if not metrics.enabled():
+        return abort(404)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/")
 def dashboard():
     return render_template("dashboard.html")
 
+def _source_timeframe(conn, symbol: str, tf: str, source: str | None) -> str:
+    """Stored timeframe to serve `tf` from: itself if stored, else the coarsest finer one that divides it."""
+    if source:
+        return source
+    stored = get_stored_timeframes(conn, "binance", symbol)
+    if tf in stored:
+        return tf
+    step = timeframe_ms(tf)
+    finer = [s for s in stored if timeframe_ms(s) < step and step % timeframe_ms(s) == 0]
+    return max(finer, key=timeframe_ms) if finer else tf
+
 @app.route("/api/ohlcv")
 def api_ohlcv():
+    """
+    Bars for the chart. Optional parameters:
+      source  - stored timeframe to aggregate `timeframe` from (auto-picked if omitted)
+      points  - target point count (e.g. chart width in px); LTTB-decimates larger windows
+      format  - "rows" (default, list of dicts), "columns" (one array per field) or "binary"
+    """
     symbol = request.args.get("symbol", "BTC/USDT")
     tf = request.args.get("timeframe", "1h")
     limit = int(request.args.get("limit", "500"))
+    points = int(request.args.get("points", "0"))
+    fmt = request.args.get("format", "rows")
+
+    # Version marker for this series; cached in-process and invalidated by ingestion writes.
+    # The series' write version changes on any write to it, including older bars rewritten by other processes.
+    def load_version():
+        conn = _get_conn()
+        src = _source_timeframe(conn, symbol, tf, request.args.get("source"))
+        return src, get_latest_ts(conn, "binance", symbol, src), get_series_version(conn, "binance", symbol, src)
+    try:
+        src, last_ts, version = ohlcv_versions.get((symbol, tf, request.args.get("source")), load_version)
+        step, src_step = timeframe_ms(tf), timeframe_ms(src)
+    except ValueError as e:
+        return abort(400, str(e))
+    if src_step > step or step % src_step:
+        return abort(400, f"{tf} bars cannot be built from {src} bars")
+    ratio = step // src_step
+
+    key = (symbol, tf, src, limit, points, fmt, last_ts, version)
+    etag = hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+    last_modified = datetime.fromtimestamp(last_ts / 1000, tz=timezone.utc) if last_ts else None
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        cached = ohlcv_cache.get(key)
+        if cached is None:
+            resp = _build_ohlcv(symbol, tf, src, ratio, limit, points, fmt)
+            ohlcv_cache.put(key, resp.get_data(), resp.mimetype)
+        else:
+            resp = Response(cached[0], mimetype=cached[1])
+    resp.set_etag(etag)
+    if last_modified:
+        resp.last_modified = last_modified
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+def _build_ohlcv(symbol: str, tf: str, src: str, ratio: int, limit: int, points: int, fmt: str) -> Response:
     conn = _get_conn()
-    conn.execute("""CREATE TABLE IF NOT EXISTS candles(
-      exchange TEXT, symbol TEXT, timeframe TEXT, ts INTEGER,
-      open REAL, high REAL, low REAL, close REAL, volume REAL,
-      PRIMARY KEY(exchange,symbol,timeframe,ts)
-    )""")
-    rows = conn.execute("""SELECT ts, open, high, low, close
-                           FROM candles
-                           WHERE exchange=? AND symbol=? AND timeframe=?
-                           ORDER BY ts DESC LIMIT ?""",
-                        ("binance", symbol, tf, limit)).fetchall()
-    rows = rows[::-1]
-    data = [{"time": r['ts'] / 1000, "open": r['open'], "high": r['high'], "low": r['low'], "close": r['close']} for r in rows]
+    # One extra output bucket of source rows so the oldest aggregated bar is complete
+    ts, ohlcv = get_candles_arrays(conn, "binance", symbol, src, limit=(limit + 1) * ratio if ratio > 1 else limit)
+    if ratio > 1:
+        ts, ohlcv = resample_ohlcv(ts, ohlcv, timeframe_ms(tf))
+        ts, ohlcv = ts[-limit:], ohlcv[-limit:]
+    if points:
+        ts, ohlcv = decimate_ohlcv(ts, ohlcv, points)
+
+    if fmt == "binary":
+        return Response(encode_binary(ts, ohlcv), mimetype="application/octet-stream")
+    if fmt == "columns":
+        return jsonify({"symbol": symbol, "timeframe": tf, "source": src,
+                        "time": (ts / 1000).tolist(), "open": ohlcv[:, 0].tolist(), "high": ohlcv[:, 1].tolist(),
+                        "low": ohlcv[:, 2].tolist(), "close": ohlcv[:, 3].tolist()})
+    data = [{"time": t / 1000, "open": o, "high": h, "low": l, "close": c}
+            for t, (o, h, l, c) in zip(ts.tolist(), ohlcv[:, :4].tolist())]
     return jsonify({"symbol": symbol, "timeframe": tf, "rows": data})
 
+@app.route("/api/stream")
+def api_stream():
+    """Server-sent events: `bar` for each new candle of symbol/timeframe, `trade` for paper trades."""
+    symbol = request.args.get("symbol", "BTC/USDT")
+    tf = request.args.get("timeframe", "1h")
+    sub = broker.subscribe(candle_topic(symbol, tf), TRADES_TOPIC)
+    return Response(sse_events(sub), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/api/jobs")
+def api_jobs():
+    """Scheduler run history per job, oldest first, for charting durations and throughput."""
+    hours = float(request.args.get("hours", "24"))
+    since = int((time.time() - hours * 3600) * 1000)
+    jobs: dict = {}
+    for r in reversed(get_job_runs(_get_conn(), job=request.args.get("job"), since_ts=since)):
+        j = jobs.setdefault(r["job"], {"time": [], "duration_s": [], "rows": [], "status": [], "error": []})
+        j["time"].append(r["start_ts"] / 1000)
+        j["duration_s"].append(round(r["duration_ms"] / 1000, 3))
+        j["rows"].append(r["rows"])
+        j["status"].append(r["status"])
+        j["error"].append(r["error"])
+    return jsonify(jobs)
+
+@app.route("/api/screener")
+def api_screener():
+    """
+    Latest indicator snapshot per symbol from the screener table, e.g.
+    ?quote=USDT&rsi_below=30&sort=quote_volume&limit=20 for the most traded oversold pairs.
+    """
+    args = request.args
+    num = lambda k: float(args[k]) if k in args else None
+    try:
+        rows = screener_top(_get_conn(), cfg.exchange, args.get("timeframe", "1h"), quote=args.get("quote", cfg.default_quote) or None,
+                            rsi_below=num("rsi_below"), rsi_above=num("rsi_above"), min_quote_volume=num("min_quote_volume"),
+                            sort=args.get("sort", "quote_volume"), descending=args.get("order", "desc") != "asc",
+                            limit=min(int(args.get("limit", "20")), 1000))
+    except ValueError as e:
+        return abort(400, str(e))
+    return jsonify(rows)
+
 @app.route("/uphold_trade", methods=["POST"])
 def uphold_trade():
     token = request.form.get("token", "")
@@ -69,5 +204,12 @@ def uphold_trade():
     conn.commit()
     return ("", 204)
 
-def create_app():
+_watcher = None
+
+def create_app(watch_store: bool = True):
+    global _watcher
+    prepare_database(cfg.database_url)
+    if watch_store and _watcher is None:
+        # Picks up bars and trades written by other processes for /api/stream
+        _watcher = StoreWatcher(cfg.database_url).start()
     return app
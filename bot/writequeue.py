@@ -0,0 +1,119 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# (sql, params, many) -- params is a row sequence when many=True
+Statement = Tuple[str, Sequence, bool]
+
+class WriteQueue:
+    """
+    Single writer for one SQLite file. Statements submitted from any thread are
+    executed by one dedicated thread on its own connection, grouped into a
+    transaction per batch: a batch closes after `max_batch` statements or once
+    `max_delay_s` has passed since its first statement. Each submission gets a
+    Future that resolves when its transaction has committed.
+    """
+    def __init__(self, path: str, max_batch: int=500, max_delay_s: float=0.005):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_delay_s = max_delay_s
+        self.q: "queue.Queue[Optional[Tuple[List[Statement], Future]]]" = queue.Queue()
+        self.batches = 0
+        self.statements = 0
+        self._thread = threading.Thread(target=self._run, name=f"sqlite-writer:{path}", daemon=True)
+        self._thread.start()
+
+    def submit(self, statements: List[Statement]) -> Future:
+        """Queues statements that must commit together; returns their durability future."""
+        fut: Future = Future()
+        self.q.put((statements, fut))
+        return fut
+
+    def execute(self, sql: str, params: Sequence=(), many: bool=False) -> Future:
+        return self.submit([(sql, list(params) if many else params, many)])
+
+    def close(self) -> None:
+        self.q.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        from .db import tune_connection
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        tune_connection(conn)
+        while True:
+            item = self.q.get()
+            if item is None:
+                break
+            batch = [item]
+            n = len(item[0])
+            deadline = time.monotonic() + self.max_delay_s
+            stop = False
+            while n < self.max_batch:
+                try:
+                    nxt = self.q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+                n += len(nxt[0])
+            self._commit(conn, batch)
+            if stop:
+                break
+        conn.close()
+
+    @staticmethod
+    def _apply(conn: sqlite3.Connection, statements: List[Statement]) -> None:
+        for sql, params, many in statements:
+            if many:
+                conn.executemany(sql, params)
+            else:
+                conn.execute(sql, params)
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[Tuple[List[Statement], Future]]) -> None:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for statements, _ in batch:
+                self._apply(conn, statements)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Isolate the failure: replay each submission in its own transaction
+            for statements, fut in batch:
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    self._apply(conn, statements)
+                    conn.execute("COMMIT")
+                    fut.set_result(None)
+                except Exception as e:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    fut.set_exception(e)
+            self.batches += len(batch)
+        else:
+            for _, fut in batch:
+                fut.set_result(None)
+            self.batches += 1
+        self.statements += sum(len(s) for s, _ in batch)
+
+_queues: Dict[str, WriteQueue] = {}
+_lock = threading.Lock()
+
+def get_write_queue(path: str) -> WriteQueue:
+    with _lock:
+        if path not in _queues:
+            _queues[path] = WriteQueue(path)
+        return _queues[path]
+
+def close_write_queue(path: str) -> None:
+    """Stops and forgets the writer for `path`, if one was started (e.g. before deleting the file)."""
+    with _lock:
+        wq = _queues.pop(path, None)
+    if wq is not None:
+        wq.close()
@@ -0,0 +1,155 @@
+"""
+Local WebSocket server that replays stored candles in Binance's combined
+kline/ticker stream format, for running the market-data client offline:
+
+    python -m bot.ws_replay --symbols BTC/USDT,ETH/USDT --timeframe 1m --interval 0.5 --port 8765
+    MARKET_WS_URL=ws://127.0.0.1:8765 python -m bot.run ...
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from .config import cfg
+from .symbols import binance_symbol
+from .timeframes import timeframe_ms
+
+Series = Tuple[np.ndarray, np.ndarray]  # (int64 ts, float (n, 5) ohlcv)
+
+def kline_message(code: str, timeframe: str, ts: int, bar, closed: bool) -> str:
+    o, h, l, c, v = (float(x) for x in bar)
+    step = timeframe_ms(timeframe)
+    now = int(time.time() * 1000)
+    data = {"e": "kline", "E": now, "s": code, "k": {
+        "t": ts, "T": ts + step - 1, "s": code, "i": timeframe,
+        "o": repr(o), "h": repr(h), "l": repr(l), "c": repr(c), "v": repr(v), "x": closed}}
+    return json.dumps({"stream": f"{code.lower()}@kline_{timeframe}", "data": data})
+
+def ticker_message(code: str, close: float, quote_volume: float) -> str:
+    data = {"e": "24hrTicker", "E": int(time.time() * 1000), "s": code, "c": repr(close),
+            "b": repr(close), "a": repr(close), "q": repr(quote_volume)}
+    return json.dumps({"stream": f"{code.lower()}@ticker", "data": data})
+
+class ReplayServer:
+    """
+    Serves `series` ({symbol: (ts, ohlcv)}) to every client from the first bar:
+    each bar is sent as `updates` forming kline updates followed by the closed
+    kline and a ticker, one bar every `interval_s`. Clients get the symbols
+    named in their ?streams= query (all of them if it is absent).
+    """
+    def __init__(self, series: Dict[str, Series], timeframe: str="1m", interval_s: float=0.5,
+                 updates: int=2, host: str="127.0.0.1", port: int=0):
+        self.series = series
+        self.timeframe = timeframe
+        self.interval_s = interval_s
+        self.updates = updates
+        self.host = host
+        self.port = port
+        self.clients = 0
+        self.sent = 0
+        self._codes = {binance_symbol(s).lower(): s for s in series}
+        self._ready = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def _symbols(self, path: str) -> List[str]:
+        streams = parse_qs(urlparse(path).query).get("streams")
+        if not streams:
+            return list(self.series)
+        codes = {name.split("@")[0] for name in streams[0].split("/")}
+        return [s for code, s in self._codes.items() if code in codes]
+
+    async def _handler(self, ws) -> None:
+        symbols = self._symbols(ws.request.path)
+        self.clients += 1
+        try:
+            n = max((len(self.series[s][0]) for s in symbols), default=0)
+            for i in range(n):
+                for sub in range(self.updates + 1):
+                    closed = sub == self.updates
+                    for s in symbols:
+                        ts, ohlcv = self.series[s]
+                        if i >= len(ts):
+                            continue
+                        code = binance_symbol(s).upper()
+                        o, h, l, c, v = ohlcv[i].tolist()
+                        # Forming updates reveal the bar progressively; the last one is the final bar
+                        frac = (sub + 1) / (self.updates + 1)
+                        part = (o, max(o, c * frac + o * (1 - frac)), min(o, c * frac + o * (1 - frac)),
+                                c * frac + o * (1 - frac), v * frac)
+                        await ws.send(kline_message(code, self.timeframe, int(ts[i]), (o, h, l, c, v) if closed else part, closed))
+                        self.sent += 1
+                        if closed:
+                            await ws.send(ticker_message(code, c, c * v))
+                    await asyncio.sleep(self.interval_s / (self.updates + 1))
+            await self._stop.wait()
+        except Exception:
+            pass  # client went away
+        finally:
+            self.clients -= 1
+
+    async def _serve(self) -> None:
+        from websockets.asyncio.server import serve
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        async with serve(self._handler, self.host, self.port) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await self._stop.wait()
+
+    def start(self) -> "ReplayServer":
+        """Serves from a daemon thread; returns once the port is bound."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()), name="ws-replay", daemon=True)
+            self._thread.start()
+            self._ready.wait(10)
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+def from_db(database_url: str, exchange: str, symbols: List[str], timeframe: str, limit: int=500) -> Dict[str, Series]:
+    """The last `limit` stored bars of each symbol that has any."""
+    from .db import get_candles_arrays, pooled_conn
+    conn = pooled_conn(database_url)
+    out = {}
+    for symbol in symbols:
+        ts, ohlcv = get_candles_arrays(conn, exchange, symbol, timeframe, limit=limit)
+        if len(ts):
+            out[symbol] = (ts, np.asarray(ohlcv))
+    return out
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Replay stored candles as a Binance-style WebSocket market-data stream")
+    p.add_argument("--symbols", type=str, required=True, help="Comma-separated, e.g. BTC/USDT,ETH/USDT")
+    p.add_argument("--timeframe", type=str, default="1m")
+    p.add_argument("--exchange", type=str, default=cfg.exchange)
+    p.add_argument("--limit", type=int, default=500, help="Stored bars replayed per symbol")
+    p.add_argument("--interval", type=float, default=0.5, help="Seconds per replayed bar")
+    p.add_argument("--host", type=str, default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    args = p.parse_args(argv)
+    series = from_db(cfg.database_url, args.exchange, [s.strip() for s in args.symbols.split(",")], args.timeframe, args.limit)
+    if not series:
+        raise SystemExit("No stored candles for those symbols.")
+    server = ReplayServer(series, args.timeframe, args.interval, host=args.host, port=args.port).start()
+    print(f"[replay] {len(series)} symbols on {server.url} (MARKET_WS_URL={server.url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()